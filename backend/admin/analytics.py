@@ -0,0 +1,119 @@
+"""
+Аналитика выручки и загрузки по периодам
+Читает дневные агрегаты daily_category_stats, которые триггеры поддерживают
+при изменении бронирований, и сворачивает их в дни, недели или месяцы;
+загрузка, ADR и RevPAR считаются от текущего числа номеров категории
+в пределах объекта сети
+"""
+from datetime import date, timedelta
+from typing import Dict, Any, List, Tuple
+
+ANALYTICS_BUCKETS = ('day', 'week', 'month')
+ANALYTICS_MAX_DAYS = 3660
+
+ROLLUP_SQL = """
+    SELECT date_trunc(%s, d.day)::DATE AS period,
+           d.category_id,
+           SUM(d.room_nights)::INTEGER AS room_nights,
+           SUM(d.revenue) AS revenue,
+           SUM(d.arrivals)::INTEGER AS arrivals
+    FROM daily_category_stats d
+    WHERE d.property_id = %s AND d.day >= %s AND d.day < %s
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+"""
+
+CATEGORIES_SQL = """
+    SELECT COALESCE(rc.id, 0) AS category_id, rc.code, rc.name, COUNT(r.id)::INTEGER AS rooms
+    FROM (SELECT id, code, name FROM room_categories WHERE property_id = %s) rc
+    FULL JOIN (SELECT id, category_id FROM rooms WHERE property_id = %s) r ON r.category_id = rc.id
+    GROUP BY 1, 2, 3
+"""
+
+
+def parse_range(query: Dict[str, str]) -> Tuple[date, date, str]:
+    bucket = query.get('bucket', 'day')
+    if bucket not in ANALYTICS_BUCKETS:
+        raise ValueError('bucket must be one of: %s' % ', '.join(ANALYTICS_BUCKETS))
+
+    today = date.today()
+    date_to = date.fromisoformat(query['to']) if query.get('to') else today + timedelta(days=1)
+    date_from = date.fromisoformat(query['from']) if query.get('from') else date_to - timedelta(days=30)
+    if date_to <= date_from:
+        raise ValueError('to must be after from')
+    if (date_to - date_from).days > ANALYTICS_MAX_DAYS:
+        raise ValueError('Range must not exceed %d days' % ANALYTICS_MAX_DAYS)
+    return date_from, date_to, bucket
+
+
+def _period_end(start: date, bucket: str) -> date:
+    if bucket == 'day':
+        return start + timedelta(days=1)
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if start.month == 12:
+        return date(start.year + 1, 1, 1)
+    return date(start.year, start.month + 1, 1)
+
+
+def _metrics(room_nights: int, revenue: float, arrivals: int, available: int) -> Dict[str, Any]:
+    return {
+        'roomNights': room_nights,
+        'revenue': round(revenue, 2),
+        'arrivals': arrivals,
+        'availableRoomNights': available,
+        'occupancy': round(room_nights / available, 4) if available else None,
+        'adr': round(revenue / room_nights, 2) if room_nights else None,
+        'revpar': round(revenue / available, 2) if available else None
+    }
+
+
+def fetch_analytics(cur: Any, property_id: int, date_from: date, date_to: date, bucket: str,
+                    category: str = '') -> Dict[str, Any]:
+    cur.execute(CATEGORIES_SQL, (property_id, property_id))
+    categories = {row['category_id']: row for row in cur.fetchall()}
+    if category:
+        selected = {cid for cid, row in categories.items() if row['code'] == category}
+    else:
+        selected = set(categories)
+
+    cur.execute(ROLLUP_SQL, (bucket, property_id, date_from, date_to))
+    series: List[Dict[str, Any]] = []
+    totals: Dict[date, List[float]] = {}
+    for row in cur.fetchall():
+        category_id = row['category_id']
+        if category_id not in selected:
+            continue
+        period: date = row['period']
+        days = (min(_period_end(period, bucket), date_to) - max(period, date_from)).days
+        info = categories.get(category_id)
+        available = (info['rooms'] if info else 0) * days
+        revenue = float(row['revenue'])
+
+        entry = _metrics(row['room_nights'], revenue, row['arrivals'], available)
+        entry['period'] = period.isoformat()
+        entry['category'] = info['code'] if info else None
+        entry['categoryName'] = info['name'] if info else None
+        series.append(entry)
+
+        total = totals.setdefault(period, [0, 0.0, 0])
+        total[0] += row['room_nights']
+        total[1] += revenue
+        total[2] += row['arrivals']
+
+    capacity = sum(categories[cid]['rooms'] for cid in selected)
+    periods = []
+    for period, (room_nights, revenue, arrivals) in sorted(totals.items()):
+        days = (min(_period_end(period, bucket), date_to) - max(period, date_from)).days
+        entry = _metrics(room_nights, revenue, arrivals, capacity * days)
+        entry['period'] = period.isoformat()
+        periods.append(entry)
+
+    return {
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'bucket': bucket,
+        'category': category or None,
+        'periods': periods,
+        'series': series
+    }
@@ -0,0 +1,100 @@
+"""
+Пакетные операции с номерами в одной транзакции
+Каждая операция возвращает результат по каждому элементу запроса
+и затрагивает только номера объекта сети запроса
+"""
+from typing import Dict, Any, List
+
+from psycopg2.extras import execute_values
+
+ROOM_COLUMNS = ('property_id', 'name', 'category_id', 'price_per_night', 'area', 'max_guests',
+                'description', 'features', 'image_url')
+
+
+def create_rooms(cur: Any, property_id: int, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    items = [item if isinstance(item, dict) else {} for item in items]
+    codes = list({item.get('category') for item in items if item.get('category')})
+    cur.execute("SELECT id, code FROM room_categories WHERE property_id = %s AND code = ANY(%s)",
+                (property_id, codes))
+    categories = {row['code']: row['id'] for row in cur.fetchall()}
+
+    results: List[Dict[str, Any]] = []
+    rows = []
+    for index, item in enumerate(items):
+        if not all([item.get('name'), item.get('category'), item.get('price')]):
+            results.append({'index': index, 'status': 'error', 'error': 'Missing required fields'})
+            continue
+        if item['category'] not in categories:
+            results.append({'index': index, 'status': 'error', 'error': 'Invalid category'})
+            continue
+        results.append({'index': index, 'status': 'created'})
+        rows.append((
+            property_id, item['name'], categories[item['category']], item['price'], item.get('area'),
+            item.get('maxGuests', 2), item.get('description', ''), item.get('features', []),
+            item.get('imageUrl', '')
+        ))
+
+    if rows:
+        inserted = execute_values(cur, """
+            INSERT INTO rooms (%s) VALUES %%s RETURNING id
+        """ % ', '.join(ROOM_COLUMNS), rows, page_size=len(rows), fetch=True)
+        created = iter(inserted)
+        for result in results:
+            if result['status'] == 'created':
+                result['roomId'] = next(created)['id']
+    return results
+
+
+def update_room_statuses(cur: Any, property_id: int, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    items = [item if isinstance(item, dict) else {} for item in items]
+    updates = {}
+    for item in items:
+        if item.get('roomId') and item.get('status'):
+            updates[int(item['roomId'])] = item['status']
+
+    updated = set()
+    if updates:
+        rows = execute_values(cur, """
+            UPDATE rooms r
+            SET status = v.status, updated_at = CURRENT_TIMESTAMP
+            FROM (VALUES %s) AS v(id, status, property_id)
+            WHERE r.id = v.id AND r.property_id = v.property_id
+            RETURNING r.id
+        """, [(room_id, status, property_id) for room_id, status in updates.items()],
+            template='(%s::integer, %s, %s::integer)', page_size=len(updates), fetch=True)
+        updated = {row['id'] for row in rows}
+
+    results = []
+    for item in items:
+        room_id = item.get('roomId')
+        if not room_id or not item.get('status'):
+            results.append({'roomId': room_id, 'status': 'error', 'error': 'Missing roomId or status'})
+        elif int(room_id) in updated:
+            results.append({'roomId': room_id, 'status': 'updated'})
+        else:
+            results.append({'roomId': room_id, 'status': 'not_found'})
+    return results
+
+
+def delete_rooms(cur: Any, property_id: int, room_ids: List[int]) -> List[Dict[str, Any]]:
+    ids = list({int(room_id) for room_id in room_ids})
+    cur.execute("SELECT DISTINCT room_id FROM bookings WHERE property_id = %s AND room_id = ANY(%s)",
+                (property_id, ids))
+    booked = {row['room_id'] for row in cur.fetchall()}
+
+    deletable = [room_id for room_id in ids if room_id not in booked]
+    deleted = set()
+    if deletable:
+        cur.execute("DELETE FROM rooms WHERE property_id = %s AND id = ANY(%s) RETURNING id",
+                    (property_id, deletable))
+        deleted = {row['id'] for row in cur.fetchall()}
+
+    results = []
+    for room_id in room_ids:
+        if int(room_id) in booked:
+            results.append({'roomId': room_id, 'status': 'error', 'error': 'Room has bookings'})
+        elif int(room_id) in deleted:
+            results.append({'roomId': room_id, 'status': 'deleted'})
+        else:
+            results.append({'roomId': room_id, 'status': 'not_found'})
+    return results
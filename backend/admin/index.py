@@ -1,245 +1,252 @@
 """
 API для админпанели
-Управление номерами и статистика
+Управление номерами и статистика объекта сети, выбранного заголовком X-Property-Id
 """
-import json
-import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
 from typing import Dict, Any
+from datetime import date
 
+from admission import admission_stats
+from analytics import fetch_analytics, parse_range
+from bulk import create_rooms, update_room_statuses, delete_rooms
+from db import get_pool, routing_stats
+from prices import MAX_PRICE_RANGE_DAYS, list_rate_plans, assign_rate_plan, set_price_range
+from projection import parse_fields, parse_layout, select_list, to_columns, to_rows
+from runtime import Router, Request, HttpError, response
+from stats import fetch_stats
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Admin-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    conn = psycopg2.connect(os.environ['DATABASE_URL'])
-    
+router = Router(allow_methods='GET, POST, PUT, DELETE, OPTIONS', allow_headers='Content-Type, X-Admin-Token')
+
+ROOM_COLUMNS = {
+    'id': 'r.id',
+    'name': 'r.name',
+    'category': 'rc.code',
+    'categoryName': 'rc.name',
+    'price': 'r.price_per_night',
+    'status': 'r.status',
+    'area': 'r.area',
+    'maxGuests': 'r.max_guests',
+}
+
+
+@router.route('GET', '/pool')
+def pool_stats(request: Request) -> Dict[str, Any]:
+    return response(200, {'pool': get_pool().stats(), 'reads': routing_stats(), 'admission': admission_stats()})
+
+
+@router.route('GET', '/stats')
+def admin_stats(request: Request) -> Dict[str, Any]:
+    live = request.query.get('fresh') in ('1', 'true')
+
+    with request.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        stats = fetch_stats(cur, request.property_id, live=live)
+
+    return response(200, stats)
+
+
+@router.route('GET', '/analytics')
+def admin_analytics(request: Request) -> Dict[str, Any]:
+    try:
+        date_from, date_to, bucket = parse_range(request.query)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+    with request.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        analytics = fetch_analytics(cur, request.property_id, date_from, date_to, bucket, request.query.get('category', ''))
+
+    return response(200, analytics)
+
+
+@router.route('GET', '/rate-plans')
+def get_rate_plans(request: Request) -> Dict[str, Any]:
+    with request.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        plans = list_rate_plans(cur, request.property_id)
+
+    return response(200, {'ratePlans': plans})
+
+
+@router.route('PUT', '/rate-plans')
+def update_rate_plan_rooms(request: Request) -> Dict[str, Any]:
+    body = request.body
+    room_ids = body.get('roomIds')
+
+    if not isinstance(room_ids, list) or not room_ids or 'ratePlan' not in body:
+        raise HttpError(400, 'Missing roomIds or ratePlan')
+
+    conn = request.conn
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            updated = assign_rate_plan(cur, request.property_id, [int(room_id) for room_id in room_ids],
+                                       body['ratePlan'])
+            conn.commit()
+    except (TypeError, ValueError):
+        raise HttpError(400, 'Invalid roomId')
+    except LookupError:
+        raise HttpError(400, 'Unknown rate plan')
+
+    return response(200, {'updated': updated})
+
+
+@router.route('PUT', '/prices')
+def update_prices(request: Request) -> Dict[str, Any]:
+    body = request.body
+    price = body.get('price')
+
+    try:
+        room_id = int(body['roomId'])
+        start = date.fromisoformat(body['from'])
+        end = date.fromisoformat(body['to'])
+    except (KeyError, TypeError, ValueError):
+        raise HttpError(400, 'Missing or invalid roomId, from or to')
+    if end < start or (end - start).days >= MAX_PRICE_RANGE_DAYS:
+        raise HttpError(400, 'Invalid date range')
+    if price is not None and (not isinstance(price, int) or price <= 0):
+        raise HttpError(400, 'price must be a positive integer or null')
+
+    conn = request.conn
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM rooms WHERE property_id = %s AND id = %s", (request.property_id, room_id))
+        if cur.fetchone() is None:
+            raise HttpError(404, 'Room not found')
+        set_price_range(cur, room_id, start, end, price)
+        conn.commit()
+
+    return response(200, {'message': 'Prices updated successfully'})
+
+
+@router.route('GET', '/')
+def list_rooms(request: Request) -> Dict[str, Any]:
     try:
-        if method == 'GET':
-            path = event.get('path', '')
-            
-            if '/stats' in path:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("SELECT COUNT(*) as total FROM rooms")
-                    total_rooms = cur.fetchone()['total']
-                    
-                    cur.execute("SELECT COUNT(*) as count FROM rooms WHERE status = 'available'")
-                    available_rooms = cur.fetchone()['count']
-                    
-                    cur.execute("SELECT COUNT(*) as count FROM rooms WHERE status = 'occupied'")
-                    occupied_rooms = cur.fetchone()['count']
-                    
-                    cur.execute("SELECT COUNT(*) as count FROM bookings")
-                    total_bookings = cur.fetchone()['count']
-                    
-                    cur.execute("SELECT COUNT(*) as count FROM bookings WHERE status = 'pending'")
-                    pending_bookings = cur.fetchone()['count']
-                    
-                    cur.execute("SELECT COALESCE(SUM(total_price), 0) as revenue FROM bookings WHERE status != 'cancelled'")
-                    revenue = cur.fetchone()['revenue']
-                    
-                    cur.execute("""
-                        SELECT rc.name, rc.code, COUNT(r.id) as count
-                        FROM room_categories rc
-                        LEFT JOIN rooms r ON r.category_id = rc.id
-                        GROUP BY rc.id, rc.name, rc.code
-                    """)
-                    categories_stats = cur.fetchall()
-                    
-                    return {
-                        'statusCode': 200,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'body': json.dumps({
-                            'totalRooms': total_rooms,
-                            'availableRooms': available_rooms,
-                            'occupiedRooms': occupied_rooms,
-                            'totalBookings': total_bookings,
-                            'pendingBookings': pending_bookings,
-                            'revenue': revenue,
-                            'categoriesStats': [dict(stat) for stat in categories_stats]
-                        }),
-                        'isBase64Encoded': False
-                    }
-            
-            else:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("""
-                        SELECT r.*, rc.name as category_name, rc.code as category_code
-                        FROM rooms r
-                        LEFT JOIN room_categories rc ON r.category_id = rc.id
-                        ORDER BY r.id
-                    """)
-                    rooms = cur.fetchall()
-                    
-                    result = []
-                    for room in rooms:
-                        result.append({
-                            'id': room['id'],
-                            'name': room['name'],
-                            'category': room['category_code'],
-                            'categoryName': room['category_name'],
-                            'price': room['price_per_night'],
-                            'status': room['status'],
-                            'area': room['area'],
-                            'maxGuests': room['max_guests']
-                        })
-                    
-                    return {
-                        'statusCode': 200,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'body': json.dumps({'rooms': result}),
-                        'isBase64Encoded': False
-                    }
-        
-        elif method == 'POST':
-            body = json.loads(event.get('body', '{}'))
-            
-            name = body.get('name')
-            category_code = body.get('category')
-            price = body.get('price')
-            area = body.get('area')
-            max_guests = body.get('maxGuests', 2)
-            description = body.get('description', '')
-            features = body.get('features', [])
-            image_url = body.get('imageUrl', '')
-            
-            if not all([name, category_code, price]):
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'error': 'Missing required fields'}),
-                    'isBase64Encoded': False
-                }
-            
+        fields = parse_fields(request.query.get('fields'), ROOM_COLUMNS)
+        layout = parse_layout(request.query.get('layout'))
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+    with request.conn.cursor() as cur:
+        cur.execute("""
+            SELECT %s
+            FROM rooms r
+            LEFT JOIN room_categories rc ON r.category_id = rc.id
+            WHERE r.property_id = %%s
+            ORDER BY r.id
+        """ % select_list(fields, ROOM_COLUMNS), (request.property_id,))
+        rows = cur.fetchall()
+
+    if layout == 'columnar':
+        return response(200, {'rooms': to_columns(fields, rows), 'count': len(rows)})
+    return response(200, {'rooms': to_rows(fields, rows)})
+
+
+@router.route('POST', '/')
+def create_room(request: Request) -> Dict[str, Any]:
+    body = request.body
+    conn = request.conn
+    property_id = request.property_id
+
+    if isinstance(body.get('rooms'), list):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            results = create_rooms(cur, property_id, body['rooms'])
+            conn.commit()
+
+        return response(201, {'results': results})
+
+    name = body.get('name')
+    category_code = body.get('category')
+    price = body.get('price')
+    area = body.get('area')
+    max_guests = body.get('maxGuests', 2)
+    description = body.get('description', '')
+    features = body.get('features', [])
+    image_url = body.get('imageUrl', '')
+
+    if not all([name, category_code, price]):
+        raise HttpError(400, 'Missing required fields')
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT id FROM room_categories WHERE property_id = %s AND code = %s",
+                    (property_id, category_code))
+        category = cur.fetchone()
+
+        if not category:
+            raise HttpError(400, 'Invalid category')
+
+        cur.execute("""
+            INSERT INTO rooms
+            (property_id, name, category_id, price_per_night, area, max_guests, description, features, image_url)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (property_id, name, category['id'], price, area, max_guests, description, features, image_url))
+
+        conn.commit()
+        room_id = cur.fetchone()['id']
+
+    return response(201, {'message': 'Room created successfully', 'roomId': room_id})
+
+
+@router.route('PUT', '/')
+def update_room(request: Request) -> Dict[str, Any]:
+    body = request.body
+    conn = request.conn
+    property_id = request.property_id
+
+    if isinstance(body.get('rooms'), list) or isinstance(body.get('roomIds'), list):
+        if isinstance(body.get('rooms'), list):
+            items = body['rooms']
+        else:
+            items = [{'roomId': room_id, 'status': body.get('status')} for room_id in body['roomIds']]
+        try:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT id FROM room_categories WHERE code = %s", (category_code,))
-                category = cur.fetchone()
-                
-                if not category:
-                    return {
-                        'statusCode': 400,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'body': json.dumps({'error': 'Invalid category'}),
-                        'isBase64Encoded': False
-                    }
-                
-                cur.execute("""
-                    INSERT INTO rooms 
-                    (name, category_id, price_per_night, area, max_guests, description, features, image_url)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (name, category['id'], price, area, max_guests, description, features, image_url))
-                
+                results = update_room_statuses(cur, property_id, items)
                 conn.commit()
-                room_id = cur.fetchone()['id']
-                
-                return {
-                    'statusCode': 201,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'message': 'Room created successfully', 'roomId': room_id}),
-                    'isBase64Encoded': False
-                }
-        
-        elif method == 'PUT':
-            body = json.loads(event.get('body', '{}'))
-            room_id = body.get('roomId')
-            status = body.get('status')
-            
-            if not room_id or not status:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'error': 'Missing roomId or status'}),
-                    'isBase64Encoded': False
-                }
-            
-            with conn.cursor() as cur:
-                cur.execute("""
-                    UPDATE rooms 
-                    SET status = %s, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s
-                """, (status, room_id))
-                conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'message': 'Room updated successfully'}),
-                    'isBase64Encoded': False
-                }
-        
-        elif method == 'DELETE':
-            body = json.loads(event.get('body', '{}'))
-            room_id = body.get('roomId')
-            
-            if not room_id:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'error': 'Missing roomId'}),
-                    'isBase64Encoded': False
-                }
-            
-            with conn.cursor() as cur:
-                cur.execute("DELETE FROM rooms WHERE id = %s", (room_id,))
+        except (TypeError, ValueError):
+            raise HttpError(400, 'Invalid roomId')
+
+        return response(200, {'results': results})
+
+    room_id = body.get('roomId')
+    status = body.get('status')
+
+    if not room_id or not status:
+        raise HttpError(400, 'Missing roomId or status')
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE rooms
+            SET status = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE property_id = %s AND id = %s
+        """, (status, property_id, room_id))
+        conn.commit()
+
+    return response(200, {'message': 'Room updated successfully'})
+
+
+@router.route('DELETE', '/')
+def delete_room(request: Request) -> Dict[str, Any]:
+    body = request.body
+    conn = request.conn
+    property_id = request.property_id
+
+    if isinstance(body.get('roomIds'), list):
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                results = delete_rooms(cur, property_id, body['roomIds'])
                 conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'message': 'Room deleted successfully'}),
-                    'isBase64Encoded': False
-                }
-        
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
-    
-    finally:
-        conn.close()
+        except (TypeError, ValueError):
+            raise HttpError(400, 'Invalid roomId')
+
+        return response(200, {'results': results})
+
+    room_id = body.get('roomId')
+
+    if not room_id:
+        raise HttpError(400, 'Missing roomId')
+
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM rooms WHERE property_id = %s AND id = %s", (property_id, room_id))
+        conn.commit()
+
+    return response(200, {'message': 'Room deleted successfully'})
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return router.dispatch(event, context)
@@ -0,0 +1,66 @@
+"""
+Тарифные планы и календарь ручных цен номеров
+Ручные цены хранятся массивом на номер и год и меняются присваиванием среза,
+поэтому установка цены на период — одна команда на каждый затронутый год
+"""
+from datetime import date
+from typing import Dict, Any, List, Optional
+
+MAX_PRICE_RANGE_DAYS = 731
+
+
+def list_rate_plans(cur: Any, property_id: int) -> List[Dict[str, Any]]:
+    cur.execute("""
+        SELECT p.id, p.code, p.name, p.weekend_days, p.weekend_multiplier, p.seasons,
+               p.los_discounts, p.occupancy_tiers, p.is_default, COUNT(r.id) AS rooms
+        FROM rate_plans p
+        LEFT JOIN rooms r ON r.rate_plan_id = p.id AND r.property_id = %s
+        GROUP BY p.id
+        ORDER BY p.id
+    """, (property_id,))
+    return [{
+        'id': row['id'],
+        'code': row['code'],
+        'name': row['name'],
+        'weekendDays': row['weekend_days'],
+        'weekendMultiplier': float(row['weekend_multiplier']),
+        'seasons': row['seasons'],
+        'losDiscounts': row['los_discounts'],
+        'occupancyTiers': row['occupancy_tiers'],
+        'isDefault': row['is_default'],
+        'rooms': row['rooms']
+    } for row in cur.fetchall()]
+
+
+def assign_rate_plan(cur: Any, property_id: int, room_ids: List[int], code: Optional[str]) -> int:
+    plan_id = None
+    if code is not None:
+        cur.execute("SELECT id FROM rate_plans WHERE code = %s", (code,))
+        row = cur.fetchone()
+        if row is None:
+            raise LookupError(code)
+        plan_id = row['id']
+
+    cur.execute("""
+        UPDATE rooms SET rate_plan_id = %s, updated_at = CURRENT_TIMESTAMP
+        WHERE property_id = %s AND id = ANY(%s)
+    """, (plan_id, property_id, room_ids))
+    return cur.rowcount
+
+
+def set_price_range(cur: Any, room_id: int, start: date, end: date, price: Optional[int]) -> None:
+    """Ставит ручную цену на ночи [start, end] включительно; price=None возвращает цену по плану."""
+    for year in range(start.year, end.year + 1):
+        year_start = date(year, 1, 1)
+        lo = (max(start, year_start) - year_start).days + 1
+        hi = (min(end, date(year, 12, 31)) - year_start).days + 1
+        cur.execute("""
+            INSERT INTO room_price_calendar (room_id, year, prices)
+            VALUES (%s, %s, array_fill(NULL::INTEGER, ARRAY[366]))
+            ON CONFLICT (room_id, year) DO NOTHING
+        """, (room_id, year))
+        cur.execute("""
+            UPDATE room_price_calendar
+            SET prices[%s:%s] = array_fill(%s::INTEGER, ARRAY[%s]), updated_at = CURRENT_TIMESTAMP
+            WHERE room_id = %s AND year = %s
+        """, (lo, hi, price, hi - lo + 1, room_id, year))
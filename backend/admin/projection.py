@@ -0,0 +1,42 @@
+"""
+Проекция полей ответа на список колонок SQL
+Параметр fields= выбирает поля ответа, и в SELECT попадают только их колонки;
+строки читаются обычным курсором кортежами, без словаря на каждую строку.
+layout=columnar отдаёт по массиву на поле вместо массива объектов
+"""
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+LAYOUTS = ('rows', 'compact', 'columnar')
+
+
+def parse_fields(raw: Optional[str], columns: Dict[str, str], required: str = 'id') -> Tuple[str, ...]:
+    """Поля в порядке объявления колонок; без fields= — все поля."""
+    if not raw:
+        return tuple(columns)
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = requested - set(columns)
+    if unknown:
+        raise ValueError('Unknown fields: %s' % ', '.join(sorted(unknown)))
+    requested.add(required)
+    return tuple(name for name in columns if name in requested)
+
+
+def parse_layout(raw: Optional[str]) -> str:
+    layout = raw or 'rows'
+    if layout not in LAYOUTS:
+        raise ValueError('layout must be one of: %s' % ', '.join(LAYOUTS))
+    return layout
+
+
+def select_list(fields: Sequence[str], columns: Dict[str, str]) -> str:
+    return ', '.join(columns[name] for name in fields)
+
+
+def to_rows(fields: Sequence[str], rows: List[tuple]) -> List[Dict[str, Any]]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def to_columns(fields: Sequence[str], rows: List[tuple]) -> Dict[str, List[Any]]:
+    if not rows:
+        return {name: [] for name in fields}
+    return {name: list(values) for name, values in zip(fields, zip(*rows))}
@@ -0,0 +1,95 @@
+"""
+Статистика для админпанели за один запрос к базе
+По умолчанию счётчики читаются из снимка stats_snapshot, который триггеры
+обновляют при изменении номеров и бронирований; live-режим считает их
+условными агрегатами за один проход по таблицам. Число активных удержаний
+всегда считается по маленькой таблице booking_holds. Снимок хранится строкой
+на объект сети, все счётчики относятся к объекту запроса; изменения броней
+копятся в строках-шардах stats_snapshot_deltas и прибавляются к снимку при чтении
+"""
+from datetime import datetime
+from typing import Dict, Any
+
+CATEGORIES_SQL = """
+    SELECT COALESCE(json_agg(json_build_object('name', c.name, 'code', c.code, 'count', c.count)
+                             ORDER BY c.id), '[]'::json)
+    FROM (
+        SELECT rc.id, rc.name, rc.code, COUNT(r.id) AS count
+        FROM room_categories rc
+        LEFT JOIN rooms r ON r.category_id = rc.id
+        WHERE rc.property_id = %(property_id)s
+        GROUP BY rc.id, rc.name, rc.code
+    ) c
+"""
+
+ACTIVE_HOLDS_SQL = """
+    SELECT COUNT(*) FROM booking_holds
+    WHERE property_id = %(property_id)s AND expires_at > CURRENT_TIMESTAMP
+"""
+
+LIVE_STATS_SQL = """
+    SELECT r.total_rooms, r.available_rooms, r.occupied_rooms,
+           b.total_bookings, b.pending_bookings, b.revenue,
+           (%s) AS categories_stats,
+           (%s) AS active_holds,
+           CURRENT_TIMESTAMP AS generated_at
+    FROM (
+        SELECT COUNT(*) AS total_rooms,
+               COUNT(*) FILTER (WHERE status = 'available') AS available_rooms,
+               COUNT(*) FILTER (WHERE status = 'occupied') AS occupied_rooms
+        FROM rooms
+        WHERE property_id = %%(property_id)s
+    ) r, (
+        SELECT COUNT(*) AS total_bookings,
+               COUNT(*) FILTER (WHERE status = 'pending') AS pending_bookings,
+               COALESCE(SUM(total_price) FILTER (WHERE status <> 'cancelled'), 0) AS revenue
+        FROM bookings
+        WHERE property_id = %%(property_id)s
+    ) b
+""" % (CATEGORIES_SQL, ACTIVE_HOLDS_SQL)
+
+SNAPSHOT_STATS_SQL = """
+    SELECT s.total_rooms, s.available_rooms, s.occupied_rooms,
+           s.total_bookings + COALESCE(d.total_bookings, 0) AS total_bookings,
+           s.pending_bookings + COALESCE(d.pending_bookings, 0) AS pending_bookings,
+           s.revenue + COALESCE(d.revenue, 0) AS revenue,
+           (%s) AS categories_stats,
+           (%s) AS active_holds,
+           GREATEST(s.updated_at, d.updated_at) AS generated_at
+    FROM stats_snapshot s
+    CROSS JOIN (
+        SELECT SUM(total_bookings) AS total_bookings,
+               SUM(pending_bookings) AS pending_bookings,
+               SUM(revenue)::BIGINT AS revenue,
+               MAX(updated_at) AS updated_at
+        FROM stats_snapshot_deltas
+        WHERE property_id = %%(property_id)s
+    ) d
+    WHERE s.id = %%(property_id)s
+""" % (CATEGORIES_SQL, ACTIVE_HOLDS_SQL)
+
+
+def fetch_stats(cur: Any, property_id: int, live: bool = False) -> Dict[str, Any]:
+    params = {'property_id': property_id}
+    row = None
+    if not live:
+        cur.execute(SNAPSHOT_STATS_SQL, params)
+        row = cur.fetchone()
+    if row is None:
+        live = True
+        cur.execute(LIVE_STATS_SQL, params)
+        row = cur.fetchone()
+
+    generated_at: datetime = row['generated_at']
+    return {
+        'totalRooms': row['total_rooms'],
+        'availableRooms': row['available_rooms'],
+        'occupiedRooms': row['occupied_rooms'],
+        'totalBookings': row['total_bookings'],
+        'pendingBookings': row['pending_bookings'],
+        'activeHolds': row['active_holds'],
+        'revenue': row['revenue'],
+        'categoriesStats': row['categories_stats'],
+        'generatedAt': generated_at.isoformat(),
+        'source': 'live' if live else 'snapshot'
+    }
@@ -0,0 +1,226 @@
+"""
+Трассировка запросов и горячих участков обработчика
+Собирает время по фазам (получение соединения, SQL, выборка строк,
+сериализация), статистику по отпечаткам SQL-запросов, число строк и размер
+ответа; пишет одну структурированную строку лога на запрос и копит
+гистограммы по запросам внутри тёплого экземпляра функции. Списки значений
+(IN, ARRAY[...], строки VALUES от execute_values) сворачиваются в отпечатке
+вместе с приведениями типов, а гистограмм хранится не больше
+TRACE_MAX_QUERIES: давно не встречавшиеся отпечатки вытесняются
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, Iterator, List, Optional
+
+import psycopg2.extensions
+
+TRACE_LOG = os.environ.get('TRACE_LOG', '1') != '0'
+TRACE_SERVER_TIMING = os.environ.get('TRACE_SERVER_TIMING', '0') == '1'
+TRACE_MAX_QUERIES = int(os.environ.get('TRACE_MAX_QUERIES', '500'))
+
+HISTOGRAM_BOUNDS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+_local = threading.local()
+
+_LITERAL_RE = re.compile(r"(?:\bE)?'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE_RE = re.compile(r'\s+')
+_VALUE = r'\s*(?:-?\?|NULL|TRUE|FALSE|DEFAULT)(?:\s*::\s*\w+(?:\s+\w+)*(?:\[\])*)?\s*'
+_TUPLE = r'\((?:%s,)*%s\)' % (_VALUE, _VALUE)
+_ROWS_RE = re.compile(r'%s(?:\s*,\s*%s)+' % (_TUPLE, _TUPLE), re.IGNORECASE)
+_IN_LIST_RE = re.compile(r'\((?:%s,)+%s\)' % (_VALUE, _VALUE), re.IGNORECASE)
+_ARRAY_RE = re.compile(r'\bARRAY\[(?:%s,)*%s\]' % (_VALUE, _VALUE), re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def fingerprint(query: str) -> str:
+    normalized = _LITERAL_RE.sub('?', query.replace('%s', '?'))
+    normalized = _ARRAY_RE.sub('ARRAY[...]', normalized)
+    normalized = _ROWS_RE.sub('(?, ...), ...', normalized)
+    normalized = _IN_LIST_RE.sub('(?, ...)', normalized)
+    return _SPACE_RE.sub(' ', normalized).strip()
+
+
+class Trace:
+    __slots__ = ('method', 'route', 'started', 'phases', 'queries', 'rows')
+
+    def __init__(self, method: str, route: str):
+        self.method = method
+        self.route = route
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.queries: List[tuple] = []
+        self.rows = 0
+
+    def add(self, phase: str, ms: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + ms
+
+
+class QueryHistogram:
+    __slots__ = ('count', 'total_ms', 'max_ms', 'rows', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * len(HISTOGRAM_BOUNDS_MS)
+
+    def record(self, ms: float, rows: int) -> None:
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.rows += max(rows, 0)
+        for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if ms <= bound:
+                self.buckets[index] += 1
+                break
+
+    def percentile(self, p: float) -> float:
+        target = self.count * p
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                bound = HISTOGRAM_BOUNDS_MS[index]
+                return self.max_ms if bound == float('inf') else bound
+        return self.max_ms
+
+
+_histograms: 'OrderedDict[str, QueryHistogram]' = OrderedDict()
+_histograms_lock = threading.Lock()
+
+
+def current() -> Optional[Trace]:
+    return getattr(_local, 'trace', None)
+
+
+def start(method: str, route: str) -> Trace:
+    trace = Trace(method, route)
+    _local.trace = trace
+    return trace
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    trace = current()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, (time.perf_counter() - started) * 1000)
+
+
+def record_query(query: Any, ms: float, rows: int) -> None:
+    text = query.decode('utf-8', 'replace') if isinstance(query, bytes) else str(query)
+    key = fingerprint(text)
+    with _histograms_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = QueryHistogram()
+            if len(_histograms) > TRACE_MAX_QUERIES:
+                _histograms.popitem(last=False)
+        else:
+            _histograms.move_to_end(key)
+        histogram.record(ms, rows)
+
+    trace = current()
+    if trace is not None:
+        trace.add('sql', ms)
+        trace.queries.append((key, ms, rows))
+
+
+def finish(trace: Trace, result: Dict[str, Any]) -> Dict[str, Any]:
+    _local.trace = None
+    total_ms = (time.perf_counter() - trace.started) * 1000
+    body = result.get('body') or ''
+
+    if TRACE_SERVER_TIMING:
+        metrics = ['%s;dur=%.2f' % (name, ms) for name, ms in trace.phases.items()]
+        metrics.append('total;dur=%.2f' % total_ms)
+        headers = result.setdefault('headers', {})
+        headers['Server-Timing'] = ', '.join(metrics)
+        headers['Timing-Allow-Origin'] = '*'
+
+    if TRACE_LOG:
+        slowest = sorted(trace.queries, key=lambda q: q[1], reverse=True)[:3]
+        print(json.dumps({
+            'type': 'request',
+            'method': trace.method,
+            'route': trace.route,
+            'status': result.get('statusCode'),
+            'totalMs': round(total_ms, 3),
+            'phases': {name: round(ms, 3) for name, ms in trace.phases.items()},
+            'queries': len(trace.queries),
+            'rows': trace.rows,
+            'responseBytes': len(body),
+            'slowestQueries': [{'sql': q[0][:200], 'ms': round(q[1], 3), 'rows': q[2]} for q in slowest]
+        }, ensure_ascii=False), file=sys.stdout)
+    return result
+
+
+def slowest_queries(limit: int = 10) -> List[Dict[str, Any]]:
+    with _histograms_lock:
+        items = list(_histograms.items())
+    items.sort(key=lambda item: item[1].max_ms, reverse=True)
+    return [{
+        'sql': key,
+        'count': histogram.count,
+        'avgMs': round(histogram.total_ms / histogram.count, 3),
+        'p50Ms': histogram.percentile(0.5),
+        'p95Ms': histogram.percentile(0.95),
+        'maxMs': round(histogram.max_ms, 3),
+        'rows': histogram.rows
+    } for key, histogram in items[:limit]]
+
+
+_traced_cursors: Dict[type, type] = {}
+
+
+def traced_cursor(factory: type) -> type:
+    cls = _traced_cursors.get(factory)
+    if cls is None:
+        class TracedCursor(factory):
+            def execute(self, query, vars=None):
+                started = time.perf_counter()
+                try:
+                    return super().execute(query, vars)
+                finally:
+                    record_query(query, (time.perf_counter() - started) * 1000, self.rowcount)
+
+            def _fetch(self, method, *args):
+                started = time.perf_counter()
+                rows = method(*args)
+                trace = current()
+                if trace is not None:
+                    trace.add('fetch', (time.perf_counter() - started) * 1000)
+                    trace.rows += len(rows) if isinstance(rows, list) else int(rows is not None)
+                return rows
+
+            def fetchone(self):
+                return self._fetch(super().fetchone)
+
+            def fetchmany(self, size=None):
+                return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+            def fetchall(self):
+                return self._fetch(super().fetchall)
+
+        cls = _traced_cursors[factory] = TracedCursor
+    return cls
+
+
+class TracedConnection(psycopg2.extensions.connection):
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = traced_cursor(factory)
+        return super().cursor(*args, **kwargs)
@@ -0,0 +1,51 @@
+"""
+Проверка доступности номера на даты
+Пересечения ищутся под транзакционной advisory-блокировкой номера,
+поэтому параллельные запросы на один номер не могут создать двойную бронь.
+Номер занимают активные брони и неистёкшие удержания из booking_holds;
+срок удержания сверяется с clock_timestamp(), а не со временем начала
+транзакции, которая могла долго ждать блокировку;
+брони ищутся только в секциях объекта сети номера
+"""
+from datetime import date
+from typing import Any, Optional
+
+ROOM_LOCK_NAMESPACE = 1001
+
+
+def lock_room(cur: Any, room_id: int) -> None:
+    cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (ROOM_LOCK_NAMESPACE, room_id))
+
+
+def find_conflict(cur: Any, property_id: int, room_id: int, check_in: date, check_out: date,
+                  exclude_booking_id: Optional[int] = None) -> Optional[int]:
+    """Id пересекающейся брони; 0, если даты заняты удержанием."""
+    query = """
+        SELECT id FROM bookings
+        WHERE property_id = %s
+          AND room_id = %s
+          AND status <> 'cancelled'
+          AND check_out > %s
+          AND check_in < %s
+    """
+    params = [property_id, room_id, check_in, check_out]
+
+    if exclude_booking_id is not None:
+        query += " AND id <> %s"
+        params.append(exclude_booking_id)
+
+    query += """
+        UNION ALL
+        SELECT 0 FROM booking_holds
+        WHERE room_id = %s
+          AND expires_at > clock_timestamp()
+          AND check_out > %s
+          AND check_in < %s
+    """
+    params.extend([room_id, check_in, check_out])
+
+    cur.execute(query + " LIMIT 1", params)
+    row = cur.fetchone()
+    if not row:
+        return None
+    return row['id'] if isinstance(row, dict) else row[0]
@@ -0,0 +1,78 @@
+"""
+Пакетные операции с бронированиями в одной транзакции
+Возобновление отменённых броней проходит ту же проверку пересечений,
+что и одиночный PUT. Операции затрагивают только брони объекта сети запроса
+"""
+from typing import Dict, Any, List
+
+from psycopg2.extras import execute_values
+
+from availability import lock_room, find_conflict
+
+
+def update_booking_statuses(cur: Any, property_id: int, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    items = [item if isinstance(item, dict) else {} for item in items]
+    updates = {}
+    for item in items:
+        if item.get('bookingId') and item.get('status'):
+            updates[int(item['bookingId'])] = item['status']
+
+    updated = set()
+    conflicts = set()
+    if updates:
+        cur.execute("""
+            SELECT id, room_id, check_in, check_out FROM bookings
+            WHERE property_id = %s AND id = ANY(%s) AND status = 'cancelled' AND room_id IS NOT NULL
+        """, (property_id, list(updates)))
+        reactivated = [row for row in cur.fetchall() if updates[row['id']] != 'cancelled']
+
+        for room_id in sorted({row['room_id'] for row in reactivated}):
+            lock_room(cur, room_id)
+
+        for row in sorted(reactivated, key=lambda r: r['id']):
+            status = updates.pop(row['id'])
+            if find_conflict(cur, property_id, row['room_id'], row['check_in'], row['check_out'],
+                             exclude_booking_id=row['id']) is not None:
+                conflicts.add(row['id'])
+                continue
+            cur.execute("""
+                UPDATE bookings SET status = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE property_id = %s AND id = %s
+            """, (status, property_id, row['id']))
+            updated.add(row['id'])
+
+    if updates:
+        rows = execute_values(cur, """
+            UPDATE bookings b
+            SET status = v.status, updated_at = CURRENT_TIMESTAMP
+            FROM (VALUES %s) AS v(id, status, property_id)
+            WHERE b.property_id = v.property_id AND b.id = v.id
+            RETURNING b.id
+        """, [(booking_id, status, property_id) for booking_id, status in updates.items()],
+            template='(%s::integer, %s, %s::integer)', page_size=len(updates), fetch=True)
+        updated.update(row['id'] for row in rows)
+
+    results = []
+    for item in items:
+        booking_id = item.get('bookingId')
+        if not booking_id or not item.get('status'):
+            results.append({'bookingId': booking_id, 'status': 'error', 'error': 'Missing bookingId or status'})
+        elif int(booking_id) in conflicts:
+            results.append({'bookingId': booking_id, 'status': 'error',
+                            'error': 'Room is not available for selected dates'})
+        elif int(booking_id) in updated:
+            results.append({'bookingId': booking_id, 'status': 'updated'})
+        else:
+            results.append({'bookingId': booking_id, 'status': 'not_found'})
+    return results
+
+
+def delete_bookings(cur: Any, property_id: int, booking_ids: List[int]) -> List[Dict[str, Any]]:
+    ids = list({int(booking_id) for booking_id in booking_ids})
+    cur.execute("DELETE FROM bookings WHERE property_id = %s AND id = ANY(%s) RETURNING id", (property_id, ids))
+    deleted = {row['id'] for row in cur.fetchall()}
+
+    return [
+        {'bookingId': booking_id, 'status': 'deleted' if int(booking_id) in deleted else 'not_found'}
+        for booking_id in booking_ids
+    ]
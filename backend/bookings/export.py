@@ -0,0 +1,107 @@
+"""
+Выгрузка бронирований в NDJSON или CSV
+Строки читаются серверным (именованным) курсором пачками по itersize,
+поэтому память не зависит от размера таблицы; выгрузку можно продолжить
+с последнего выгруженного id. Выгрузка одного объекта сети читает только его секции
+"""
+import csv
+import io
+import json
+import os
+import zlib
+from typing import Any, Iterator, Optional, Tuple
+
+EXPORT_ITERSIZE = int(os.environ.get('EXPORT_ITERSIZE', '2000'))
+EXPORT_MAX_BYTES = int(os.environ.get('EXPORT_MAX_BYTES', '2500000'))
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+EXPORT_COLUMNS = (
+    'id', 'roomId', 'roomName', 'checkIn', 'checkOut', 'guestsCount', 'totalPrice',
+    'status', 'guestName', 'guestEmail', 'guestPhone', 'notes', 'createdAt'
+)
+
+EXPORT_SQL = """
+    SELECT b.id, b.room_id, r.name, b.check_in, b.check_out, b.guests_count, b.total_price,
+           b.status, b.guest_name, b.guest_email, b.guest_phone, b.notes, b.created_at
+    FROM bookings b
+    LEFT JOIN rooms r ON b.room_id = r.id
+    WHERE b.id > %s{property_filter}
+    ORDER BY b.id
+"""
+
+
+def _row_values(row: Tuple) -> list:
+    values = list(row)
+    values[3] = values[3].isoformat()
+    values[4] = values[4].isoformat()
+    values[12] = values[12].isoformat() if values[12] else None
+    return values
+
+
+def _encode(rows: list, fmt: str) -> str:
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(_row_values(row) for row in rows)
+        return buffer.getvalue()
+    return ''.join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, _row_values(row))), ensure_ascii=False) + '\n'
+        for row in rows
+    )
+
+
+def iter_export(conn: Any, fmt: str, after_id: int = 0,
+                property_id: Optional[int] = None) -> Iterator[Tuple[str, int]]:
+    """Отдаёт пары (закодированная пачка строк, id последней строки в пачке); без property_id — все объекты."""
+    if fmt == 'csv' and after_id == 0:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue(), 0
+
+    with conn.cursor(name='bookings_export') as cur:
+        cur.itersize = EXPORT_ITERSIZE
+        if property_id is None:
+            cur.execute(EXPORT_SQL.format(property_filter=''), (after_id,))
+        else:
+            cur.execute(EXPORT_SQL.format(property_filter=' AND b.property_id = %s'), (after_id, property_id))
+        while True:
+            rows = cur.fetchmany(EXPORT_ITERSIZE)
+            if not rows:
+                break
+            yield _encode(rows, fmt), rows[-1][0]
+
+
+def export_chunk(conn: Any, fmt: str, after_id: int = 0, compress: bool = False,
+                 max_bytes: int = EXPORT_MAX_BYTES, property_id: Optional[int] = None) -> Tuple[bytes, int, bool]:
+    """
+    Собирает одну порцию выгрузки не больше max_bytes.
+    Возвращает тело, id последней выгруженной строки и признак окончания.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    parts = []
+    size = 0
+    last_id = after_id
+    complete = True
+
+    batches = iter_export(conn, fmt, after_id, property_id)
+    try:
+        for text, batch_last_id in batches:
+            data = text.encode('utf-8')
+            if compressor:
+                data = compressor.compress(data)
+            parts.append(data)
+            size += len(data)
+            last_id = batch_last_id or last_id
+            if size >= max_bytes:
+                complete = False
+                break
+    finally:
+        batches.close()
+
+    if compressor:
+        parts.append(compressor.flush())
+    conn.rollback()
+    return b''.join(parts), last_id, complete
@@ -0,0 +1,56 @@
+"""
+Удержание номера на время оформления брони
+Удержание создаётся в начале оформления, занимает номер на даты на
+HOLD_TTL секунд и при создании брони забирается одним DELETE ... RETURNING,
+поэтому одно удержание нельзя превратить в две брони. Истёкшие удержания
+проверками не учитываются, а удаляет их обработчик outbox
+"""
+import os
+import uuid
+from datetime import date
+from typing import Dict, Any, Optional
+
+from runtime import HttpError
+
+HOLD_TTL = int(os.environ.get('HOLD_TTL', '900'))
+
+
+def parse_hold_id(value: Any) -> str:
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        raise HttpError(400, 'Invalid holdId')
+
+
+def create_hold(cur: Any, property_id: int, room_id: int, check_in: date, check_out: date, guests_count: int,
+                total_price: int, ttl: int = HOLD_TTL) -> Dict[str, Any]:
+    cur.execute("""
+        INSERT INTO booking_holds
+        (token, property_id, room_id, check_in, check_out, guests_count, total_price, expires_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP + %s * INTERVAL '1 second')
+        RETURNING token, expires_at
+    """, (str(uuid.uuid4()), property_id, room_id, check_in, check_out, guests_count, total_price, ttl))
+    row = cur.fetchone()
+    return {
+        'holdId': str(row['token']),
+        'roomId': room_id,
+        'checkIn': check_in.isoformat(),
+        'checkOut': check_out.isoformat(),
+        'totalPrice': total_price,
+        'expiresAt': row['expires_at'].isoformat()
+    }
+
+
+def take_hold(cur: Any, property_id: int, hold_id: str) -> Optional[Dict[str, Any]]:
+    """Забирает неистёкшее удержание объекта; None, если его нет или срок вышел."""
+    cur.execute("""
+        DELETE FROM booking_holds
+        WHERE token = %s AND property_id = %s AND expires_at > clock_timestamp()
+        RETURNING room_id, check_in, check_out, guests_count, total_price
+    """, (hold_id, property_id))
+    return cur.fetchone()
+
+
+def release_hold(cur: Any, property_id: int, hold_id: str) -> bool:
+    cur.execute("DELETE FROM booking_holds WHERE token = %s AND property_id = %s", (hold_id, property_id))
+    return cur.rowcount > 0
@@ -0,0 +1,97 @@
+"""
+Идемпотентность создания бронирований и удержаний по заголовку Idempotency-Key
+Ключ занимается строкой idempotency_keys в той же транзакции, что и бронь:
+параллельный дубль ждёт на уникальном индексе и после коммита первого запроса
+получает сохранённый ответ, а при откате первого выполняется сам
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from runtime import HttpError, JSON_HEADERS
+
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', '86400'))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+PURGE_INTERVAL = 60.0
+PURGE_BATCH = 500
+
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+def key_digest(key: str, scope: str = '') -> bytes:
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HttpError(400, 'Idempotency-Key must be 1-%d characters' % IDEMPOTENCY_KEY_MAX_LENGTH)
+    return hashlib.sha256(('%s\x00%s' % (scope, key)).encode('utf-8')).digest()
+
+
+def request_digest(body: Dict[str, Any]) -> bytes:
+    canonical = json.dumps(body, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).digest()
+
+
+def claim(cur: Any, key_hash: bytes, request_hash: bytes, ttl: int = IDEMPOTENCY_TTL) -> Optional[Dict[str, Any]]:
+    """Занимает ключ; возвращает сохранённый ответ, если ключ уже использован."""
+    _maybe_purge(cur)
+    cur.execute("""
+        INSERT INTO idempotency_keys (key_hash, request_hash, expires_at)
+        VALUES (%s, %s, CURRENT_TIMESTAMP + %s * INTERVAL '1 second')
+        ON CONFLICT (key_hash) DO UPDATE SET
+            request_hash = EXCLUDED.request_hash,
+            status_code = NULL,
+            response_body = NULL,
+            expires_at = EXCLUDED.expires_at
+        WHERE idempotency_keys.expires_at < CURRENT_TIMESTAMP
+        RETURNING key_hash
+    """, (key_hash, request_hash, ttl))
+    if cur.fetchone() is not None:
+        return None
+
+    cur.execute("""
+        SELECT request_hash, status_code, response_body
+        FROM idempotency_keys
+        WHERE key_hash = %s
+    """, (key_hash,))
+    stored = cur.fetchone()
+    if bytes(stored['request_hash']) != request_hash:
+        raise HttpError(422, 'Idempotency-Key was already used with a different request')
+    if stored['status_code'] is None:
+        raise HttpError(409, 'A request with this Idempotency-Key is still in progress')
+
+    headers = dict(JSON_HEADERS)
+    headers['Idempotent-Replayed'] = 'true'
+    return {
+        'statusCode': stored['status_code'],
+        'headers': headers,
+        'body': stored['response_body'],
+        'isBase64Encoded': False
+    }
+
+
+def store(cur: Any, key_hash: bytes, result: Dict[str, Any]) -> None:
+    cur.execute("""
+        UPDATE idempotency_keys
+        SET status_code = %s, response_body = %s
+        WHERE key_hash = %s
+    """, (result['statusCode'], result['body'], key_hash))
+
+
+def _maybe_purge(cur: Any) -> None:
+    global _last_purge
+    now = time.monotonic()
+    with _purge_lock:
+        if now - _last_purge < PURGE_INTERVAL:
+            return
+        _last_purge = now
+    cur.execute("""
+        DELETE FROM idempotency_keys
+        WHERE key_hash IN (
+            SELECT key_hash FROM idempotency_keys
+            WHERE expires_at < CURRENT_TIMESTAMP
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+    """, (PURGE_BATCH,))
@@ -1,230 +1,398 @@
 """
 API для работы с бронированиями
-Создание, получение и управление бронированиями
+Создание, получение и управление бронированиями. Оформление начинается
+с удержания номера (POST /holds); бронь по удержанию, как и прямая, ждёт подтверждения.
+Все запросы ограничены объектом сети (X-Property-Id), по нему же
+бронирования секционированы
 """
-import json
-import os
-import psycopg2
+import base64
 from psycopg2.extras import RealDictCursor
-from typing import Dict, Any
-from datetime import datetime
+from typing import Dict, Any, Tuple
+from datetime import date, datetime
 
+from availability import lock_room, find_conflict
+from bulk import update_booking_statuses, delete_bookings
+from export import EXPORT_FORMATS, export_chunk
+from holds import parse_hold_id, create_hold, take_hold, release_hold
+from idempotency import key_digest, request_digest, claim, store
+from pagination import encode_cursor, decode_cursor, parse_limit
+from pricing import load_quotes
+from runtime import Router, Request, HttpError, response
+
+router = Router(allow_methods='GET, POST, PUT, DELETE, OPTIONS', allow_headers='Content-Type, X-User-Id, Idempotency-Key')
+
+# Карта занятости room_occupancy пересобирается по броням с заездом не раньше
+# чем за 366 дней до начала года, поэтому более длинное проживание в неё не попадёт
+MAX_STAY_NIGHTS = 366
+
+BOOKING_SELECT = """
+    SELECT b.*, r.name as room_name, r.image_url as room_image
+    FROM bookings b
+    LEFT JOIN rooms r ON b.room_id = r.id
+"""
+
+
+def serialize_booking(booking: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'id': booking['id'],
+        'roomId': booking['room_id'],
+        'roomName': booking['room_name'],
+        'roomImage': booking['room_image'],
+        'checkIn': booking['check_in'].isoformat(),
+        'checkOut': booking['check_out'].isoformat(),
+        'guestsCount': booking['guests_count'],
+        'totalPrice': booking['total_price'],
+        'status': booking['status'],
+        'guestName': booking['guest_name'],
+        'guestEmail': booking['guest_email'],
+        'guestPhone': booking['guest_phone'],
+        'notes': booking['notes'],
+        'createdAt': booking['created_at'].isoformat()
+    }
+
+
+def export_bookings(request: Request, export_format: str) -> Dict[str, Any]:
+    after_id = request.query.get('afterId') or '0'
+    if export_format not in EXPORT_FORMATS or not after_id.isdigit():
+        raise HttpError(400, 'Invalid export parameters')
+
+    compress = request.query.get('gzip') in ('1', 'true')
+    data, last_id, complete = export_chunk(request.conn, export_format, int(after_id), compress,
+                                           property_id=request.property_id)
+
+    headers = {
+        'Content-Type': EXPORT_FORMATS[export_format],
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'X-Export-Last-Id, X-Export-Complete',
+        'X-Export-Last-Id': str(last_id),
+        'X-Export-Complete': 'true' if complete else 'false'
+    }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': base64.b64encode(data).decode() if compress else data.decode('utf-8'),
+        'isBase64Encoded': compress
+    }
+
+
+@router.route('GET', '/{id:int}')
+def get_booking(request: Request) -> Dict[str, Any]:
+    with request.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(BOOKING_SELECT + " WHERE b.property_id = %s AND b.id = %s",
+                    (request.property_id, request.params['id']))
+        booking = cur.fetchone()
+
+    if not booking:
+        raise HttpError(404, 'Booking not found')
+    return response(200, {'booking': serialize_booking(booking)})
+
+
+@router.route('GET', '/')
+def list_bookings(request: Request) -> Dict[str, Any]:
+    query_params = request.query
+
+    export_format = query_params.get('export')
+    if export_format:
+        return export_bookings(request, export_format)
+
+    user_id = query_params.get('user_id')
+    room_id = query_params.get('room_id')
+    status = query_params.get('status')
+    date_from = query_params.get('dateFrom')
+    date_to = query_params.get('dateTo')
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    conn = psycopg2.connect(os.environ['DATABASE_URL'])
-    
     try:
-        if method == 'GET':
-            query_params = event.get('queryStringParameters') or {}
-            user_id = query_params.get('user_id')
-            status = query_params.get('status')
-            
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                query = """
-                    SELECT b.*, r.name as room_name, r.image_url as room_image
-                    FROM bookings b
-                    LEFT JOIN rooms r ON b.room_id = r.id
-                    WHERE 1=1
-                """
-                params = []
-                
-                if user_id:
-                    query += " AND b.user_id = %s"
-                    params.append(int(user_id))
-                
-                if status:
-                    query += " AND b.status = %s"
-                    params.append(status)
-                
-                query += " ORDER BY b.created_at DESC"
-                
-                cur.execute(query, params)
-                bookings = cur.fetchall()
-                
-                result = []
-                for booking in bookings:
-                    result.append({
-                        'id': booking['id'],
-                        'roomId': booking['room_id'],
-                        'roomName': booking['room_name'],
-                        'roomImage': booking['room_image'],
-                        'checkIn': booking['check_in'].isoformat(),
-                        'checkOut': booking['check_out'].isoformat(),
-                        'guestsCount': booking['guests_count'],
-                        'totalPrice': booking['total_price'],
-                        'status': booking['status'],
-                        'guestName': booking['guest_name'],
-                        'guestEmail': booking['guest_email'],
-                        'guestPhone': booking['guest_phone'],
-                        'notes': booking['notes'],
-                        'createdAt': booking['created_at'].isoformat()
-                    })
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'bookings': result}),
-                    'isBase64Encoded': False
-                }
-        
-        elif method == 'POST':
-            body = json.loads(event.get('body', '{}'))
-            
-            room_id = body.get('roomId')
-            check_in = body.get('checkIn')
-            check_out = body.get('checkOut')
-            guests_count = body.get('guestsCount', 2)
-            guest_name = body.get('guestName')
-            guest_email = body.get('guestEmail')
-            guest_phone = body.get('guestPhone')
-            
-            if not all([room_id, check_in, check_out, guest_name, guest_email]):
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'error': 'Missing required fields'}),
-                    'isBase64Encoded': False
-                }
-            
+        limit = parse_limit(query_params.get('limit'))
+        cursor = decode_cursor(query_params['cursor']) if query_params.get('cursor') else None
+        if date_from:
+            date_from = datetime.fromisoformat(date_from).date()
+        if date_to:
+            date_to = datetime.fromisoformat(date_to).date()
+        user_id = int(user_id) if user_id else None
+        room_id = int(room_id) if room_id else None
+    except ValueError:
+        raise HttpError(400, 'Invalid query parameters')
+
+    query = BOOKING_SELECT + " WHERE b.property_id = %s"
+    params = [request.property_id]
+
+    if user_id:
+        query += " AND b.user_id = %s"
+        params.append(user_id)
+
+    if room_id:
+        query += " AND b.room_id = %s"
+        params.append(room_id)
+
+    if status:
+        query += " AND b.status = %s"
+        params.append(status)
+
+    if date_from:
+        query += " AND b.check_out > %s"
+        params.append(date_from)
+
+    if date_to:
+        query += " AND b.check_in < %s"
+        params.append(date_to)
+
+    if cursor:
+        query += " AND (b.created_at, b.id) < (%s, %s)"
+        params.extend(cursor)
+
+    query += " ORDER BY b.created_at DESC, b.id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    with request.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(query, params)
+        bookings = cur.fetchall()
+
+    next_cursor = None
+    if len(bookings) > limit:
+        bookings = bookings[:limit]
+        last = bookings[-1]
+        next_cursor = encode_cursor(last['created_at'], last['id'])
+
+    result = [serialize_booking(booking) for booking in bookings]
+    return response(200, {'bookings': result, 'nextCursor': next_cursor})
+
+
+def parse_stay(body: Dict[str, Any]) -> Tuple[int, date, date]:
+    try:
+        room_id = int(body.get('roomId'))
+    except (TypeError, ValueError):
+        raise HttpError(400, 'Invalid roomId')
+
+    try:
+        check_in_date = datetime.fromisoformat(body.get('checkIn')).date()
+        check_out_date = datetime.fromisoformat(body.get('checkOut')).date()
+    except (TypeError, ValueError):
+        raise HttpError(400, 'Invalid date format')
+
+    if (check_out_date - check_in_date).days <= 0:
+        raise HttpError(400, 'checkOut must be after checkIn')
+    if (check_out_date - check_in_date).days > MAX_STAY_NIGHTS:
+        raise HttpError(400, 'Stay is too long')
+    return room_id, check_in_date, check_out_date
+
+
+@router.route('POST', '/holds')
+def create_booking_hold(request: Request) -> Dict[str, Any]:
+    body = request.body
+
+    if not all([body.get('roomId'), body.get('checkIn'), body.get('checkOut')]):
+        raise HttpError(400, 'Missing required fields')
+
+    room_id, check_in_date, check_out_date = parse_stay(body)
+    guests_count = body.get('guestsCount', 2)
+    property_id = request.property_id
+    idempotency_key = request.header('Idempotency-Key')
+    if idempotency_key is not None:
+        key_hash = key_digest(idempotency_key, 'holds:%s:%s' % (property_id, request.header('X-User-Id') or ''))
+
+    conn = request.conn
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        if idempotency_key is not None:
+            replay = claim(cur, key_hash, request_digest(body))
+            if replay is not None:
+                conn.rollback()
+                return replay
+
+        quote = load_quotes(cur, [room_id], check_in_date, check_out_date, property_id).get(room_id)
+
+        if not quote:
+            raise HttpError(404, 'Room not found')
+
+        lock_room(cur, room_id)
+        if find_conflict(cur, property_id, room_id, check_in_date, check_out_date) is not None:
+            raise HttpError(409, 'Room is not available for selected dates')
+
+        hold = create_hold(cur, property_id, room_id, check_in_date, check_out_date, guests_count, quote['totalPrice'])
+        result = response(201, hold)
+        if idempotency_key is not None:
+            store(cur, key_hash, result)
+        conn.commit()
+
+    return result
+
+
+@router.route('DELETE', '/holds')
+def delete_booking_hold(request: Request) -> Dict[str, Any]:
+    hold_id = parse_hold_id(request.body.get('holdId'))
+
+    conn = request.conn
+    with conn.cursor() as cur:
+        released = release_hold(cur, request.property_id, hold_id)
+        conn.commit()
+
+    if not released:
+        raise HttpError(404, 'Hold not found')
+    return response(200, {'message': 'Hold released'})
+
+
+@router.route('POST', '/')
+def create_booking(request: Request) -> Dict[str, Any]:
+    body = request.body
+
+    hold_id = body.get('holdId')
+    guest_name = body.get('guestName')
+    guest_email = body.get('guestEmail')
+    guest_phone = body.get('guestPhone')
+
+    required = [guest_name, guest_email]
+    if hold_id is None:
+        required += [body.get('roomId'), body.get('checkIn'), body.get('checkOut')]
+    if not all(required):
+        raise HttpError(400, 'Missing required fields')
+
+    if hold_id is not None:
+        hold_id = parse_hold_id(hold_id)
+    else:
+        room_id, check_in_date, check_out_date = parse_stay(body)
+        guests_count = body.get('guestsCount', 2)
+
+    property_id = request.property_id
+    idempotency_key = request.header('Idempotency-Key')
+    if idempotency_key is not None:
+        key_hash = key_digest(idempotency_key, '%s:%s' % (property_id, request.header('X-User-Id') or ''))
+
+    conn = request.conn
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        if idempotency_key is not None:
+            replay = claim(cur, key_hash, request_digest(body))
+            if replay is not None:
+                conn.rollback()
+                return replay
+
+        if hold_id is not None:
+            hold = take_hold(cur, property_id, hold_id)
+            if hold is None:
+                raise HttpError(410, 'Hold has expired or does not exist')
+
+            room_id = hold['room_id']
+            check_in_date, check_out_date = hold['check_in'], hold['check_out']
+            guests_count = hold['guests_count']
+            total_price = hold['total_price']
+            # Удержание могло истечь, пока запрос ждал блокировку номера, а даты — уйти
+            # другой брони; само удержание уже удалено и в проверке не участвует
+            lock_room(cur, room_id)
+            if find_conflict(cur, property_id, room_id, check_in_date, check_out_date) is not None:
+                raise HttpError(409, 'Room is not available for selected dates')
+        else:
+            quote = load_quotes(cur, [room_id], check_in_date, check_out_date, property_id).get(room_id)
+
+            if not quote:
+                raise HttpError(404, 'Room not found')
+
+            lock_room(cur, room_id)
+            if find_conflict(cur, property_id, room_id, check_in_date, check_out_date) is not None:
+                raise HttpError(409, 'Room is not available for selected dates')
+
+            total_price = quote['totalPrice']
+
+        cur.execute("""
+            INSERT INTO bookings
+            (property_id, room_id, check_in, check_out, guests_count, total_price,
+             guest_name, guest_email, guest_phone, status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (property_id, room_id, check_in_date, check_out_date, guests_count, total_price,
+              guest_name, guest_email, guest_phone, 'pending'))
+        booking_id = cur.fetchone()['id']
+
+        result = response(201, {
+            'message': 'Booking created successfully',
+            'bookingId': booking_id,
+            'totalPrice': total_price
+        })
+        if idempotency_key is not None:
+            store(cur, key_hash, result)
+        conn.commit()
+
+    return result
+
+
+@router.route('PUT', '/')
+def update_booking(request: Request) -> Dict[str, Any]:
+    body = request.body
+    conn = request.conn
+    property_id = request.property_id
+
+    if isinstance(body.get('bookings'), list) or isinstance(body.get('bookingIds'), list):
+        if isinstance(body.get('bookings'), list):
+            items = body['bookings']
+        else:
+            items = [{'bookingId': booking_id, 'status': body.get('status')} for booking_id in body['bookingIds']]
+        try:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT price_per_night FROM rooms WHERE id = %s", (room_id,))
-                room = cur.fetchone()
-                
-                if not room:
-                    return {
-                        'statusCode': 404,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'body': json.dumps({'error': 'Room not found'}),
-                        'isBase64Encoded': False
-                    }
-                
-                check_in_date = datetime.fromisoformat(check_in)
-                check_out_date = datetime.fromisoformat(check_out)
-                nights = (check_out_date - check_in_date).days
-                total_price = room['price_per_night'] * nights
-                
-                cur.execute("""
-                    INSERT INTO bookings 
-                    (room_id, check_in, check_out, guests_count, total_price, 
-                     guest_name, guest_email, guest_phone, status)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (room_id, check_in, check_out, guests_count, total_price,
-                      guest_name, guest_email, guest_phone, 'pending'))
-                
-                conn.commit()
-                booking_id = cur.fetchone()['id']
-                
-                return {
-                    'statusCode': 201,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({
-                        'message': 'Booking created successfully',
-                        'bookingId': booking_id,
-                        'totalPrice': total_price
-                    }),
-                    'isBase64Encoded': False
-                }
-        
-        elif method == 'PUT':
-            body = json.loads(event.get('body', '{}'))
-            booking_id = body.get('bookingId')
-            status = body.get('status')
-            
-            if not booking_id or not status:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'error': 'Missing bookingId or status'}),
-                    'isBase64Encoded': False
-                }
-            
-            with conn.cursor() as cur:
-                cur.execute("""
-                    UPDATE bookings 
-                    SET status = %s, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s
-                """, (status, booking_id))
+                results = update_booking_statuses(cur, property_id, items)
                 conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'message': 'Booking updated successfully'}),
-                    'isBase64Encoded': False
-                }
-        
-        elif method == 'DELETE':
-            body = json.loads(event.get('body', '{}'))
-            booking_id = body.get('bookingId')
-            
-            if not booking_id:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'error': 'Missing bookingId'}),
-                    'isBase64Encoded': False
-                }
-            
-            with conn.cursor() as cur:
-                cur.execute("DELETE FROM bookings WHERE id = %s", (booking_id,))
+        except (TypeError, ValueError):
+            raise HttpError(400, 'Invalid bookingId')
+
+        return response(200, {'results': results})
+
+    booking_id = body.get('bookingId')
+    status = body.get('status')
+
+    if not booking_id or not status:
+        raise HttpError(400, 'Missing bookingId or status')
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        if status != 'cancelled':
+            cur.execute("""
+                SELECT room_id, check_in, check_out, status
+                FROM bookings WHERE property_id = %s AND id = %s
+            """, (property_id, booking_id))
+            booking = cur.fetchone()
+
+            if booking and booking['status'] == 'cancelled':
+                lock_room(cur, booking['room_id'])
+                conflict = find_conflict(cur, property_id, booking['room_id'], booking['check_in'],
+                                         booking['check_out'], exclude_booking_id=booking_id)
+                if conflict is not None:
+                    raise HttpError(409, 'Room is not available for selected dates')
+
+        cur.execute("""
+            UPDATE bookings
+            SET status = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE property_id = %s AND id = %s
+        """, (status, property_id, booking_id))
+        conn.commit()
+
+    return response(200, {'message': 'Booking updated successfully'})
+
+
+@router.route('DELETE', '/')
+def delete_booking(request: Request) -> Dict[str, Any]:
+    body = request.body
+    conn = request.conn
+    property_id = request.property_id
+
+    if isinstance(body.get('bookingIds'), list):
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                results = delete_bookings(cur, property_id, body['bookingIds'])
                 conn.commit()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'message': 'Booking deleted successfully'}),
-                    'isBase64Encoded': False
-                }
-        
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
-    
-    finally:
-        conn.close()
+        except (TypeError, ValueError):
+            raise HttpError(400, 'Invalid bookingId')
+
+        return response(200, {'results': results})
+
+    booking_id = body.get('bookingId')
+
+    if not booking_id:
+        raise HttpError(400, 'Missing bookingId')
+
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM bookings WHERE property_id = %s AND id = %s", (property_id, booking_id))
+        conn.commit()
+
+    return response(200, {'message': 'Booking deleted successfully'})
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return router.dispatch(event, context)
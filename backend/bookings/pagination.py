@@ -0,0 +1,33 @@
+"""
+Keyset-пагинация списка бронирований по (created_at, id)
+Курсор непрозрачен для клиента: это base64 от позиции последней выданной строки
+"""
+import base64
+from datetime import datetime
+from typing import Tuple
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def encode_cursor(created_at: datetime, booking_id: int) -> str:
+    raw = '%s|%d' % (created_at.isoformat(), booking_id)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, booking_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(booking_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def parse_limit(value: str) -> int:
+    if not value:
+        return DEFAULT_LIMIT
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('Invalid limit')
+    return min(limit, MAX_LIMIT)
@@ -0,0 +1,298 @@
+"""
+Пул соединений с PostgreSQL
+Соединения переживают тёплые вызовы функции, проверяются перед выдачей
+и переоткрываются, если сервер их закрыл.
+Чтение может уходить на реплики из DATABASE_REPLICA_URLS (через запятую).
+Чтобы клиент видел собственные записи, после записи ему отдаётся LSN
+основной базы, и реплика берётся только если уже воспроизвела этот LSN,
+иначе запрос читает с основной базы. Для локальной проверки репликой может
+служить сама основная база: pg_last_wal_replay_lsn() там NULL, и она считается
+догнавшей любой LSN
+"""
+import itertools
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+import tracing
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 5,
+                 timeout: float = 5.0, max_idle: float = 300.0, ping_after: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Invalid pool size: min=%s max=%s' % (min_size, max_size))
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+        self._idle: List[Tuple[Any, float]] = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._counters: Dict[str, int] = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'reconnects': 0,
+        }
+        self._warmed = False
+        self.replayed_lsn = 0
+
+    def _connect(self):
+        with tracing.phase('connect'):
+            return psycopg2.connect(self.dsn, connection_factory=tracing.TracedConnection)
+
+    def _discard(self, conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        status = conn.info.transaction_status
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                return False
+        if time.monotonic() - last_used < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _warm_up(self) -> None:
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            missing = self.min_size - self._size
+            self._size += max(missing, 0)
+        opened = 0
+        try:
+            for _ in range(max(missing, 0)):
+                conn = self._connect()
+                opened += 1
+                with self._cond:
+                    self._idle.append((conn, time.monotonic()))
+                    self._cond.notify()
+        finally:
+            if opened < missing:
+                with self._cond:
+                    self._size -= missing - opened
+                    self._cond.notify_all()
+
+    def _trim(self) -> None:
+        now = time.monotonic()
+        stale = []
+        with self._cond:
+            while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle:
+                stale.append(self._idle.pop(0)[0])
+                self._size -= 1
+        for conn in stale:
+            self._discard(conn)
+
+    def getconn(self):
+        if not self._warmed:
+            try:
+                self._warm_up()
+            except psycopg2.OperationalError:
+                pass
+        self._trim()
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout('No free database connection within %.1fs' % self.timeout)
+                    if not waited:
+                        self._counters['waits'] += 1
+                        waited = True
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    conn, last_used = None, 0.0
+                    self._size += 1
+
+            if conn is not None:
+                if self._is_healthy(conn, last_used):
+                    with self._cond:
+                        self._counters['hits'] += 1
+                    return conn
+                self._discard(conn)
+                with self._cond:
+                    self._counters['reconnects'] += 1
+                    self._size -= 1
+                continue
+
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._counters['misses'] += 1
+            return conn
+
+    def putconn(self, conn) -> None:
+        reusable = not conn.closed
+        if reusable and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+        if not reusable:
+            self._discard(conn)
+        with self._cond:
+            if reusable:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+            self._cond.notify()
+
+    def closeall(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._warmed = False
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            result: Dict[str, Any] = dict(self._counters)
+            result['size'] = self._size
+            result['idle'] = len(self._idle)
+            result['minSize'] = self.min_size
+            result['maxSize'] = self.max_size
+        return result
+
+
+_pool: Optional[ConnectionPool] = None
+_replicas: Optional[List[ConnectionPool]] = None
+_pool_lock = threading.Lock()
+_replica_turn = itertools.count()
+_routing_lock = threading.Lock()
+_routing: Dict[str, int] = {
+    'replica': 0,
+    'primaryLagging': 0,
+    'primaryReplicaDown': 0,
+}
+
+
+def _pool_from_env(dsn: str) -> ConnectionPool:
+    return ConnectionPool(
+        dsn,
+        min_size=int(os.environ.get('DB_POOL_MIN_SIZE', '1')),
+        max_size=int(os.environ.get('DB_POOL_MAX_SIZE', '5')),
+        timeout=float(os.environ.get('DB_POOL_TIMEOUT', '5')),
+        max_idle=float(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+        ping_after=float(os.environ.get('DB_POOL_PING_AFTER', '30')),
+    )
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _pool_from_env(os.environ['DATABASE_URL'])
+    return _pool
+
+
+def get_replica_pools() -> List[ConnectionPool]:
+    global _replicas
+    if _replicas is None:
+        with _pool_lock:
+            if _replicas is None:
+                dsns = [dsn.strip() for dsn in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')]
+                _replicas = [_pool_from_env(dsn) for dsn in dsns if dsn]
+    return _replicas
+
+
+def parse_lsn(text: str) -> int:
+    high, low = text.split('/')
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def format_lsn(value: int) -> str:
+    return '%X/%X' % (value >> 32, value & 0xFFFFFFFF)
+
+
+def current_lsn(conn) -> str:
+    with conn.cursor() as cur:
+        cur.execute('SELECT pg_current_wal_lsn()::TEXT')
+        return cur.fetchone()[0]
+
+
+def _count(name: str) -> None:
+    with _routing_lock:
+        _routing[name] += 1
+
+
+def _caught_up(pool: ConnectionPool, conn, min_lsn: int) -> bool:
+    if pool.replayed_lsn >= min_lsn:
+        return True
+    with conn.cursor() as cur:
+        cur.execute('SELECT pg_last_wal_replay_lsn()::TEXT')
+        replayed = cur.fetchone()[0]
+    if replayed is None:
+        return True
+    pool.replayed_lsn = max(pool.replayed_lsn, parse_lsn(replayed))
+    return pool.replayed_lsn >= min_lsn
+
+
+def acquire_read(min_lsn: Optional[int] = None) -> Tuple[ConnectionPool, Any]:
+    """Соединение для чтения: реплика по кругу, если она догнала min_lsn, иначе основная база."""
+    replicas = get_replica_pools()
+    if replicas:
+        pool = replicas[next(_replica_turn) % len(replicas)]
+        try:
+            conn = pool.getconn()
+        except (psycopg2.OperationalError, PoolTimeout):
+            _count('primaryReplicaDown')
+        else:
+            try:
+                fresh = min_lsn is None or _caught_up(pool, conn, min_lsn)
+            except psycopg2.Error:
+                fresh = None
+            if fresh:
+                _count('replica')
+                return pool, conn
+            pool.putconn(conn)
+            _count('primaryLagging' if fresh is False else 'primaryReplicaDown')
+    pool = get_pool()
+    return pool, pool.getconn()
+
+
+def routing_stats() -> Dict[str, Any]:
+    with _routing_lock:
+        result: Dict[str, Any] = dict(_routing)
+    result['replicas'] = [dict(pool.stats(), replayedLsn=format_lsn(pool.replayed_lsn))
+                          for pool in get_replica_pools()]
+    return result
@@ -0,0 +1,65 @@
+"""
+Обработчик очереди событий бронирований
+Вызывается триггером-таймером или вручную через POST и отправляет письма
+по событиям из booking_outbox, не задерживая запросы к функции bookings.
+Запуск по таймеру также удаляет истёкшие удержания номеров и отменяет
+брони, слишком долго ждущие подтверждения
+"""
+import json
+import os
+import sys
+import time
+from psycopg2.extras import RealDictCursor
+from typing import Dict, Any
+
+from db import get_pool
+from mailer import get_sender
+from runtime import Router, Request, HttpError, response
+from sweeper import expire_pending_bookings, holds_stats, sweep_holds
+from worker import OUTBOX_BATCH_SIZE, drain, outbox_stats
+
+OUTBOX_TIME_BUDGET = float(os.environ.get('OUTBOX_TIME_BUDGET', '20'))
+
+router = Router(allow_methods='GET, POST, OPTIONS')
+
+
+def time_budget(context: Any) -> float:
+    remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    if remaining is None:
+        return OUTBOX_TIME_BUDGET
+    return max(min(OUTBOX_TIME_BUDGET, remaining() / 1000.0 - 2), 0.0)
+
+
+@router.route('GET', '/')
+def get_outbox_stats(request: Request) -> Dict[str, Any]:
+    with request.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        stats = outbox_stats(cur)
+        stats.update(holds_stats(cur))
+    return response(200, stats)
+
+
+@router.route('POST', '/')
+def drain_outbox(request: Request) -> Dict[str, Any]:
+    batch_size = request.body.get('batchSize', OUTBOX_BATCH_SIZE)
+    if not isinstance(batch_size, int) or not 0 < batch_size <= 1000:
+        raise HttpError(400, 'batchSize must be between 1 and 1000')
+
+    result = drain(request.conn, get_sender(), time_budget(request.context), batch_size)
+    return response(200, result)
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    if 'httpMethod' not in event:
+        pool = get_pool()
+        conn = pool.getconn()
+        try:
+            budget = time_budget(context)
+            started = time.monotonic()
+            result = drain(conn, get_sender(), budget)
+            result.update(sweep_holds(conn, budget - (time.monotonic() - started)))
+            result.update(expire_pending_bookings(conn, budget - (time.monotonic() - started)))
+        finally:
+            pool.putconn(conn)
+        print(json.dumps(dict(result, type='outbox'), ensure_ascii=False), file=sys.stdout)
+        return result
+    return router.dispatch(event, context)
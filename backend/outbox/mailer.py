@@ -0,0 +1,75 @@
+"""
+Отправка писем гостям
+MAIL_SENDER=stub (по умолчанию) не ходит в сеть: последние STUB_KEEP_SENT писем
+хранятся в памяти и каждое пишется строкой лога, адреса на @fail.local имитируют отказ почтового сервера;
+MAIL_SENDER=smtp отправляет через SMTP_HOST/SMTP_PORT/SMTP_USER/SMTP_PASSWORD
+"""
+import json
+import os
+import smtplib
+import sys
+from collections import deque
+from email.message import EmailMessage
+from typing import Deque, Dict, Any, Optional
+
+MAIL_FROM = os.environ.get('MAIL_FROM', 'noreply@hotel.local')
+STUB_FAIL_DOMAIN = '@fail.local'
+STUB_KEEP_SENT = int(os.environ.get('STUB_KEEP_SENT', '100'))
+
+
+class MailError(Exception):
+    pass
+
+
+class StubMailSender:
+    def __init__(self, keep: int = STUB_KEEP_SENT):
+        self.sent: Deque[Dict[str, Any]] = deque(maxlen=keep)
+
+    def send(self, to: str, subject: str, text: str) -> None:
+        if to.endswith(STUB_FAIL_DOMAIN):
+            raise MailError('Stub mail server rejected %s' % to)
+        message = {'to': to, 'subject': subject, 'text': text}
+        self.sent.append(message)
+        print(json.dumps(dict(message, type='mail'), ensure_ascii=False), file=sys.stdout)
+
+
+class SmtpMailSender:
+    def __init__(self, host: str, port: int, user: str = '', password: str = ''):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+
+    def send(self, to: str, subject: str, text: str) -> None:
+        message = EmailMessage()
+        message['From'] = MAIL_FROM
+        message['To'] = to
+        message['Subject'] = subject
+        message.set_content(text)
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+                if self.port == 587:
+                    smtp.starttls()
+                if self.user:
+                    smtp.login(self.user, self.password)
+                smtp.send_message(message)
+        except (OSError, smtplib.SMTPException) as e:
+            raise MailError(str(e))
+
+
+_sender: Optional[Any] = None
+
+
+def get_sender() -> Any:
+    global _sender
+    if _sender is None:
+        if os.environ.get('MAIL_SENDER', 'stub') == 'smtp':
+            _sender = SmtpMailSender(
+                os.environ['SMTP_HOST'],
+                int(os.environ.get('SMTP_PORT', '587')),
+                os.environ.get('SMTP_USER', ''),
+                os.environ.get('SMTP_PASSWORD', ''),
+            )
+        else:
+            _sender = StubMailSender()
+    return _sender
@@ -0,0 +1,116 @@
+"""
+Удаление истёкших удержаний номеров и отмена неподтверждённых броней
+Истёкшее удержание уже не занимает номер, поэтому строки booking_holds
+удаляются не в запросах, а пачками при запусках обработчика по таймеру;
+таблица остаётся маленькой, и проверки удержаний стоят дёшево.
+Бронь, остающаяся в статусе pending дольше PENDING_BOOKING_TTL секунд
+после создания, отменяется тем же запуском: иначе такие брони копятся,
+занимают номера и завышают pendingBookings. Отмена идёт через обычный
+UPDATE, так что триггеры обновляют занятость, статистику и outbox;
+блокировки номеров берутся до строк броней по возрастанию id номера, как и в
+функции bookings, чтобы не получать взаимных блокировок
+"""
+import os
+import time
+from typing import Dict, Any, Tuple
+
+HOLD_SWEEP_BATCH = int(os.environ.get('HOLD_SWEEP_BATCH', '1000'))
+PENDING_BOOKING_TTL = int(os.environ.get('PENDING_BOOKING_TTL', '86400'))
+PENDING_SWEEP_BATCH = int(os.environ.get('PENDING_SWEEP_BATCH', '200'))
+ROOM_LOCK_NAMESPACE = 1001
+
+SWEEP_SQL = """
+    DELETE FROM booking_holds
+    WHERE id IN (
+        SELECT id FROM booking_holds
+        WHERE expires_at <= CURRENT_TIMESTAMP
+        ORDER BY expires_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+STALE_PENDING_SQL = """
+    SELECT id, room_id
+    FROM bookings
+    WHERE status = 'pending'
+      AND created_at <= CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+    ORDER BY created_at
+    LIMIT %s
+"""
+
+LOCK_ROOMS_SQL = """
+    SELECT pg_advisory_xact_lock(%s, room_id)
+    FROM unnest(%s::INTEGER[]) WITH ORDINALITY AS r(room_id, n)
+    ORDER BY n
+"""
+
+CANCEL_PENDING_SQL = """
+    UPDATE bookings
+    SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+    WHERE id = ANY(%s)
+      AND status = 'pending'
+      AND created_at <= CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+"""
+
+
+def sweep_batch(conn: Any, batch_size: int = HOLD_SWEEP_BATCH) -> int:
+    with conn.cursor() as cur:
+        cur.execute(SWEEP_SQL, (batch_size,))
+        deleted = cur.rowcount
+    conn.commit()
+    return deleted
+
+
+def sweep_holds(conn: Any, time_budget: float, batch_size: int = HOLD_SWEEP_BATCH) -> Dict[str, int]:
+    """Удаляет истёкшие удержания; первая пачка выполняется даже при исчерпанном бюджете."""
+    deadline = time.monotonic() + time_budget
+    totals = {'expiredHolds': 0, 'sweepBatches': 0}
+    while True:
+        deleted = sweep_batch(conn, batch_size)
+        totals['sweepBatches'] += 1
+        totals['expiredHolds'] += deleted
+        if deleted < batch_size or time.monotonic() >= deadline:
+            break
+    return totals
+
+
+def expire_pending_batch(conn: Any, ttl: int = PENDING_BOOKING_TTL,
+                         batch_size: int = PENDING_SWEEP_BATCH) -> Tuple[int, int]:
+    """Отменяет пачку просроченных pending-броней; (найдено, отменено)."""
+    with conn.cursor() as cur:
+        cur.execute(STALE_PENDING_SQL, (ttl, batch_size))
+        rows = cur.fetchall()
+        cancelled = 0
+        if rows:
+            rooms = sorted({room_id for _, room_id in rows if room_id is not None})
+            cur.execute(LOCK_ROOMS_SQL, (ROOM_LOCK_NAMESPACE, rooms))
+            cur.execute(CANCEL_PENDING_SQL, ([booking_id for booking_id, _ in rows], ttl))
+            cancelled = cur.rowcount
+    conn.commit()
+    return len(rows), cancelled
+
+
+def expire_pending_bookings(conn: Any, time_budget: float, ttl: int = PENDING_BOOKING_TTL,
+                            batch_size: int = PENDING_SWEEP_BATCH) -> Dict[str, int]:
+    """Отменяет брони, дольше ttl секунд ждущие подтверждения; ttl=0 отключает отмену."""
+    totals = {'expiredBookings': 0}
+    if ttl <= 0:
+        return totals
+    deadline = time.monotonic() + time_budget
+    while True:
+        found, cancelled = expire_pending_batch(conn, ttl, batch_size)
+        totals['expiredBookings'] += cancelled
+        if found < batch_size or time.monotonic() >= deadline:
+            break
+    return totals
+
+
+def holds_stats(cur: Any) -> Dict[str, Any]:
+    cur.execute("""
+        SELECT COUNT(*) FILTER (WHERE expires_at > CURRENT_TIMESTAMP) AS active,
+               COUNT(*) FILTER (WHERE expires_at <= CURRENT_TIMESTAMP) AS expired
+        FROM booking_holds
+    """)
+    row = cur.fetchone()
+    return {'activeHolds': row['active'], 'expiredHolds': row['expired']}
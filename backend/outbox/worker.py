@@ -0,0 +1,141 @@
+"""
+Разбор очереди booking_outbox пачками
+Пачка забирается через FOR UPDATE SKIP LOCKED, поэтому несколько экземпляров
+обработчика не мешают друг другу; успешно обработанные события удаляются,
+неудачные откладываются с экспоненциальной задержкой, а после исчерпания
+попыток помечаются как 'dead'
+"""
+import os
+import random
+import time
+from typing import Dict, Any, Callable, List
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_BACKOFF_BASE = float(os.environ.get('OUTBOX_BACKOFF_BASE', '5'))
+OUTBOX_BACKOFF_MAX = float(os.environ.get('OUTBOX_BACKOFF_MAX', '3600'))
+
+CLAIM_SQL = """
+    SELECT id, event_type, payload, attempts
+    FROM booking_outbox
+    WHERE status = 'pending' AND available_at <= CURRENT_TIMESTAMP
+    ORDER BY available_at, id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+CREATED_STATUS_TEXT = {
+    'pending': 'ожидает подтверждения',
+    'confirmed': 'подтверждено',
+}
+
+STATUS_SUBJECTS = {
+    'confirmed': 'Бронирование №%d подтверждено',
+    'cancelled': 'Бронирование №%d отменено',
+}
+
+
+def backoff(attempts: int) -> float:
+    delay = min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _stay(payload: Dict[str, Any], rooms: Dict[int, str]) -> str:
+    return '%s, %s — %s, гостей: %s, стоимость: %s ₽' % (
+        rooms.get(payload.get('roomId'), 'номер'), payload['checkIn'], payload['checkOut'],
+        payload['guestsCount'], payload['totalPrice'])
+
+
+def send_created(payload: Dict[str, Any], rooms: Dict[int, str], sender: Any) -> None:
+    sender.send(payload['guestEmail'], 'Бронирование №%d принято' % payload['bookingId'],
+                'Здравствуйте, %s!\n\nМы получили вашу заявку: %s.\nСтатус: %s.' % (
+                    payload['guestName'], _stay(payload, rooms),
+                    CREATED_STATUS_TEXT.get(payload['status'], payload['status'])))
+
+
+def send_status_changed(payload: Dict[str, Any], rooms: Dict[int, str], sender: Any) -> None:
+    subject = STATUS_SUBJECTS.get(payload['status'])
+    if subject is None:
+        return
+    sender.send(payload['guestEmail'], subject % payload['bookingId'],
+                'Здравствуйте, %s!\n\n%s.' % (payload['guestName'], _stay(payload, rooms)))
+
+
+EVENT_HANDLERS: Dict[str, Callable[[Dict[str, Any], Dict[int, str], Any], None]] = {
+    'booking.created': send_created,
+    'booking.status_changed': send_status_changed,
+}
+
+
+def drain_batch(conn: Any, sender: Any, batch_size: int = OUTBOX_BATCH_SIZE) -> Dict[str, int]:
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(CLAIM_SQL, (batch_size,))
+        events = cur.fetchall()
+        if not events:
+            conn.rollback()
+            return {'claimed': 0, 'sent': 0, 'retried': 0, 'dead': 0}
+
+        room_ids = list({event['payload'].get('roomId') for event in events} - {None})
+        cur.execute("SELECT id, name FROM rooms WHERE id = ANY(%s)", (room_ids,))
+        rooms = {row['id']: row['name'] for row in cur.fetchall()}
+
+        done: List[int] = []
+        failed: List[tuple] = []
+        for event in events:
+            try:
+                handle = EVENT_HANDLERS.get(event['event_type'])
+                if handle is None:
+                    raise ValueError('Unknown event type %s' % event['event_type'])
+                handle(event['payload'], rooms, sender)
+                done.append(event['id'])
+            except Exception as e:
+                attempts = event['attempts'] + 1
+                status = 'dead' if attempts >= OUTBOX_MAX_ATTEMPTS else 'pending'
+                failed.append((event['id'], status, attempts, '%s: %s' % (type(e).__name__, e), backoff(attempts)))
+
+        if done:
+            cur.execute("DELETE FROM booking_outbox WHERE id = ANY(%s)", (done,))
+        if failed:
+            execute_values(cur, """
+                UPDATE booking_outbox o
+                SET status = v.status, attempts = v.attempts, last_error = v.error,
+                    available_at = CURRENT_TIMESTAMP + v.delay * INTERVAL '1 second'
+                FROM (VALUES %s) AS v(id, status, attempts, error, delay)
+                WHERE o.id = v.id
+            """, failed, template='(%s::bigint, %s, %s::integer, %s, %s::float8)', page_size=len(failed))
+        conn.commit()
+
+    dead = sum(1 for item in failed if item[1] == 'dead')
+    return {'claimed': len(events), 'sent': len(done), 'retried': len(failed) - dead, 'dead': dead}
+
+
+def drain(conn: Any, sender: Any, time_budget: float, batch_size: int = OUTBOX_BATCH_SIZE) -> Dict[str, int]:
+    deadline = time.monotonic() + time_budget
+    totals = {'claimed': 0, 'sent': 0, 'retried': 0, 'dead': 0, 'batches': 0}
+    while time.monotonic() < deadline:
+        result = drain_batch(conn, sender, batch_size)
+        totals['batches'] += 1
+        for name, value in result.items():
+            totals[name] += value
+        if result['claimed'] < batch_size:
+            break
+    return totals
+
+
+def outbox_stats(cur: Any) -> Dict[str, Any]:
+    cur.execute("""
+        SELECT COUNT(*) FILTER (WHERE status = 'pending') AS pending,
+               COUNT(*) FILTER (WHERE status = 'pending' AND available_at <= CURRENT_TIMESTAMP) AS ready,
+               COUNT(*) FILTER (WHERE status = 'dead') AS dead,
+               MIN(created_at) FILTER (WHERE status = 'pending') AS oldest_pending
+        FROM booking_outbox
+    """)
+    row = cur.fetchone()
+    return {
+        'pending': row['pending'],
+        'ready': row['ready'],
+        'dead': row['dead'],
+        'oldestPending': row['oldest_pending'].isoformat() if row['oldest_pending'] else None
+    }
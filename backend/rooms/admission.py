@@ -0,0 +1,208 @@
+"""
+Допуск запросов к обработчикам
+Частота ограничивается корзиной токенов на клиента (IP от шлюза) и маршрут: корзина
+вмещает burst запросов и пополняется со скоростью rate в секунду. Корзины
+хранятся в памяти экземпляра функции или, при RATE_LIMIT_BACKEND=postgres,
+в таблице rate_limit_buckets, общей для всех экземпляров. По умолчанию
+ограничиваются только записи, чтение — если задан RATE_LIMIT_READ_RATE.
+Предел одновременных запросов MAX_IN_FLIGHT действует только внутри
+экземпляра: он отсекает лишние запросы сразу, а не в очереди за соединением
+пула, но общую нагрузку на базу не ограничивает — её верхняя граница
+равна числу экземпляров × DB_POOL_MAX_SIZE и задаётся лимитом
+параллельных экземпляров функции и max_connections
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import psycopg2
+
+import tracing
+from db import get_pool, PoolTimeout
+
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_WRITE_RATE = float(os.environ.get('RATE_LIMIT_WRITE_RATE', '2'))
+RATE_LIMIT_WRITE_BURST = float(os.environ.get('RATE_LIMIT_WRITE_BURST', '10'))
+RATE_LIMIT_READ_RATE = float(os.environ.get('RATE_LIMIT_READ_RATE', '0'))
+RATE_LIMIT_READ_BURST = float(os.environ.get('RATE_LIMIT_READ_BURST', '50'))
+MAX_IN_FLIGHT = int(os.environ.get('MAX_IN_FLIGHT', str(2 * int(os.environ.get('DB_POOL_MAX_SIZE', '5')))))
+
+MEMORY_MAX_BUCKETS = 10000
+PURGE_INTERVAL = 60.0
+PURGE_BATCH = 500
+BUCKET_IDLE_TTL = 3600
+
+TAKE_SQL = """
+    INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+    VALUES (%(key)s, %(burst)s - 1, CURRENT_TIMESTAMP)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - b.updated_at)::FLOAT8 * %(rate)s) - 1,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - b.updated_at)::FLOAT8 * %(rate)s) >= 1
+    RETURNING tokens
+"""
+
+REMAINING_SQL = """
+    SELECT LEAST(%(burst)s, tokens + EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - updated_at)::FLOAT8 * %(rate)s)
+    FROM rate_limit_buckets
+    WHERE key = %(key)s
+"""
+
+PURGE_SQL = """
+    DELETE FROM rate_limit_buckets
+    WHERE key IN (
+        SELECT key FROM rate_limit_buckets
+        WHERE updated_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+
+class MemoryBuckets:
+    """Корзины внутри экземпляра; при переполнении вытесняется давно не обновлявшаяся."""
+
+    name = 'memory'
+
+    def __init__(self, max_buckets: int = MEMORY_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """Берёт токен; 0, если он был, иначе секунды до появления следующего."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class PostgresBuckets:
+    """Корзины в rate_limit_buckets: проверка и списание токена — один upsert на основной базе."""
+
+    name = 'postgres'
+
+    def __init__(self):
+        self._last_purge = 0.0
+        self._purge_lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        params = {'key': key, 'rate': rate, 'burst': burst}
+        pool = get_pool()
+        conn = pool.getconn()
+        try:
+            with tracing.phase('ratelimit'), conn.cursor() as cur:
+                cur.execute(TAKE_SQL, params)
+                if cur.fetchone() is not None:
+                    wait = 0.0
+                else:
+                    cur.execute(REMAINING_SQL, params)
+                    row = cur.fetchone()
+                    wait = (1 - row[0]) / rate if row else 1 / rate
+                self._maybe_purge(cur)
+            conn.commit()
+        finally:
+            pool.putconn(conn)
+        return wait
+
+    def _maybe_purge(self, cur: Any) -> None:
+        now = time.monotonic()
+        with self._purge_lock:
+            if now - self._last_purge < PURGE_INTERVAL:
+                return
+            self._last_purge = now
+        cur.execute(PURGE_SQL, (BUCKET_IDLE_TTL, PURGE_BATCH))
+
+
+BACKENDS = {
+    'memory': MemoryBuckets,
+    'postgres': PostgresBuckets,
+}
+
+
+def client_id(event: Dict[str, Any]) -> str:
+    """Адрес клиента от шлюза; X-Forwarded-For задаёт сам клиент, поэтому без адреса — общая корзина."""
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    return identity.get('sourceIp') or 'anonymous'
+
+
+class Admission:
+    def __init__(self, backend: Any, write_limit: Tuple[float, float], read_limit: Tuple[float, float],
+                 max_in_flight: int):
+        self.backend = backend
+        self.write_limit = write_limit
+        self.read_limit = read_limit
+        self.max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            'admitted': 0,
+            'rateLimited': 0,
+            'shed': 0,
+            'backendErrors': 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> 'Admission':
+        if RATE_LIMIT_BACKEND not in BACKENDS:
+            raise ValueError('RATE_LIMIT_BACKEND must be one of: %s' % ', '.join(BACKENDS))
+        return cls(BACKENDS[RATE_LIMIT_BACKEND](), (RATE_LIMIT_WRITE_RATE, RATE_LIMIT_WRITE_BURST),
+                   (RATE_LIMIT_READ_RATE, RATE_LIMIT_READ_BURST), MAX_IN_FLIGHT)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def enter(self) -> bool:
+        """Занимает место среди одновременных запросов экземпляра; False — экземпляр перегружен."""
+        with self._lock:
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                self._counters['shed'] += 1
+                return False
+            self._in_flight += 1
+            return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def check_rate(self, event: Dict[str, Any], method: str, route: str, write: bool) -> float:
+        """0, если запрос допущен, иначе секунды до следующей попытки."""
+        rate, burst = self.write_limit if write else self.read_limit
+        if rate <= 0:
+            self._count('admitted')
+            return 0.0
+        key = '%s|%s %s' % (client_id(event), method, route)
+        try:
+            wait = self.backend.take(key, rate, burst)
+        except (psycopg2.Error, PoolTimeout):
+            self._count('backendErrors')
+            wait = 0.0
+        self._count('rateLimited' if wait else 'admitted')
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result: Dict[str, Any] = dict(self._counters)
+            result['inFlight'] = self._in_flight
+        result['maxInFlight'] = self.max_in_flight
+        result['backend'] = self.backend.name
+        return result
+
+
+admission = Admission.from_env()
+
+
+def admission_stats() -> Dict[str, Any]:
+    return admission.stats()
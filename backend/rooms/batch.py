@@ -0,0 +1,58 @@
+"""
+Пакетная проверка доступности и цены номеров на даты
+Номера выбираются одним запросом вместе с признаком доступности по индексу
+room_occupancy, цены считаются для всего набора сразу, поэтому число
+обращений к базе не зависит от числа номеров на странице результатов.
+Категория может содержать больше MAX_QUOTE_ROOMS номеров: тогда возвращаются
+самые дешёвые из них, а признак truncated сообщает, что список неполный
+"""
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
+
+from occupancy import availability_filter
+from pricing import MAX_QUOTE_ROOMS, quote_loaded_rooms
+
+
+def fetch_batch(cur: Any, property_id: int, check_in: date, check_out: date, room_ids: Optional[List[int]] = None,
+                category: Optional[str] = None, guests: Optional[int] = None) -> Tuple[List[Dict[str, Any]], bool]:
+    free_sql, free_params = availability_filter(check_in, check_out)
+    query = """
+        SELECT r.id, r.name, r.price_per_night, r.rate_plan_id, r.category_id, r.max_guests, r.image_url,
+               rc.code AS category_code, rc.name AS category_name,
+               (r.status <> 'maintenance' AND %s) AS is_free
+        FROM rooms r
+        LEFT JOIN room_categories rc ON r.category_id = rc.id
+        WHERE r.property_id = %%s AND %s
+        ORDER BY r.price_per_night, r.id
+        LIMIT %%s
+    """ % (free_sql, 'r.id = ANY(%s)' if room_ids is not None else 'rc.code = %s')
+    params: List[Any] = list(free_params)
+    params.append(property_id)
+    params.append(room_ids if room_ids is not None else category)
+    params.append(MAX_QUOTE_ROOMS + 1)
+
+    cur.execute(query, params)
+    rooms = cur.fetchall()
+    truncated = len(rooms) > MAX_QUOTE_ROOMS
+    rooms = rooms[:MAX_QUOTE_ROOMS]
+    quotes = quote_loaded_rooms(cur, rooms, check_in, check_out, property_id)
+
+    result = []
+    for room in rooms:
+        fits = guests is None or room['max_guests'] >= guests
+        quote = quotes[room['id']]
+        result.append({
+            'id': room['id'],
+            'name': room['name'],
+            'category': room['category_code'],
+            'categoryName': room['category_name'],
+            'guests': room['max_guests'],
+            'image': room['image_url'],
+            'available': bool(room['is_free']) and fits,
+            'fitsGuests': fits,
+            'totalPrice': quote['totalPrice'],
+            'averageNightly': quote['averageNightly'],
+            'ratePlan': quote['ratePlan'],
+            'discountPercent': quote['discountPercent']
+        })
+    return result, truncated
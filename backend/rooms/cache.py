@@ -0,0 +1,94 @@
+"""
+Кэш сериализованного каталога номеров внутри тёплого экземпляра функции
+В пределах TTL ответ отдаётся без обращения к базе; после TTL сверяется
+версия каталога из catalogue_version, и JSON пересобирается, только если
+номера действительно менялись
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+CATALOGUE_CACHE_TTL = float(os.environ.get('CATALOGUE_CACHE_TTL', '30'))
+CATALOGUE_CACHE_MAX_ENTRIES = 32
+
+
+class CacheEntry:
+    __slots__ = ('version', 'etag', 'body', 'expires_at')
+
+    def __init__(self, version: int, etag: str, body: str, expires_at: float):
+        self.version = version
+        self.etag = etag
+        self.body = body
+        self.expires_at = expires_at
+
+
+class CatalogueCache:
+    def __init__(self, ttl: float = CATALOGUE_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, CacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def get_fresh(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            return entry
+        return None
+
+    def revalidate(self, key: str, version: int) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            entry.expires_at = time.monotonic() + self.ttl
+            return entry
+
+    def put(self, key: str, version: int, body: str) -> CacheEntry:
+        etag = '"%s"' % hashlib.sha1(body.encode('utf-8')).hexdigest()
+        entry = CacheEntry(version, etag, body, time.monotonic() + self.ttl)
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e.version != version]
+            for k in stale:
+                del self._entries[k]
+            if key not in self._entries and len(self._entries) >= CATALOGUE_CACHE_MAX_ENTRIES:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = entry
+        return entry
+
+
+def fetch_catalogue_version(cur: Any) -> int:
+    cur.execute("SELECT version FROM catalogue_version WHERE id = 1")
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or ('W/' + etag) in candidates
+
+
+def catalogue_response(entry: CacheEntry, if_none_match: Optional[str], ttl: float) -> Dict[str, Any]:
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'ETag',
+        'Cache-Control': 'public, max-age=%d' % int(ttl),
+        'Vary': 'X-Property-Id',
+        'ETag': entry.etag
+    }
+    if etag_matches(if_none_match, entry.etag):
+        return {
+            'statusCode': 304,
+            'headers': headers,
+            'body': '',
+            'isBase64Encoded': False
+        }
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': entry.body,
+        'isBase64Encoded': False
+    }
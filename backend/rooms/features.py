@@ -0,0 +1,14 @@
+"""
+Словарь удобств номеров
+Номера хранят удобства ссылками feature_ids на таблицу room_features;
+названия подгружаются одним запросом только для встретившихся в ответе id
+"""
+from typing import Any, Dict, Iterable
+
+
+def load_feature_names(cur: Any, feature_ids: Iterable[int]) -> Dict[int, str]:
+    ids = sorted(set(feature_ids))
+    if not ids:
+        return {}
+    cur.execute("SELECT id, name FROM room_features WHERE id = ANY(%s)", (ids,))
+    return {row[0]: row[1] for row in cur.fetchall()}
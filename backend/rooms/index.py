@@ -1,89 +1,197 @@
 """
 API для работы с номерами отеля
 Получение списка номеров с фильтрацией по категориям
+и поиском свободных номеров на даты для заданного числа гостей.
+Список поддерживает fields= (выбор колонок SQL) и layout=compact|columnar,
+в которых удобства отдаются id со словарём названий.
+Все выборки ограничены объектом сети запроса (X-Property-Id)
 """
-import json
-import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Sequence
 
+from batch import fetch_batch
+from cache import CatalogueCache, catalogue_response, fetch_catalogue_version
+from features import load_feature_names
+from occupancy import availability_filter, parse_stay
+from pricing import MAX_QUOTE_ROOMS, load_quotes
+from projection import parse_fields, parse_layout, select_list, to_columns, to_rows
+from runtime import Router, Request, HttpError, response, dumps
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    if method != 'GET':
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
-    
-    query_params = event.get('queryStringParameters') or {}
-    category = query_params.get('category', 'all')
-    
-    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+router = Router(allow_methods='GET, OPTIONS', allow_headers='Content-Type, If-None-Match')
+catalogue_cache = CatalogueCache()
+
+ROOM_COLUMNS = {
+    'id': 'r.id',
+    'name': 'r.name',
+    'category': 'rc.code',
+    'categoryName': 'rc.name',
+    'price': 'r.price_per_night',
+    'area': 'r.area',
+    'guests': 'r.max_guests',
+    'description': 'r.description',
+    'features': 'r.feature_ids',
+    'image': 'r.image_url',
+    'status': 'r.status',
+}
+
+
+@router.route('GET', '/quote')
+def quote_rooms(request: Request) -> Dict[str, Any]:
+    try:
+        check_in, check_out = parse_stay(request.query.get('checkIn', ''), request.query.get('checkOut', ''))
+    except ValueError:
+        raise HttpError(400, 'Invalid checkIn or checkOut')
+
+    try:
+        room_ids = sorted({int(value) for value in request.query.get('roomIds', '').split(',') if value})
+    except ValueError:
+        raise HttpError(400, 'Invalid roomIds')
+    if not room_ids or len(room_ids) > MAX_QUOTE_ROOMS:
+        raise HttpError(400, 'roomIds must list 1-%d rooms' % MAX_QUOTE_ROOMS)
+
+    with request.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        quotes = load_quotes(cur, room_ids, check_in, check_out, request.property_id)
+
+    return response(200, {
+        'checkIn': check_in.isoformat(),
+        'checkOut': check_out.isoformat(),
+        'quotes': [quotes[room_id] for room_id in room_ids if room_id in quotes]
+    })
+
+
+@router.route('GET', '/availability')
+def batch_availability(request: Request) -> Dict[str, Any]:
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            if category == 'all':
-                cur.execute("""
-                    SELECT r.*, rc.code as category_code, rc.name as category_name
-                    FROM rooms r
-                    LEFT JOIN room_categories rc ON r.category_id = rc.id
-                    ORDER BY r.price_per_night ASC
-                """)
-            else:
-                cur.execute("""
-                    SELECT r.*, rc.code as category_code, rc.name as category_name
-                    FROM rooms r
-                    LEFT JOIN room_categories rc ON r.category_id = rc.id
-                    WHERE rc.code = %s
-                    ORDER BY r.price_per_night ASC
-                """, (category,))
-            
-            rooms = cur.fetchall()
-            
-            result = []
+        check_in, check_out = parse_stay(request.query.get('checkIn', ''), request.query.get('checkOut', ''))
+    except ValueError:
+        raise HttpError(400, 'Invalid checkIn or checkOut')
+
+    room_ids = None
+    if request.query.get('roomIds'):
+        try:
+            room_ids = sorted({int(value) for value in request.query['roomIds'].split(',') if value})
+        except ValueError:
+            raise HttpError(400, 'Invalid roomIds')
+        if len(room_ids) > MAX_QUOTE_ROOMS:
+            raise HttpError(400, 'roomIds must list at most %d rooms' % MAX_QUOTE_ROOMS)
+    category = request.query.get('category')
+    if room_ids is None and not category:
+        raise HttpError(400, 'Provide roomIds or category')
+
+    guests = request.query.get('guests')
+    if guests is not None and not guests.isdigit():
+        raise HttpError(400, 'Invalid guests')
+
+    with request.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        rooms, truncated = fetch_batch(cur, request.property_id, check_in, check_out, room_ids=room_ids, category=category,
+                            guests=int(guests) if guests is not None else None)
+
+    return response(200, {
+        'checkIn': check_in.isoformat(),
+        'checkOut': check_out.isoformat(),
+        'rooms': rooms,
+        'truncated': truncated
+    })
+
+
+def render_rooms(fields: Sequence[str], rows: List[tuple], layout: str,
+                 feature_names: Optional[Dict[int, str]]) -> Dict[str, Any]:
+    if layout == 'columnar':
+        payload: Dict[str, Any] = {'rooms': to_columns(fields, rows), 'count': len(rows)}
+    else:
+        rooms = to_rows(fields, rows)
+        if layout == 'rows' and feature_names is not None:
+            resolved: Dict[tuple, List[str]] = {}
             for room in rooms:
-                result.append({
-                    'id': room['id'],
-                    'name': room['name'],
-                    'category': room['category_code'],
-                    'categoryName': room['category_name'],
-                    'price': room['price_per_night'],
-                    'area': room['area'],
-                    'guests': room['max_guests'],
-                    'description': room['description'],
-                    'features': room['features'] or [],
-                    'image': room['image_url'],
-                    'status': room['status']
-                })
-            
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'rooms': result}),
-                'isBase64Encoded': False
-            }
-    finally:
-        conn.close()
+                key = tuple(room['features'])
+                names = resolved.get(key)
+                if names is None:
+                    names = resolved[key] = [feature_names[i] for i in key if i in feature_names]
+                room['features'] = names
+        payload = {'rooms': rooms}
+
+    if layout != 'rows' and feature_names is not None:
+        payload['features'] = {str(feature_id): name for feature_id, name in feature_names.items()}
+    return payload
+
+
+@router.route('GET', '/')
+def list_rooms(request: Request) -> Dict[str, Any]:
+    category = request.query.get('category', 'all')
+    check_in = request.query.get('checkIn')
+    check_out = request.query.get('checkOut')
+    guests = request.query.get('guests')
+
+    try:
+        fields = parse_fields(request.query.get('fields'), ROOM_COLUMNS)
+        layout = parse_layout(request.query.get('layout'))
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    property_id = request.property_id
+
+    query = """
+        SELECT %s
+        FROM rooms r
+        LEFT JOIN room_categories rc ON r.category_id = rc.id
+        WHERE r.property_id = %%s
+    """ % select_list(fields, ROOM_COLUMNS)
+    params = [property_id]
+
+    if category != 'all':
+        query += " AND rc.code = %s"
+        params.append(category)
+
+    if check_in or check_out:
+        try:
+            stay = parse_stay(check_in or '', check_out or '')
+        except ValueError:
+            raise HttpError(400, 'Invalid checkIn or checkOut')
+
+        filter_sql, filter_params = availability_filter(*stay)
+        query += " AND r.status <> 'maintenance' AND " + filter_sql
+        params.extend(filter_params)
+
+    if guests:
+        if not guests.isdigit():
+            raise HttpError(400, 'Invalid guests')
+
+        query += " AND r.max_guests >= %s"
+        params.append(int(guests))
+
+    query += " ORDER BY r.price_per_night ASC"
+
+    cache_key = None if (check_in or check_out or guests) else '%s|%s|%s|%s' % (
+        property_id, category, ','.join(fields), layout)
+    if_none_match = request.header('If-None-Match')
+
+    if cache_key is not None:
+        entry = catalogue_cache.get_fresh(cache_key)
+        if entry is not None:
+            return catalogue_response(entry, if_none_match, catalogue_cache.ttl)
+
+    with request.conn.cursor() as cur:
+        if cache_key is not None:
+            version = fetch_catalogue_version(cur)
+            entry = catalogue_cache.revalidate(cache_key, version)
+            if entry is not None:
+                return catalogue_response(entry, if_none_match, catalogue_cache.ttl)
+
+        cur.execute(query, params)
+        rows = cur.fetchall()
+
+        feature_names = None
+        if 'features' in fields:
+            position = fields.index('features')
+            feature_names = load_feature_names(cur, (i for row in rows for i in row[position]))
+
+    payload = render_rooms(fields, rows, layout, feature_names)
+
+    if cache_key is not None:
+        entry = catalogue_cache.put(cache_key, version, dumps(payload))
+        return catalogue_response(entry, if_none_match, catalogue_cache.ttl)
+
+    return response(200, payload)
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return router.dispatch(event, context)
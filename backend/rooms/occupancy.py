@@ -0,0 +1,57 @@
+"""
+Поиск свободных номеров по индексу занятости room_occupancy
+Запрошенные ночи переводятся в битовые маски по годам, и номер подходит,
+если ни одна маска не пересекается с его картой занятости и на эти даты
+нет неистёкшего удержания из booking_holds (таблица маленькая, проверка дешёвая)
+"""
+from datetime import date, timedelta
+from typing import List, Tuple, Any
+
+NIGHTS_BITS = 366
+
+
+def night_masks(check_in: date, check_out: date) -> List[Tuple[int, str]]:
+    masks = []
+    current = check_in
+    while current < check_out:
+        year_start = date(current.year, 1, 1)
+        year_end = date(current.year + 1, 1, 1)
+        lo = (current - year_start).days
+        hi = (min(check_out, year_end) - year_start).days
+        masks.append((current.year, '0' * lo + '1' * (hi - lo) + '0' * (NIGHTS_BITS - hi)))
+        current = year_end
+    return masks
+
+
+def availability_filter(check_in: date, check_out: date) -> Tuple[str, List[Any]]:
+    conditions = []
+    params: List[Any] = []
+    for year, mask in night_masks(check_in, check_out):
+        conditions.append("(o.year = %s AND (o.nights & %s::bit(366)) <> %s::bit(366))")
+        params.extend([year, mask, '0' * NIGHTS_BITS])
+
+    sql = """
+        NOT EXISTS (
+            SELECT 1 FROM room_occupancy o
+            WHERE o.room_id = r.id AND (%s)
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM booking_holds h
+            WHERE h.room_id = r.id
+              AND h.expires_at > CURRENT_TIMESTAMP
+              AND h.check_out > %%s
+              AND h.check_in < %%s
+        )
+    """ % ' OR '.join(conditions)
+    params.extend([check_in, check_out])
+    return sql, params
+
+
+def parse_stay(check_in: str, check_out: str) -> Tuple[date, date]:
+    start = date.fromisoformat(check_in[:10])
+    end = date.fromisoformat(check_out[:10])
+    if end <= start:
+        raise ValueError('checkOut must be after checkIn')
+    if end - start > timedelta(days=NIGHTS_BITS):
+        raise ValueError('Stay is too long')
+    return start, end
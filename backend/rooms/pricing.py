@@ -0,0 +1,198 @@
+"""
+Расчёт стоимости проживания по тарифным планам
+Цена ночи — базовая цена номера, умноженная на множитель даты (выходные,
+сезон, загрузка категории), либо ручная цена из календаря номера. Множители
+одинаковы для всех номеров с тем же планом и категорией, поэтому сумма для
+любого числа номеров считается за один проход: база × сумма множителей плюс
+поправки только по ночам с ручной ценой. Номера и загрузка категорий берутся
+в пределах объекта сети запроса
+"""
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+MAX_QUOTE_ROOMS = 10000
+
+
+class RatePlan:
+    __slots__ = ('id', 'code', 'weekend_days', 'weekend_multiplier', 'seasons',
+                 'los_discounts', 'occupancy_tiers')
+
+    def __init__(self, plan_id: int, code: str, weekend_days: Tuple[int, ...] = (5, 6),
+                 weekend_multiplier: float = 1.0, seasons: Optional[List[Dict[str, Any]]] = None,
+                 los_discounts: Optional[List[Dict[str, Any]]] = None,
+                 occupancy_tiers: Optional[List[Dict[str, Any]]] = None):
+        self.id = plan_id
+        self.code = code
+        self.weekend_days = frozenset(weekend_days)
+        self.weekend_multiplier = weekend_multiplier
+        self.seasons = [(s['from'], s['to'], float(s['multiplier'])) for s in seasons or []]
+        self.los_discounts = sorted((int(d['minNights']), float(d['percent'])) for d in los_discounts or [])
+        self.occupancy_tiers = sorted((float(t['minOccupancy']), float(t['percent'])) for t in occupancy_tiers or [])
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'RatePlan':
+        return cls(row['id'], row['code'], tuple(row['weekend_days'] or ()), float(row['weekend_multiplier']),
+                   row['seasons'], row['los_discounts'], row['occupancy_tiers'])
+
+    def season_multiplier(self, day: date) -> float:
+        key = day.strftime('%m-%d')
+        for start, end, multiplier in self.seasons:
+            if (start <= key <= end) if start <= end else (key >= start or key <= end):
+                return multiplier
+        return 1.0
+
+    def night_factors(self, days: List[date], occupancy: Optional[List[float]] = None) -> List[float]:
+        factors = []
+        for index, day in enumerate(days):
+            factor = self.season_multiplier(day)
+            if day.isoweekday() in self.weekend_days:
+                factor *= self.weekend_multiplier
+            if occupancy is not None and self.occupancy_tiers:
+                percent = 0.0
+                for threshold, tier_percent in self.occupancy_tiers:
+                    if occupancy[index] >= threshold:
+                        percent = tier_percent
+                factor *= 1 + percent / 100
+            factors.append(factor)
+        return factors
+
+    def los_discount(self, nights: int) -> float:
+        percent = 0.0
+        for min_nights, discount in self.los_discounts:
+            if nights >= min_nights:
+                percent = discount
+        return percent
+
+
+FLAT_PLAN = RatePlan(0, 'flat', ())
+
+
+def stay_days(check_in: date, check_out: date) -> List[date]:
+    return [check_in + timedelta(days=i) for i in range((check_out - check_in).days)]
+
+
+def quote_rooms(rooms: List[Dict[str, Any]], plans: Dict[int, RatePlan], default_plan: RatePlan,
+                overrides: Dict[int, Dict[int, int]], occupancy: Dict[int, List[float]],
+                check_in: date, check_out: date) -> Dict[int, Dict[str, Any]]:
+    days = stay_days(check_in, check_out)
+    nights = len(days)
+    factor_cache: Dict[Tuple[int, Optional[int]], Tuple[List[float], float]] = {}
+
+    quotes = {}
+    for room in rooms:
+        plan = plans.get(room['rate_plan_id'], default_plan)
+        category_id = (room['category_id'] or 0) if plan.occupancy_tiers else None
+        key = (plan.id, category_id)
+        cached = factor_cache.get(key)
+        if cached is None:
+            factors = plan.night_factors(days, occupancy.get(category_id) if category_id is not None else None)
+            cached = factor_cache[key] = (factors, sum(factors))
+        factors, factor_sum = cached
+
+        base = room['price_per_night']
+        total = base * factor_sum
+        room_overrides = overrides.get(room['id'])
+        if room_overrides:
+            for night, price in room_overrides.items():
+                total += price - base * factors[night]
+
+        discount = plan.los_discount(nights)
+        if discount:
+            total *= 1 - discount / 100
+        total_price = int(round(total))
+
+        quotes[room['id']] = {
+            'roomId': room['id'],
+            'ratePlan': plan.code,
+            'nights': nights,
+            'totalPrice': total_price,
+            'averageNightly': int(round(total_price / nights)),
+            'discountPercent': discount
+        }
+    return quotes
+
+
+ROOMS_SQL = """
+    SELECT id, price_per_night, rate_plan_id, category_id
+    FROM rooms
+    WHERE id = ANY(%s) AND property_id = %s
+"""
+
+PLANS_SQL = """
+    SELECT id, code, weekend_days, weekend_multiplier, seasons, los_discounts, occupancy_tiers, is_default
+    FROM rate_plans
+"""
+
+OCCUPANCY_SQL = """
+    SELECT d.category_id, d.day - %s::DATE AS night, d.room_nights::FLOAT / c.rooms AS occupancy
+    FROM daily_category_stats d
+    JOIN (
+        SELECT COALESCE(category_id, 0) AS category_id, COUNT(*) AS rooms
+        FROM rooms
+        WHERE property_id = %s
+        GROUP BY 1
+    ) c ON c.category_id = d.category_id
+    WHERE d.property_id = %s AND d.day >= %s AND d.day < %s AND d.category_id = ANY(%s)
+"""
+
+
+def overrides_query(room_ids: List[int], check_in: date, check_out: date) -> Tuple[str, List[Any]]:
+    """Срезы календарей по годам проживания; ночь — номер ночи от даты заезда."""
+    parts = []
+    params: List[Any] = []
+    current = check_in
+    while current < check_out:
+        year_start = date(current.year, 1, 1)
+        year_end = min(date(current.year + 1, 1, 1), check_out)
+        lo = (current - year_start).days + 1
+        hi = (year_end - year_start).days
+        parts.append("""
+            SELECT c.room_id, %s + o.i::INTEGER - 1 AS night, o.price
+            FROM room_price_calendar c
+            CROSS JOIN LATERAL unnest(c.prices[%s:%s]) WITH ORDINALITY AS o(price, i)
+            WHERE c.room_id = ANY(%s) AND c.year = %s AND o.price IS NOT NULL
+        """)
+        params.extend([(current - check_in).days, lo, hi, room_ids, current.year])
+        current = year_end
+    return ' UNION ALL '.join(parts), params
+
+
+def load_quotes(cur: Any, room_ids: List[int], check_in: date, check_out: date,
+                property_id: int) -> Dict[int, Dict[str, Any]]:
+    cur.execute(ROOMS_SQL, (room_ids, property_id))
+    return quote_loaded_rooms(cur, cur.fetchall(), check_in, check_out, property_id)
+
+
+def quote_loaded_rooms(cur: Any, rooms: List[Dict[str, Any]], check_in: date, check_out: date,
+                       property_id: int) -> Dict[int, Dict[str, Any]]:
+    """Считает цены для уже выбранных строк номеров (id, price_per_night, rate_plan_id, category_id)."""
+    if not rooms:
+        return {}
+
+    cur.execute(PLANS_SQL)
+    plans = {}
+    default_plan = FLAT_PLAN
+    for row in cur.fetchall():
+        plan = plans[row['id']] = RatePlan.from_row(row)
+        if row['is_default']:
+            default_plan = plan
+    plans[None] = default_plan
+
+    overrides: Dict[int, Dict[int, int]] = {}
+    sql, params = overrides_query([room['id'] for room in rooms], check_in, check_out)
+    cur.execute(sql, params)
+    for row in cur.fetchall():
+        overrides.setdefault(row['room_id'], {})[row['night']] = row['price']
+
+    occupancy: Dict[int, List[float]] = {}
+    categories = list({room['category_id'] or 0 for room in rooms
+                       if plans.get(room['rate_plan_id'], default_plan).occupancy_tiers})
+    if categories:
+        nights = (check_out - check_in).days
+        cur.execute(OCCUPANCY_SQL, (check_in, property_id, property_id, check_in, check_out, categories))
+        for row in cur.fetchall():
+            occupancy.setdefault(row['category_id'], [0.0] * nights)[row['night']] = row['occupancy']
+        for category_id in categories:
+            occupancy.setdefault(category_id, [0.0] * nights)
+
+    return quote_rooms(rooms, plans, default_plan, overrides, occupancy, check_in, check_out)
@@ -0,0 +1,273 @@
+"""
+Общий каркас обработчиков функций
+Таблица маршрутов компилируется один раз при импорте модуля, ответы
+и CORS-заголовки собираются в одном месте, ошибки обрабатываются централизованно.
+GET-запросы читают с реплик; успешная запись возвращает заголовок X-Read-After
+с LSN основной базы, и GET с этим заголовком не читает с отставшей реплики.
+Объект сети (отель) запроса задаётся заголовком X-Property-Id или параметром
+property=, без них используется DEFAULT_PROPERTY_ID. Перед обработчиком
+запрос проходит допуск (admission): предел одновременных запросов и
+ограничение частоты по клиенту и маршруту
+"""
+import json
+import math
+import os
+import re
+import sys
+import traceback
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import psycopg2
+
+import tracing
+from admission import admission
+from db import get_pool, acquire_read, current_lsn, parse_lsn, PoolTimeout
+
+TRACE_DUMP_ROUTE = os.environ.get('TRACE_DUMP_ROUTE', '0') == '1'
+
+READ_AFTER_HEADER = 'X-Read-After'
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+PROPERTY_HEADER = 'X-Property-Id'
+DEFAULT_PROPERTY_ID = int(os.environ.get('DEFAULT_PROPERTY_ID', '1'))
+
+JSON_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+
+UNAVAILABLE_HEADERS = {
+    'Retry-After': '1',
+    'Access-Control-Expose-Headers': 'Retry-After'
+}
+
+
+def dumps(data: Any) -> str:
+    with tracing.phase('serialize'):
+        if orjson is not None:
+            return orjson.dumps(data).decode('utf-8')
+        return json.dumps(data)
+
+
+def loads(raw: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def response(status: int, data: Any = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    result_headers = dict(JSON_HEADERS)
+    if headers:
+        result_headers.update(headers)
+    return {
+        'statusCode': status,
+        'headers': result_headers,
+        'body': '' if data is None else dumps(data),
+        'isBase64Encoded': False
+    }
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers
+
+    def to_response(self) -> Dict[str, Any]:
+        return response(self.status, {'error': self.message}, self.headers)
+
+
+class Request:
+    __slots__ = ('event', 'context', 'method', 'path', 'params', 'query', 'headers', '_body', '_conn', '_pool')
+
+    def __init__(self, event: Dict[str, Any], context: Any, method: str, path: str, params: Dict[str, Any]):
+        self.event = event
+        self.context = context
+        self.method = method
+        self.path = path
+        self.params = params
+        self.query: Dict[str, str] = event.get('queryStringParameters') or {}
+        self.headers: Dict[str, str] = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+        self._body = None
+        self._conn = None
+        self._pool = None
+
+    def header(self, name: str) -> Optional[str]:
+        return self.headers.get(name.lower())
+
+    @property
+    def body(self) -> Dict[str, Any]:
+        if self._body is None:
+            raw = self.event.get('body') or '{}'
+            try:
+                self._body = loads(raw)
+            except ValueError:
+                raise HttpError(400, 'Invalid JSON body')
+            if not isinstance(self._body, dict):
+                raise HttpError(400, 'Invalid JSON body')
+        return self._body
+
+    @property
+    def property_id(self) -> int:
+        raw = self.header(PROPERTY_HEADER) or self.query.get('property')
+        if not raw:
+            return DEFAULT_PROPERTY_ID
+        try:
+            value = int(raw)
+        except ValueError:
+            raise HttpError(400, 'Invalid property')
+        if value < 1:
+            raise HttpError(400, 'Invalid property')
+        return value
+
+    def read_after(self) -> Optional[int]:
+        token = self.header(READ_AFTER_HEADER)
+        if not token:
+            return None
+        try:
+            return parse_lsn(token)
+        except ValueError:
+            return None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            with tracing.phase('acquire'):
+                if self.method == 'GET':
+                    self._pool, self._conn = acquire_read(self.read_after())
+                else:
+                    self._pool = get_pool()
+                    self._conn = self._pool.getconn()
+        return self._conn
+
+    def stamp_write(self, result: Dict[str, Any]) -> None:
+        if self._conn is None:
+            return
+        try:
+            token = current_lsn(self._conn)
+        except psycopg2.Error:
+            return
+        result['headers'][READ_AFTER_HEADER] = token
+        result['headers']['Access-Control-Expose-Headers'] = READ_AFTER_HEADER
+
+    def release(self) -> None:
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.putconn(conn)
+
+
+Handler = Callable[[Request], Dict[str, Any]]
+
+_PARAM_RE = re.compile(r'\{(\w+)(?::(int))?\}')
+
+
+def compile_pattern(pattern: str) -> Tuple[Any, Dict[str, Callable]]:
+    converters: Dict[str, Callable] = {}
+    regex = ''
+    position = 0
+    for match in _PARAM_RE.finditer(pattern):
+        regex += re.escape(pattern[position:match.start()])
+        name, kind = match.group(1), match.group(2)
+        if kind == 'int':
+            regex += r'(?P<%s>\d+)' % name
+            converters[name] = int
+        else:
+            regex += r'(?P<%s>[^/]+)' % name
+        position = match.end()
+    regex += re.escape(pattern[position:])
+    return re.compile(r'(?:^|.*?)' + regex + '$'), converters
+
+
+class Router:
+    """
+    Маршруты сопоставляются с окончанием пути: функция может вызываться
+    как по корню, так и с префиксом, поэтому '/stats' совпадает и с '/abc/stats'.
+    Маршрут '/' обрабатывает все пути, не совпавшие с остальными.
+    """
+
+    def __init__(self, allow_methods: str, allow_headers: str = 'Content-Type'):
+        self._routes: Dict[str, List[Tuple[Any, Dict[str, Callable], Handler]]] = {}
+        self._fallback: Dict[str, Handler] = {}
+        self._preflight_headers = {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': allow_methods,
+            'Access-Control-Allow-Headers': ', '.join((allow_headers, READ_AFTER_HEADER, PROPERTY_HEADER)),
+            'Access-Control-Max-Age': '86400'
+        }
+        if TRACE_DUMP_ROUTE:
+            self.route('GET', '/_trace/queries')(self._slowest_queries)
+
+    @staticmethod
+    def _slowest_queries(request: 'Request') -> Dict[str, Any]:
+        limit = request.query.get('limit', '10')
+        return response(200, {'queries': tracing.slowest_queries(int(limit) if limit.isdigit() else 10)})
+
+    def route(self, method: str, pattern: str) -> Callable[[Handler], Handler]:
+        def decorator(func: Handler) -> Handler:
+            if pattern == '/':
+                self._fallback[method] = func
+            else:
+                regex, converters = compile_pattern(pattern.rstrip('/'))
+                self._routes.setdefault(method, []).append((regex, converters, func))
+            return func
+        return decorator
+
+    def resolve(self, method: str, path: str) -> Tuple[Optional[Handler], Dict[str, Any]]:
+        for regex, converters, func in self._routes.get(method, ()):
+            match = regex.match(path)
+            if match:
+                params = match.groupdict()
+                for name, convert in converters.items():
+                    params[name] = convert(params[name])
+                return func, params
+        return self._fallback.get(method), {}
+
+    def dispatch(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        method: str = event.get('httpMethod', 'GET')
+
+        if method == 'OPTIONS':
+            return {
+                'statusCode': 200,
+                'headers': dict(self._preflight_headers),
+                'body': '',
+                'isBase64Encoded': False
+            }
+
+        path = (event.get('path') or '/').rstrip('/') or '/'
+        func, params = self.resolve(method, path)
+        if func is None:
+            return response(405, {'error': 'Method not allowed'})
+
+        if not admission.enter():
+            return response(503, {'error': 'Service temporarily unavailable'}, UNAVAILABLE_HEADERS)
+
+        request = Request(event, context, method, path, params)
+        trace = tracing.start(method, func.__name__)
+        try:
+            wait = admission.check_rate(event, method, func.__name__, method in WRITE_METHODS)
+            if wait:
+                retry_after = str(max(1, math.ceil(wait)))
+                raise HttpError(429, 'Too many requests', {
+                    'Retry-After': retry_after,
+                    'Access-Control-Expose-Headers': 'Retry-After'
+                })
+            result = func(request)
+            if method in WRITE_METHODS and result['statusCode'] < 400:
+                request.stamp_write(result)
+        except HttpError as e:
+            result = e.to_response()
+        except PoolTimeout:
+            result = response(503, {'error': 'Service temporarily unavailable'}, UNAVAILABLE_HEADERS)
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+            result = response(500, {'error': 'Internal server error'})
+        finally:
+            request.release()
+            admission.leave()
+        return tracing.finish(trace, result)
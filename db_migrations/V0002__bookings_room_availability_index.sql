@@ -0,0 +1,5 @@
+-- Индекс для проверки пересечения дат бронирований по номеру
+-- Ведущий room_id и check_out > :check_in отсекают прошедшие брони номера
+CREATE INDEX IF NOT EXISTS idx_bookings_room_active_dates
+    ON bookings(room_id, check_out, check_in)
+    WHERE status <> 'cancelled';
@@ -0,0 +1,83 @@
+-- Индекс занятости номеров: по строке на номер и год,
+-- бит i означает, что ночь с (i+1)-го дня года занята активной бронью
+CREATE TABLE IF NOT EXISTS room_occupancy (
+    room_id INTEGER NOT NULL,
+    year SMALLINT NOT NULL,
+    nights BIT(366) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (room_id, year)
+);
+
+-- Пересборка битовой карты номера за год по активным броням
+CREATE OR REPLACE FUNCTION rebuild_room_occupancy(p_room_id INTEGER, p_year INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    year_start DATE := make_date(p_year, 1, 1);
+    year_end DATE := make_date(p_year + 1, 1, 1);
+    bits BIT(366);
+BEGIN
+    SELECT bit_or((repeat('0', lo) || repeat('1', hi - lo) || repeat('0', 366 - hi))::BIT(366))
+    INTO bits
+    FROM (
+        SELECT GREATEST(check_in, year_start) - year_start AS lo,
+               LEAST(check_out, year_end) - year_start AS hi
+        FROM bookings
+        WHERE room_id = p_room_id
+          AND status <> 'cancelled'
+          AND check_out > year_start
+          AND check_in < year_end
+    ) spans;
+
+    IF bits IS NULL OR bits = repeat('0', 366)::BIT(366) THEN
+        DELETE FROM room_occupancy WHERE room_id = p_room_id AND year = p_year;
+    ELSE
+        INSERT INTO room_occupancy (room_id, year, nights)
+        VALUES (p_room_id, p_year, bits)
+        ON CONFLICT (room_id, year)
+        DO UPDATE SET nights = EXCLUDED.nights, updated_at = CURRENT_TIMESTAMP;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Поддержка индекса при создании, изменении и отмене бронирований
+CREATE OR REPLACE FUNCTION bookings_refresh_occupancy()
+RETURNS TRIGGER AS $$
+DECLARE
+    y INTEGER;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.room_id IS NOT NULL AND OLD.check_out > OLD.check_in THEN
+        FOR y IN EXTRACT(YEAR FROM OLD.check_in)::INTEGER .. EXTRACT(YEAR FROM OLD.check_out - 1)::INTEGER LOOP
+            PERFORM rebuild_room_occupancy(OLD.room_id, y);
+        END LOOP;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.room_id IS NOT NULL AND NEW.check_out > NEW.check_in THEN
+        FOR y IN EXTRACT(YEAR FROM NEW.check_in)::INTEGER .. EXTRACT(YEAR FROM NEW.check_out - 1)::INTEGER LOOP
+            PERFORM rebuild_room_occupancy(NEW.room_id, y);
+        END LOOP;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bookings_occupancy_write ON bookings;
+CREATE TRIGGER trg_bookings_occupancy_write
+    AFTER INSERT OR DELETE ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_refresh_occupancy();
+
+DROP TRIGGER IF EXISTS trg_bookings_occupancy_update ON bookings;
+CREATE TRIGGER trg_bookings_occupancy_update
+    AFTER UPDATE OF room_id, check_in, check_out, status ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_refresh_occupancy();
+
+-- Заполнение индекса по уже существующим броням
+SELECT rebuild_room_occupancy(room_id, y)
+FROM (
+    SELECT DISTINCT room_id, generate_series(
+        EXTRACT(YEAR FROM check_in)::INTEGER,
+        EXTRACT(YEAR FROM check_out - 1)::INTEGER
+    ) AS y
+    FROM bookings
+    WHERE room_id IS NOT NULL AND status <> 'cancelled' AND check_out > check_in
+) pairs;
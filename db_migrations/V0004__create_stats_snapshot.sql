@@ -0,0 +1,128 @@
+-- Снимок счётчиков админской статистики, одна строка с id = 1
+CREATE TABLE IF NOT EXISTS stats_snapshot (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    total_rooms INTEGER NOT NULL DEFAULT 0,
+    available_rooms INTEGER NOT NULL DEFAULT 0,
+    occupied_rooms INTEGER NOT NULL DEFAULT 0,
+    total_bookings INTEGER NOT NULL DEFAULT 0,
+    pending_bookings INTEGER NOT NULL DEFAULT 0,
+    revenue BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Полный пересчёт снимка, исправляет возможный дрейф счётчиков
+CREATE OR REPLACE FUNCTION refresh_stats_snapshot()
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO stats_snapshot (id, total_rooms, available_rooms, occupied_rooms,
+                                total_bookings, pending_bookings, revenue, updated_at)
+    SELECT 1, r.total, r.available, r.occupied, b.total, b.pending, b.revenue, CURRENT_TIMESTAMP
+    FROM (
+        SELECT COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE status = 'available') AS available,
+               COUNT(*) FILTER (WHERE status = 'occupied') AS occupied
+        FROM rooms
+    ) r, (
+        SELECT COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE status = 'pending') AS pending,
+               COALESCE(SUM(total_price) FILTER (WHERE status <> 'cancelled'), 0) AS revenue
+        FROM bookings
+    ) b
+    ON CONFLICT (id) DO UPDATE SET
+        total_rooms = EXCLUDED.total_rooms,
+        available_rooms = EXCLUDED.available_rooms,
+        occupied_rooms = EXCLUDED.occupied_rooms,
+        total_bookings = EXCLUDED.total_bookings,
+        pending_bookings = EXCLUDED.pending_bookings,
+        revenue = EXCLUDED.revenue,
+        updated_at = EXCLUDED.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Инкрементальное обновление по изменениям номеров
+CREATE OR REPLACE FUNCTION rooms_apply_stats_delta()
+RETURNS TRIGGER AS $$
+DECLARE
+    d_total INTEGER := 0;
+    d_available INTEGER := 0;
+    d_occupied INTEGER := 0;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        d_total := d_total + 1;
+        d_available := d_available + (NEW.status IS NOT DISTINCT FROM 'available')::INTEGER;
+        d_occupied := d_occupied + (NEW.status IS NOT DISTINCT FROM 'occupied')::INTEGER;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        d_total := d_total - 1;
+        d_available := d_available - (OLD.status IS NOT DISTINCT FROM 'available')::INTEGER;
+        d_occupied := d_occupied - (OLD.status IS NOT DISTINCT FROM 'occupied')::INTEGER;
+    END IF;
+
+    IF d_total <> 0 OR d_available <> 0 OR d_occupied <> 0 THEN
+        UPDATE stats_snapshot SET
+            total_rooms = total_rooms + d_total,
+            available_rooms = available_rooms + d_available,
+            occupied_rooms = occupied_rooms + d_occupied,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Инкрементальное обновление по изменениям бронирований
+CREATE OR REPLACE FUNCTION bookings_apply_stats_delta()
+RETURNS TRIGGER AS $$
+DECLARE
+    d_total INTEGER := 0;
+    d_pending INTEGER := 0;
+    d_revenue BIGINT := 0;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        d_total := d_total + 1;
+        d_pending := d_pending + (NEW.status IS NOT DISTINCT FROM 'pending')::INTEGER;
+        IF NEW.status <> 'cancelled' THEN
+            d_revenue := d_revenue + NEW.total_price;
+        END IF;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        d_total := d_total - 1;
+        d_pending := d_pending - (OLD.status IS NOT DISTINCT FROM 'pending')::INTEGER;
+        IF OLD.status <> 'cancelled' THEN
+            d_revenue := d_revenue - OLD.total_price;
+        END IF;
+    END IF;
+
+    IF d_total <> 0 OR d_pending <> 0 OR d_revenue <> 0 THEN
+        UPDATE stats_snapshot SET
+            total_bookings = total_bookings + d_total,
+            pending_bookings = pending_bookings + d_pending,
+            revenue = revenue + d_revenue,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_rooms_stats_write ON rooms;
+CREATE TRIGGER trg_rooms_stats_write
+    AFTER INSERT OR DELETE ON rooms
+    FOR EACH ROW EXECUTE FUNCTION rooms_apply_stats_delta();
+
+DROP TRIGGER IF EXISTS trg_rooms_stats_update ON rooms;
+CREATE TRIGGER trg_rooms_stats_update
+    AFTER UPDATE OF status ON rooms
+    FOR EACH ROW EXECUTE FUNCTION rooms_apply_stats_delta();
+
+DROP TRIGGER IF EXISTS trg_bookings_stats_write ON bookings;
+CREATE TRIGGER trg_bookings_stats_write
+    AFTER INSERT OR DELETE ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_apply_stats_delta();
+
+DROP TRIGGER IF EXISTS trg_bookings_stats_update ON bookings;
+CREATE TRIGGER trg_bookings_stats_update
+    AFTER UPDATE OF status, total_price ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_apply_stats_delta();
+
+SELECT refresh_stats_snapshot();
@@ -0,0 +1,3 @@
+-- Индексы под keyset-пагинацию списка бронирований по (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_bookings_created_id ON bookings(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_room_created_id ON bookings(room_id, created_at DESC, id DESC);
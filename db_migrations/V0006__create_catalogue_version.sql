@@ -0,0 +1,28 @@
+-- Версия каталога номеров для инвалидации кэша в функции rooms
+CREATE TABLE IF NOT EXISTS catalogue_version (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO catalogue_version (id, version) VALUES (1, 1) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_catalogue_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE catalogue_version
+    SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_rooms_catalogue_version ON rooms;
+CREATE TRIGGER trg_rooms_catalogue_version
+    AFTER INSERT OR UPDATE OR DELETE ON rooms
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalogue_version();
+
+DROP TRIGGER IF EXISTS trg_room_categories_catalogue_version ON room_categories;
+CREATE TRIGGER trg_room_categories_catalogue_version
+    AFTER INSERT OR UPDATE OR DELETE ON room_categories
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalogue_version();
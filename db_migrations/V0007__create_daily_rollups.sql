@@ -0,0 +1,118 @@
+-- Дневные агрегаты по категориям: проданные номеро-ночи, выручка ночей и заезды.
+-- Выручка брони распределяется поровну по её ночам; номера без категории идут в category_id = 0
+CREATE TABLE IF NOT EXISTS daily_category_stats (
+    day DATE NOT NULL,
+    category_id INTEGER NOT NULL,
+    room_nights INTEGER NOT NULL DEFAULT 0,
+    revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    arrivals INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, category_id)
+);
+
+-- Применение брони к агрегатам со знаком +1 или -1
+CREATE OR REPLACE FUNCTION apply_daily_rollup(p_category_id INTEGER, p_check_in DATE, p_check_out DATE,
+                                              p_total_price INTEGER, p_sign INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    night_price NUMERIC := p_total_price::NUMERIC / (p_check_out - p_check_in);
+BEGIN
+    INSERT INTO daily_category_stats AS d (day, category_id, room_nights, revenue, arrivals)
+    SELECT night::DATE, COALESCE(p_category_id, 0), p_sign, p_sign * night_price,
+           CASE WHEN night = p_check_in THEN p_sign ELSE 0 END
+    FROM generate_series(p_check_in, p_check_out - 1, INTERVAL '1 day') night
+    ON CONFLICT (day, category_id) DO UPDATE SET
+        room_nights = d.room_nights + EXCLUDED.room_nights,
+        revenue = d.revenue + EXCLUDED.revenue,
+        arrivals = d.arrivals + EXCLUDED.arrivals;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Инкрементальное обновление по изменениям бронирований
+CREATE OR REPLACE FUNCTION bookings_apply_daily_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.room_id IS NOT NULL
+       AND OLD.status <> 'cancelled' AND OLD.check_out > OLD.check_in THEN
+        PERFORM apply_daily_rollup((SELECT category_id FROM rooms WHERE id = OLD.room_id),
+                                   OLD.check_in, OLD.check_out, OLD.total_price, -1);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.room_id IS NOT NULL
+       AND NEW.status <> 'cancelled' AND NEW.check_out > NEW.check_in THEN
+        PERFORM apply_daily_rollup((SELECT category_id FROM rooms WHERE id = NEW.room_id),
+                                   NEW.check_in, NEW.check_out, NEW.total_price, 1);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Перенос броней номера между категориями при смене его категории
+CREATE OR REPLACE FUNCTION rooms_move_daily_rollup()
+RETURNS TRIGGER AS $$
+DECLARE
+    b RECORD;
+BEGIN
+    FOR b IN
+        SELECT check_in, check_out, total_price
+        FROM bookings
+        WHERE room_id = NEW.id AND status <> 'cancelled' AND check_out > check_in
+    LOOP
+        PERFORM apply_daily_rollup(OLD.category_id, b.check_in, b.check_out, b.total_price, -1);
+        PERFORM apply_daily_rollup(NEW.category_id, b.check_in, b.check_out, b.total_price, 1);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Полная пересборка агрегатов за полуинтервал [p_from, p_to)
+CREATE OR REPLACE FUNCTION rebuild_daily_rollups(p_from DATE, p_to DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    written INTEGER;
+BEGIN
+    LOCK TABLE daily_category_stats IN EXCLUSIVE MODE;
+    DELETE FROM daily_category_stats WHERE day >= p_from AND day < p_to;
+
+    INSERT INTO daily_category_stats (day, category_id, room_nights, revenue, arrivals)
+    SELECT night::DATE,
+           COALESCE(r.category_id, 0),
+           COUNT(*),
+           SUM(b.total_price::NUMERIC / (b.check_out - b.check_in)),
+           COUNT(*) FILTER (WHERE night = b.check_in)
+    FROM bookings b
+    JOIN rooms r ON r.id = b.room_id
+    CROSS JOIN LATERAL generate_series(GREATEST(b.check_in, p_from),
+                                       LEAST(b.check_out, p_to) - 1,
+                                       INTERVAL '1 day') night
+    WHERE b.status <> 'cancelled'
+      AND b.check_out > b.check_in
+      AND b.check_out > p_from
+      AND b.check_in < p_to
+    GROUP BY 1, 2;
+
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bookings_daily_rollup_write ON bookings;
+CREATE TRIGGER trg_bookings_daily_rollup_write
+    AFTER INSERT OR DELETE ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_apply_daily_rollup();
+
+DROP TRIGGER IF EXISTS trg_bookings_daily_rollup_update ON bookings;
+CREATE TRIGGER trg_bookings_daily_rollup_update
+    AFTER UPDATE OF room_id, check_in, check_out, status, total_price ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_apply_daily_rollup();
+
+DROP TRIGGER IF EXISTS trg_rooms_daily_rollup_category ON rooms;
+CREATE TRIGGER trg_rooms_daily_rollup_category
+    AFTER UPDATE OF category_id ON rooms
+    FOR EACH ROW WHEN (OLD.category_id IS DISTINCT FROM NEW.category_id)
+    EXECUTE FUNCTION rooms_move_daily_rollup();
+
+-- Заполнение агрегатов по уже существующим броням
+SELECT rebuild_daily_rollups(MIN(check_in), MAX(check_out))
+FROM bookings
+HAVING COUNT(*) > 0;
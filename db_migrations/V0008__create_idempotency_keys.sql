@@ -0,0 +1,11 @@
+-- Ключи идемпотентности запросов на создание брони.
+-- Ключ и тело запроса хранятся как SHA-256, ответ — уже сериализованным JSON
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key_hash BYTEA PRIMARY KEY,
+    request_hash BYTEA NOT NULL,
+    status_code SMALLINT,
+    response_body TEXT,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires ON idempotency_keys(expires_at);
@@ -0,0 +1,58 @@
+-- Очередь событий бронирований (transactional outbox): строка пишется триггером
+-- в той же транзакции, что и изменение брони, и разбирается функцией outbox
+CREATE TABLE IF NOT EXISTS booking_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,
+    booking_id INTEGER NOT NULL,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    available_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Готовые к обработке события; обработанные удаляются, исчерпавшие попытки получают статус 'dead'
+CREATE INDEX IF NOT EXISTS idx_booking_outbox_pending
+    ON booking_outbox(available_at, id)
+    WHERE status = 'pending';
+
+CREATE OR REPLACE FUNCTION bookings_enqueue_outbox()
+RETURNS TRIGGER AS $$
+DECLARE
+    event VARCHAR(50);
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        event := 'booking.created';
+    ELSIF NEW.status IS DISTINCT FROM OLD.status THEN
+        event := 'booking.status_changed';
+    ELSE
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO booking_outbox (event_type, booking_id, payload)
+    VALUES (event, NEW.id, jsonb_build_object(
+        'bookingId', NEW.id,
+        'roomId', NEW.room_id,
+        'checkIn', NEW.check_in,
+        'checkOut', NEW.check_out,
+        'guestsCount', NEW.guests_count,
+        'totalPrice', NEW.total_price,
+        'status', NEW.status,
+        'previousStatus', CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+        'guestName', NEW.guest_name,
+        'guestEmail', NEW.guest_email
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_bookings_outbox_write ON bookings;
+CREATE TRIGGER trg_bookings_outbox_write
+    AFTER INSERT ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_enqueue_outbox();
+
+DROP TRIGGER IF EXISTS trg_bookings_outbox_update ON bookings;
+CREATE TRIGGER trg_bookings_outbox_update
+    AFTER UPDATE OF status ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_enqueue_outbox();
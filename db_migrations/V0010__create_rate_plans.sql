@@ -0,0 +1,46 @@
+-- Тарифные планы: множители цены ночи по дням недели, сезонам и загрузке
+-- категории, скидки за длительность проживания.
+-- weekend_days — ISO-дни недели ночи (5 = ночь с пятницы на субботу);
+-- seasons: [{"from": "06-01", "to": "08-31", "multiplier": 1.3}];
+-- los_discounts: [{"minNights": 7, "percent": 10}];
+-- occupancy_tiers: [{"minOccupancy": 0.8, "percent": 15}]
+CREATE TABLE IF NOT EXISTS rate_plans (
+    id SERIAL PRIMARY KEY,
+    code VARCHAR(50) NOT NULL UNIQUE,
+    name VARCHAR(200) NOT NULL,
+    weekend_days SMALLINT[] NOT NULL DEFAULT '{5,6}',
+    weekend_multiplier NUMERIC(6, 3) NOT NULL DEFAULT 1,
+    seasons JSONB NOT NULL DEFAULT '[]',
+    los_discounts JSONB NOT NULL DEFAULT '[]',
+    occupancy_tiers JSONB NOT NULL DEFAULT '[]',
+    is_default BOOLEAN NOT NULL DEFAULT false,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Не больше одного плана по умолчанию
+CREATE UNIQUE INDEX IF NOT EXISTS idx_rate_plans_default ON rate_plans(is_default) WHERE is_default;
+
+ALTER TABLE rooms ADD COLUMN IF NOT EXISTS rate_plan_id INTEGER REFERENCES rate_plans(id);
+
+-- Календарь ручных цен номера: по строке на номер и год,
+-- элемент i — цена ночи с i-го дня года, NULL — цена по тарифному плану
+CREATE TABLE IF NOT EXISTS room_price_calendar (
+    room_id INTEGER NOT NULL REFERENCES rooms(id) ON DELETE CASCADE,
+    year SMALLINT NOT NULL,
+    prices INTEGER[] NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (room_id, year)
+);
+
+-- План по умолчанию сохраняет прежнюю цену: price_per_night × число ночей
+INSERT INTO rate_plans (code, name, is_default) VALUES
+    ('base', 'Базовый тариф', true)
+ON CONFLICT (code) DO NOTHING;
+
+INSERT INTO rate_plans (code, name, weekend_multiplier, seasons, los_discounts, occupancy_tiers) VALUES
+    ('dynamic', 'Динамический тариф', 1.15,
+     '[{"from": "06-01", "to": "08-31", "multiplier": 1.25}, {"from": "12-28", "to": "01-08", "multiplier": 1.4}]',
+     '[{"minNights": 7, "percent": 10}, {"minNights": 14, "percent": 15}]',
+     '[{"minOccupancy": 0.7, "percent": 10}, {"minOccupancy": 0.9, "percent": 20}]')
+ON CONFLICT (code) DO NOTHING;
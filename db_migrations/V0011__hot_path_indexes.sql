@@ -0,0 +1,23 @@
+-- Индексы под запросы обработчиков функций.
+-- Личный кабинет: брони пользователя в порядке keyset-пагинации
+CREATE INDEX IF NOT EXISTS idx_bookings_user_created_id
+    ON bookings(user_id, created_at DESC, id DESC)
+    WHERE user_id IS NOT NULL;
+
+-- Фильтр списка броней по статусу в том же порядке; заменяет одиночный индекс по status
+CREATE INDEX IF NOT EXISTS idx_bookings_status_created_id
+    ON bookings(status, created_at DESC, id DESC);
+DROP INDEX IF EXISTS idx_bookings_status;
+
+-- Каталог номеров по категории сразу в порядке цены; заменяет одиночный индекс по category_id
+CREATE INDEX IF NOT EXISTS idx_rooms_category_price
+    ON rooms(category_id, price_per_night);
+DROP INDEX IF EXISTS idx_rooms_category;
+
+-- Внешний ключ на тарифный план: подсчёт номеров плана и проверка при удалении плана
+CREATE INDEX IF NOT EXISTS idx_rooms_rate_plan
+    ON rooms(rate_plan_id)
+    WHERE rate_plan_id IS NOT NULL;
+
+-- Проверки внешнего ключа bookings.room_id и фильтр по номеру уже покрыты
+-- idx_bookings_room_created_id (V0005), room_categories.code — ограничением UNIQUE
@@ -0,0 +1,18 @@
+-- Временные удержания номера на время оформления брони.
+-- Удержание блокирует номер на даты до expires_at и либо превращается в бронь
+-- (строка удаляется в той же транзакции), либо истекает; истёкшие строки
+-- не учитываются проверками и удаляются пачками обработчиком outbox
+CREATE TABLE IF NOT EXISTS booking_holds (
+    id BIGSERIAL PRIMARY KEY,
+    token UUID NOT NULL UNIQUE,
+    room_id INTEGER NOT NULL REFERENCES rooms(id) ON DELETE CASCADE,
+    check_in DATE NOT NULL,
+    check_out DATE NOT NULL,
+    guests_count INTEGER NOT NULL,
+    total_price INTEGER NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_booking_holds_room ON booking_holds(room_id, check_in);
+CREATE INDEX IF NOT EXISTS idx_booking_holds_expires ON booking_holds(expires_at);
@@ -0,0 +1,45 @@
+-- Общий словарь удобств номеров. Номера по-прежнему записывают features
+-- названиями, а триггер заводит новые названия в словарь и поддерживает
+-- rooms.feature_ids — те же удобства ссылками на словарь в исходном порядке;
+-- каталог читает только feature_ids
+CREATE TABLE IF NOT EXISTS room_features (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(200) NOT NULL UNIQUE
+);
+
+ALTER TABLE rooms ADD COLUMN IF NOT EXISTS feature_ids INTEGER[] NOT NULL DEFAULT '{}';
+
+CREATE OR REPLACE FUNCTION rooms_normalize_features()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.features IS NULL OR cardinality(NEW.features) = 0 THEN
+        NEW.feature_ids := '{}';
+        RETURN NEW;
+    END IF;
+
+    INSERT INTO room_features (name)
+    SELECT DISTINCT f FROM unnest(NEW.features) f WHERE f IS NOT NULL
+    ON CONFLICT (name) DO NOTHING;
+
+    SELECT COALESCE(array_agg(d.id ORDER BY u.position), '{}')
+    INTO NEW.feature_ids
+    FROM unnest(NEW.features) WITH ORDINALITY AS u(name, position)
+    JOIN room_features d ON d.name = u.name;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_rooms_normalize_features ON rooms;
+CREATE TRIGGER trg_rooms_normalize_features
+    BEFORE INSERT OR UPDATE OF features ON rooms
+    FOR EACH ROW EXECUTE FUNCTION rooms_normalize_features();
+
+-- Переименование удобства меняет ответы каталога
+DROP TRIGGER IF EXISTS trg_room_features_catalogue_version ON room_features;
+CREATE TRIGGER trg_room_features_catalogue_version
+    AFTER UPDATE OR DELETE ON room_features
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalogue_version();
+
+-- Заполнение словаря и ссылок по существующим номерам
+UPDATE rooms SET features = features WHERE features IS NOT NULL;
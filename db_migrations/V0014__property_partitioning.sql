@@ -0,0 +1,430 @@
+-- Объекты сети (отели). Номера, категории, удержания и брони принадлежат объекту;
+-- все существующие данные относятся к объекту по умолчанию с id = 1
+CREATE TABLE IF NOT EXISTS properties (
+    id SERIAL PRIMARY KEY,
+    code VARCHAR(50) NOT NULL UNIQUE,
+    name VARCHAR(200) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO properties (id, code, name) VALUES (1, 'main', 'Основной отель')
+ON CONFLICT (id) DO NOTHING;
+SELECT setval('properties_id_seq', GREATEST((SELECT MAX(id) FROM properties), 1));
+
+-- Категории уникальны по коду в пределах объекта
+ALTER TABLE room_categories ADD COLUMN IF NOT EXISTS property_id INTEGER NOT NULL DEFAULT 1 REFERENCES properties(id);
+ALTER TABLE room_categories DROP CONSTRAINT IF EXISTS room_categories_code_key;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_room_categories_property_code ON room_categories(property_id, code);
+
+ALTER TABLE rooms ADD COLUMN IF NOT EXISTS property_id INTEGER NOT NULL DEFAULT 1 REFERENCES properties(id);
+-- Каталог объекта в порядке цены
+CREATE INDEX IF NOT EXISTS idx_rooms_property_price ON rooms(property_id, price_per_night);
+
+ALTER TABLE booking_holds ADD COLUMN IF NOT EXISTS property_id INTEGER NOT NULL DEFAULT 1 REFERENCES properties(id);
+
+-- Брони секционируются по объекту (LIST), а внутри объекта — по году заезда (RANGE);
+-- секция DEFAULT объекта принимает годы, для которых секция ещё не создана.
+-- Старый год отсоединяется от секции объекта без переписывания таблицы:
+-- ALTER TABLE bookings_p1 DETACH PARTITION bookings_p1_y2020
+CREATE OR REPLACE FUNCTION create_booking_partitions(p_property_id INTEGER, p_from_year INTEGER, p_to_year INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    parent TEXT := format('bookings_p%s', p_property_id);
+    child TEXT;
+    created INTEGER := 0;
+    y INTEGER;
+BEGIN
+    IF to_regclass(parent) IS NULL THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF bookings FOR VALUES IN (%s) PARTITION BY RANGE (check_in)',
+                       parent, p_property_id);
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', parent || '_default', parent);
+    END IF;
+
+    FOR y IN p_from_year .. p_to_year LOOP
+        child := format('%s_y%s', parent, y);
+        IF to_regclass(child) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           child, parent, make_date(y, 1, 1), make_date(y + 1, 1, 1));
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE bookings RENAME TO bookings_unpartitioned;
+
+CREATE TABLE bookings (
+    id INTEGER NOT NULL DEFAULT nextval('bookings_id_seq'),
+    property_id INTEGER NOT NULL DEFAULT 1 REFERENCES properties(id),
+    user_id INTEGER REFERENCES users(id),
+    room_id INTEGER REFERENCES rooms(id),
+    check_in DATE NOT NULL,
+    check_out DATE NOT NULL,
+    guests_count INTEGER NOT NULL,
+    total_price INTEGER NOT NULL,
+    status VARCHAR(50) DEFAULT 'pending',
+    guest_name VARCHAR(200) NOT NULL,
+    guest_email VARCHAR(200) NOT NULL,
+    guest_phone VARCHAR(50),
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, property_id, check_in)
+) PARTITION BY LIST (property_id);
+
+ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id;
+
+SELECT create_booking_partitions(
+    p.id,
+    LEAST(COALESCE(EXTRACT(YEAR FROM b.min_check_in)::INTEGER, y.current), y.current),
+    y.current + 1
+)
+FROM properties p,
+     (SELECT MIN(check_in) AS min_check_in FROM bookings_unpartitioned) b,
+     (SELECT EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER AS current) y;
+
+-- Перенос данных до создания индексов и триггеров: производные таблицы
+-- (занятость, снимок статистики, агрегаты, outbox) уже соответствуют этим броням
+INSERT INTO bookings (id, property_id, user_id, room_id, check_in, check_out, guests_count, total_price,
+                      status, guest_name, guest_email, guest_phone, notes, created_at, updated_at)
+SELECT b.id, COALESCE(r.property_id, 1), b.user_id, b.room_id, b.check_in, b.check_out, b.guests_count,
+       b.total_price, b.status, b.guest_name, b.guest_email, b.guest_phone, b.notes, b.created_at, b.updated_at
+FROM bookings_unpartitioned b
+LEFT JOIN rooms r ON r.id = b.room_id;
+
+DROP TABLE bookings_unpartitioned;
+
+-- Индексы создаются на родительской таблице и наследуются каждой секцией
+CREATE INDEX IF NOT EXISTS idx_bookings_dates ON bookings(check_in, check_out);
+CREATE INDEX IF NOT EXISTS idx_bookings_room_active_dates
+    ON bookings(room_id, check_out, check_in)
+    WHERE status <> 'cancelled';
+CREATE INDEX IF NOT EXISTS idx_bookings_created_id ON bookings(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_room_created_id ON bookings(room_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_user_created_id
+    ON bookings(user_id, created_at DESC, id DESC)
+    WHERE user_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_bookings_status_created_id
+    ON bookings(status, created_at DESC, id DESC);
+
+-- Снимок статистики — по строке на объект, id строки равен id объекта
+ALTER TABLE stats_snapshot DROP CONSTRAINT IF EXISTS stats_snapshot_id_check;
+ALTER TABLE stats_snapshot ALTER COLUMN id DROP DEFAULT;
+ALTER TABLE stats_snapshot ALTER COLUMN id TYPE INTEGER;
+
+CREATE OR REPLACE FUNCTION refresh_stats_snapshot()
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO stats_snapshot (id, total_rooms, available_rooms, occupied_rooms,
+                                total_bookings, pending_bookings, revenue, updated_at)
+    SELECT p.id, COALESCE(r.total, 0), COALESCE(r.available, 0), COALESCE(r.occupied, 0),
+           COALESCE(b.total, 0), COALESCE(b.pending, 0), COALESCE(b.revenue, 0), CURRENT_TIMESTAMP
+    FROM properties p
+    LEFT JOIN (
+        SELECT property_id,
+               COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE status = 'available') AS available,
+               COUNT(*) FILTER (WHERE status = 'occupied') AS occupied
+        FROM rooms
+        GROUP BY property_id
+    ) r ON r.property_id = p.id
+    LEFT JOIN (
+        SELECT property_id,
+               COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE status = 'pending') AS pending,
+               COALESCE(SUM(total_price) FILTER (WHERE status <> 'cancelled'), 0) AS revenue
+        FROM bookings
+        GROUP BY property_id
+    ) b ON b.property_id = p.id
+    ON CONFLICT (id) DO UPDATE SET
+        total_rooms = EXCLUDED.total_rooms,
+        available_rooms = EXCLUDED.available_rooms,
+        occupied_rooms = EXCLUDED.occupied_rooms,
+        total_bookings = EXCLUDED.total_bookings,
+        pending_bookings = EXCLUDED.pending_bookings,
+        revenue = EXCLUDED.revenue,
+        updated_at = EXCLUDED.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rooms_apply_stats_delta()
+RETURNS TRIGGER AS $$
+DECLARE
+    d_total INTEGER := 0;
+    d_available INTEGER := 0;
+    d_occupied INTEGER := 0;
+    target INTEGER;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        target := NEW.property_id;
+        d_total := d_total + 1;
+        d_available := d_available + (NEW.status IS NOT DISTINCT FROM 'available')::INTEGER;
+        d_occupied := d_occupied + (NEW.status IS NOT DISTINCT FROM 'occupied')::INTEGER;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        target := OLD.property_id;
+        d_total := d_total - 1;
+        d_available := d_available - (OLD.status IS NOT DISTINCT FROM 'available')::INTEGER;
+        d_occupied := d_occupied - (OLD.status IS NOT DISTINCT FROM 'occupied')::INTEGER;
+    END IF;
+
+    IF d_total <> 0 OR d_available <> 0 OR d_occupied <> 0 THEN
+        UPDATE stats_snapshot SET
+            total_rooms = total_rooms + d_total,
+            available_rooms = available_rooms + d_available,
+            occupied_rooms = occupied_rooms + d_occupied,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = target;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION bookings_apply_stats_delta()
+RETURNS TRIGGER AS $$
+DECLARE
+    d_total INTEGER := 0;
+    d_pending INTEGER := 0;
+    d_revenue BIGINT := 0;
+    target INTEGER;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        target := NEW.property_id;
+        d_total := d_total + 1;
+        d_pending := d_pending + (NEW.status IS NOT DISTINCT FROM 'pending')::INTEGER;
+        IF NEW.status <> 'cancelled' THEN
+            d_revenue := d_revenue + NEW.total_price;
+        END IF;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        target := OLD.property_id;
+        d_total := d_total - 1;
+        d_pending := d_pending - (OLD.status IS NOT DISTINCT FROM 'pending')::INTEGER;
+        IF OLD.status <> 'cancelled' THEN
+            d_revenue := d_revenue - OLD.total_price;
+        END IF;
+    END IF;
+
+    IF d_total <> 0 OR d_pending <> 0 OR d_revenue <> 0 THEN
+        UPDATE stats_snapshot SET
+            total_bookings = total_bookings + d_total,
+            pending_bookings = pending_bookings + d_pending,
+            revenue = revenue + d_revenue,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = target;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT refresh_stats_snapshot();
+
+-- Дневные агрегаты — по объекту и категории
+ALTER TABLE daily_category_stats ADD COLUMN IF NOT EXISTS property_id INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE daily_category_stats ALTER COLUMN property_id DROP DEFAULT;
+ALTER TABLE daily_category_stats DROP CONSTRAINT IF EXISTS daily_category_stats_pkey;
+ALTER TABLE daily_category_stats ADD PRIMARY KEY (property_id, day, category_id);
+
+DROP FUNCTION IF EXISTS apply_daily_rollup(INTEGER, DATE, DATE, INTEGER, INTEGER);
+
+CREATE OR REPLACE FUNCTION apply_daily_rollup(p_property_id INTEGER, p_category_id INTEGER, p_check_in DATE,
+                                              p_check_out DATE, p_total_price INTEGER, p_sign INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    night_price NUMERIC := p_total_price::NUMERIC / (p_check_out - p_check_in);
+BEGIN
+    INSERT INTO daily_category_stats AS d (property_id, day, category_id, room_nights, revenue, arrivals)
+    SELECT p_property_id, night::DATE, COALESCE(p_category_id, 0), p_sign, p_sign * night_price,
+           CASE WHEN night = p_check_in THEN p_sign ELSE 0 END
+    FROM generate_series(p_check_in, p_check_out - 1, INTERVAL '1 day') night
+    ON CONFLICT (property_id, day, category_id) DO UPDATE SET
+        room_nights = d.room_nights + EXCLUDED.room_nights,
+        revenue = d.revenue + EXCLUDED.revenue,
+        arrivals = d.arrivals + EXCLUDED.arrivals;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION bookings_apply_daily_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.room_id IS NOT NULL
+       AND OLD.status <> 'cancelled' AND OLD.check_out > OLD.check_in THEN
+        PERFORM apply_daily_rollup(OLD.property_id, (SELECT category_id FROM rooms WHERE id = OLD.room_id),
+                                   OLD.check_in, OLD.check_out, OLD.total_price, -1);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.room_id IS NOT NULL
+       AND NEW.status <> 'cancelled' AND NEW.check_out > NEW.check_in THEN
+        PERFORM apply_daily_rollup(NEW.property_id, (SELECT category_id FROM rooms WHERE id = NEW.room_id),
+                                   NEW.check_in, NEW.check_out, NEW.total_price, 1);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rooms_move_daily_rollup()
+RETURNS TRIGGER AS $$
+DECLARE
+    b RECORD;
+BEGIN
+    FOR b IN
+        SELECT check_in, check_out, total_price
+        FROM bookings
+        WHERE property_id = NEW.property_id AND room_id = NEW.id
+          AND status <> 'cancelled' AND check_out > check_in
+    LOOP
+        PERFORM apply_daily_rollup(NEW.property_id, OLD.category_id, b.check_in, b.check_out, b.total_price, -1);
+        PERFORM apply_daily_rollup(NEW.property_id, NEW.category_id, b.check_in, b.check_out, b.total_price, 1);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rebuild_daily_rollups(p_from DATE, p_to DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    written INTEGER;
+BEGIN
+    LOCK TABLE daily_category_stats IN EXCLUSIVE MODE;
+    DELETE FROM daily_category_stats WHERE day >= p_from AND day < p_to;
+
+    INSERT INTO daily_category_stats (property_id, day, category_id, room_nights, revenue, arrivals)
+    SELECT b.property_id,
+           night::DATE,
+           COALESCE(r.category_id, 0),
+           COUNT(*),
+           SUM(b.total_price::NUMERIC / (b.check_out - b.check_in)),
+           COUNT(*) FILTER (WHERE night = b.check_in)
+    FROM bookings b
+    JOIN rooms r ON r.id = b.room_id
+    CROSS JOIN LATERAL generate_series(GREATEST(b.check_in, p_from),
+                                       LEAST(b.check_out, p_to) - 1,
+                                       INTERVAL '1 day') night
+    WHERE b.status <> 'cancelled'
+      AND b.check_out > b.check_in
+      AND b.check_out > p_from
+      AND b.check_in < p_to
+    GROUP BY 1, 2, 3;
+
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Пересборка карты занятости читает только секции объекта номера и лет,
+-- в которые может попасть заезд (проживание короче 366 ночей)
+CREATE OR REPLACE FUNCTION rebuild_room_occupancy(p_room_id INTEGER, p_year INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    year_start DATE := make_date(p_year, 1, 1);
+    year_end DATE := make_date(p_year + 1, 1, 1);
+    room_property INTEGER;
+    bits BIT(366);
+BEGIN
+    SELECT property_id INTO room_property FROM rooms WHERE id = p_room_id;
+
+    SELECT bit_or((repeat('0', lo) || repeat('1', hi - lo) || repeat('0', 366 - hi))::BIT(366))
+    INTO bits
+    FROM (
+        SELECT GREATEST(check_in, year_start) - year_start AS lo,
+               LEAST(check_out, year_end) - year_start AS hi
+        FROM bookings
+        WHERE property_id = room_property
+          AND room_id = p_room_id
+          AND status <> 'cancelled'
+          AND check_out > year_start
+          AND check_in < year_end
+          AND check_in >= year_start - 366
+    ) spans;
+
+    IF bits IS NULL OR bits = repeat('0', 366)::BIT(366) THEN
+        DELETE FROM room_occupancy WHERE room_id = p_room_id AND year = p_year;
+    ELSE
+        INSERT INTO room_occupancy (room_id, year, nights)
+        VALUES (p_room_id, p_year, bits)
+        ON CONFLICT (room_id, year)
+        DO UPDATE SET nights = EXCLUDED.nights, updated_at = CURRENT_TIMESTAMP;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- События outbox несут объект брони
+CREATE OR REPLACE FUNCTION bookings_enqueue_outbox()
+RETURNS TRIGGER AS $$
+DECLARE
+    event VARCHAR(50);
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        event := 'booking.created';
+    ELSIF NEW.status IS DISTINCT FROM OLD.status THEN
+        event := 'booking.status_changed';
+    ELSE
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO booking_outbox (event_type, booking_id, payload)
+    VALUES (event, NEW.id, jsonb_build_object(
+        'bookingId', NEW.id,
+        'propertyId', NEW.property_id,
+        'roomId', NEW.room_id,
+        'checkIn', NEW.check_in,
+        'checkOut', NEW.check_out,
+        'guestsCount', NEW.guests_count,
+        'totalPrice', NEW.total_price,
+        'status', NEW.status,
+        'previousStatus', CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+        'guestName', NEW.guest_name,
+        'guestEmail', NEW.guest_email
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггеры прежней таблицы удалены вместе с ней; на секционированной таблице
+-- они создаются на родителе и действуют во всех секциях
+CREATE TRIGGER trg_bookings_occupancy_write
+    AFTER INSERT OR DELETE ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_refresh_occupancy();
+CREATE TRIGGER trg_bookings_occupancy_update
+    AFTER UPDATE OF room_id, check_in, check_out, status ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_refresh_occupancy();
+
+CREATE TRIGGER trg_bookings_stats_write
+    AFTER INSERT OR DELETE ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_apply_stats_delta();
+CREATE TRIGGER trg_bookings_stats_update
+    AFTER UPDATE OF status, total_price ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_apply_stats_delta();
+
+CREATE TRIGGER trg_bookings_daily_rollup_write
+    AFTER INSERT OR DELETE ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_apply_daily_rollup();
+CREATE TRIGGER trg_bookings_daily_rollup_update
+    AFTER UPDATE OF room_id, check_in, check_out, status, total_price ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_apply_daily_rollup();
+
+CREATE TRIGGER trg_bookings_outbox_write
+    AFTER INSERT ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_enqueue_outbox();
+CREATE TRIGGER trg_bookings_outbox_update
+    AFTER UPDATE OF status ON bookings
+    FOR EACH ROW EXECUTE FUNCTION bookings_enqueue_outbox();
+
+-- Новый объект сразу получает секции броней на текущий и следующий год и строку статистики
+CREATE OR REPLACE FUNCTION properties_prepare()
+RETURNS TRIGGER AS $$
+DECLARE
+    current_year INTEGER := EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER;
+BEGIN
+    PERFORM create_booking_partitions(NEW.id, current_year, current_year + 1);
+    INSERT INTO stats_snapshot (id) VALUES (NEW.id) ON CONFLICT (id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_properties_prepare ON properties;
+CREATE TRIGGER trg_properties_prepare
+    AFTER INSERT ON properties
+    FOR EACH ROW EXECUTE FUNCTION properties_prepare();
@@ -0,0 +1,12 @@
+-- Корзины токенов ограничителя частоты запросов, общие для всех экземпляров функций
+-- (RATE_LIMIT_BACKEND=postgres). Ключ — клиент, метод и маршрут. Таблица UNLOGGED:
+-- после сбоя сервера корзины просто начинаются заново полными, зато запись
+-- не нагружает WAL и реплики
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+    key VARCHAR(300) PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Очистка давно не использовавшихся корзин
+CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_updated ON rate_limit_buckets(updated_at);
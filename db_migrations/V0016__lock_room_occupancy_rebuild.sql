@@ -0,0 +1,41 @@
+-- Пересборка карты занятости перезаписывает год целиком по снимку запроса,
+-- поэтому две параллельные записи по одному номеру могли сохранить устаревшую
+-- карту. Пересборка берёт ту же advisory-блокировку номера (1001, room_id),
+-- что и проверка пересечений в функции bookings: последующий SELECT получает
+-- новый снимок и видит брони уже закоммиченной конкурирующей транзакции
+CREATE OR REPLACE FUNCTION rebuild_room_occupancy(p_room_id INTEGER, p_year INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    year_start DATE := make_date(p_year, 1, 1);
+    year_end DATE := make_date(p_year + 1, 1, 1);
+    room_property INTEGER;
+    bits BIT(366);
+BEGIN
+    PERFORM pg_advisory_xact_lock(1001, p_room_id);
+
+    SELECT property_id INTO room_property FROM rooms WHERE id = p_room_id;
+
+    SELECT bit_or((repeat('0', lo) || repeat('1', hi - lo) || repeat('0', 366 - hi))::BIT(366))
+    INTO bits
+    FROM (
+        SELECT GREATEST(check_in, year_start) - year_start AS lo,
+               LEAST(check_out, year_end) - year_start AS hi
+        FROM bookings
+        WHERE property_id = room_property
+          AND room_id = p_room_id
+          AND status <> 'cancelled'
+          AND check_out > year_start
+          AND check_in < year_end
+          AND check_in >= year_start - 366
+    ) spans;
+
+    IF bits IS NULL OR bits = repeat('0', 366)::BIT(366) THEN
+        DELETE FROM room_occupancy WHERE room_id = p_room_id AND year = p_year;
+    ELSE
+        INSERT INTO room_occupancy (room_id, year, nights)
+        VALUES (p_room_id, p_year, bits)
+        ON CONFLICT (room_id, year)
+        DO UPDATE SET nights = EXCLUDED.nights, updated_at = CURRENT_TIMESTAMP;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
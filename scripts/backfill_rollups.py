@@ -0,0 +1,63 @@
+"""
+Пересборка дневных агрегатов аналитики пачками по периодам
+Каждая пачка пересчитывается функцией rebuild_daily_rollups в отдельной
+транзакции, поэтому блокировка таблицы агрегатов держится недолго, а прерванный
+прогон можно продолжить с --from
+
+    DATABASE_URL=postgresql://localhost/hotel python scripts/backfill_rollups.py --batch-days 31
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import psycopg2
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--from', dest='date_from', type=date.fromisoformat, default=None,
+                        help='первый день, по умолчанию самый ранний заезд')
+    parser.add_argument('--to', dest='date_to', type=date.fromisoformat, default=None,
+                        help='день после последнего, по умолчанию самый поздний выезд')
+    parser.add_argument('--batch-days', type=int, default=31)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    started = time.monotonic()
+    total = 0
+    batch_start = args.date_from
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT MIN(check_in), MAX(check_out) FROM bookings WHERE status <> 'cancelled'")
+            first, last = cur.fetchone()
+        conn.rollback()
+
+        date_from = args.date_from or first
+        date_to = args.date_to or last
+        if date_from is None or date_to is None or date_to <= date_from:
+            print('nothing to backfill', file=sys.stderr)
+            return 0
+
+        batch_start = date_from
+        while batch_start < date_to:
+            batch_end = min(batch_start + timedelta(days=args.batch_days), date_to)
+            with conn.cursor() as cur:
+                cur.execute("SELECT rebuild_daily_rollups(%s, %s)", (batch_start, batch_end))
+                total += cur.fetchone()[0]
+            conn.commit()
+            print('  %s .. %s: %d rows' % (batch_start, batch_end, total), file=sys.stderr)
+            batch_start = batch_end
+    except KeyboardInterrupt:
+        print('interrupted, resume with --from %s' % batch_start, file=sys.stderr)
+        return 130
+    finally:
+        conn.close()
+
+    print('rebuilt %d rollup rows in %.1fs' % (total, time.monotonic() - started))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
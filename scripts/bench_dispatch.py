@@ -0,0 +1,184 @@
+"""
+Микробенчмарк разбора запроса и сборки ответа в обработчиках функций
+База подменяется соединением с готовыми строками, поэтому измеряется только
+накладная стоимость маршрутизации, разбора тела и сериализации. Для сравнения
+с прежней реализацией укажите --ref с коммитом, на котором она была
+
+    python scripts/bench_dispatch.py admin --ref HEAD~1
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import types
+from datetime import date, datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+ROW = {
+    'id': 1, 'name': 'Делюкс', 'category_id': 2, 'category_code': 'lux', 'category_name': 'Люкс',
+    'price_per_night': 15000, 'area': 40, 'max_guests': 3, 'status': 'available',
+    'description': 'Элегантный номер с джакузи и панорамными окнами для особого отдыха.',
+    'features': ['Wi-Fi', 'Кондиционер', 'Телевизор', 'Минибар', 'Завтрак', 'Джакузи', 'Халаты'],
+    'image_url': 'https://cdn.poehali.dev/projects/image.jpg',
+    'room_id': 1, 'room_name': 'Делюкс', 'room_image': 'https://cdn.poehali.dev/projects/image.jpg',
+    'check_in': date(2025, 1, 10), 'check_out': date(2025, 1, 14), 'guests_count': 2,
+    'total_price': 60000, 'guest_name': 'Test User', 'guest_email': 'test@example.com',
+    'guest_phone': None, 'notes': None, 'user_id': None,
+    'created_at': datetime(2024, 12, 1, 12, 0), 'updated_at': datetime(2024, 12, 1, 12, 0),
+    'total_rooms': 6, 'available_rooms': 5, 'occupied_rooms': 1, 'total_bookings': 100,
+    'pending_bookings': 3, 'revenue': 1500000, 'generated_at': datetime(2024, 12, 1, 12, 0),
+    'categories_stats': [{'name': 'Люкс', 'code': 'lux', 'count': 2}], 'version': 1, 'count': 1,
+    'total': 1, 'price': 15000, 'active_holds': 0,
+}
+
+# Строка обычного курсора (кортеж) в порядке полной проекции каталога номеров
+ROW_TUPLE = (
+    1, 'Делюкс', 'lux', 'Люкс', 15000, 40, 3, ROW['description'], [1, 2, 3, 4, 5, 6, 7],
+    ROW['image_url'], 'available',
+)
+
+EVENTS = {
+    'admin': [
+        {'httpMethod': 'GET', 'path': '/stats'},
+        {'httpMethod': 'GET', 'path': '/'},
+        {'httpMethod': 'OPTIONS', 'path': '/'},
+        {'httpMethod': 'PUT', 'path': '/', 'body': json.dumps({'roomId': 1, 'status': 'occupied'})},
+    ],
+    'bookings': [
+        {'httpMethod': 'GET', 'path': '/', 'queryStringParameters': {'limit': '50'}},
+        {'httpMethod': 'OPTIONS', 'path': '/'},
+        {'httpMethod': 'PUT', 'path': '/', 'body': json.dumps({'bookingId': 1, 'status': 'cancelled'})},
+    ],
+    'rooms': [
+        {'httpMethod': 'GET', 'path': '/', 'queryStringParameters': {'guests': '2'}},
+        {'httpMethod': 'OPTIONS', 'path': '/'},
+    ],
+}
+
+
+class FakeCursor:
+    rowcount = 1
+
+    def __init__(self, rows: int, row: object = ROW):
+        self.rows = rows
+        self.row = row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        return [self.row] * self.rows
+
+
+class FakeConnection:
+    closed = 0
+
+    def __init__(self, rows: int):
+        self.rows = rows
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self.rows, ROW if kwargs.get('cursor_factory') else ROW_TUPLE)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, rows: int):
+        self.conn = FakeConnection(rows)
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn):
+        pass
+
+    def stats(self):
+        return {}
+
+
+def load_handler(function: str, ref: str, rows: int):
+    function_dir = os.path.join(ROOT, 'backend', function)
+    sys.path.insert(0, function_dir)
+
+    pool = FakePool(rows)
+    fake_db = types.ModuleType('db')
+    fake_db.get_pool = lambda: pool
+    fake_db.acquire_read = lambda min_lsn=None: (pool, pool.conn)
+    fake_db.current_lsn = lambda conn: '0/0'
+    fake_db.parse_lsn = lambda text: 0
+    fake_db.routing_stats = lambda: {}
+    fake_db.PoolTimeout = type('PoolTimeout', (Exception,), {})
+    fake_db.ConnectionPool = FakePool
+    sys.modules['db'] = fake_db
+
+    import psycopg2
+    psycopg2.connect = lambda *args, **kwargs: pool.conn
+    os.environ.setdefault('DATABASE_URL', 'postgresql://bench')
+    os.environ.setdefault('TRACE_LOG', '0')
+    os.environ.setdefault('RATE_LIMIT_WRITE_RATE', '0')
+
+    if ref:
+        source = subprocess.check_output(
+            ['git', 'show', '%s:backend/%s/index.py' % (ref, function)], cwd=ROOT).decode('utf-8')
+    else:
+        with open(os.path.join(function_dir, 'index.py'), encoding='utf-8') as f:
+            source = f.read()
+
+    module = types.ModuleType('bench_index')
+    exec(compile(source, 'index.py', 'exec'), module.__dict__)
+    return module.handler
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('function', choices=sorted(EVENTS))
+    parser.add_argument('--ref', default='', help='git-ревизия; по умолчанию рабочее дерево')
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--rows', type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    handler = load_handler(args.function, args.ref, args.rows)
+    import_ms = (time.perf_counter() - started) * 1000
+
+    results = {}
+    for event in EVENTS[args.function]:
+        name = '%s %s' % (event['httpMethod'], event['path'])
+        for _ in range(min(1000, args.iterations)):
+            handler(event, None)
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            handler(event, None)
+        elapsed = time.perf_counter() - started
+        results[name] = round(elapsed / args.iterations * 1e6, 2)
+
+    print(json.dumps({
+        'function': args.function,
+        'ref': args.ref or 'worktree',
+        'importMs': round(import_ms, 2),
+        'usPerRequest': results,
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Бенчмарк расчёта стоимости проживания для большого числа номеров
+Синтетические номера, тарифные планы, ручные цены и загрузка категорий
+собираются в памяти, так что измеряется только сам расчёт quote_rooms;
+при превышении --budget-ms скрипт завершается с кодом 1
+
+    python scripts/bench_pricing.py --rooms 10000 --nights 30 --budget-ms 50
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'rooms'))
+
+from pricing import RatePlan, quote_rooms  # noqa: E402
+
+CATEGORIES = 5
+
+
+def build_inputs(rooms_count: int, nights: int, override_share: float, rng: random.Random):
+    plans = {
+        1: RatePlan(1, 'base', ()),
+        2: RatePlan(2, 'dynamic', (5, 6), 1.15,
+                    [{'from': '06-01', 'to': '08-31', 'multiplier': 1.25},
+                     {'from': '12-28', 'to': '01-08', 'multiplier': 1.4}],
+                    [{'minNights': 7, 'percent': 10}, {'minNights': 14, 'percent': 15}],
+                    [{'minOccupancy': 0.7, 'percent': 10}, {'minOccupancy': 0.9, 'percent': 20}]),
+        3: RatePlan(3, 'weekend', (5, 6), 1.3),
+    }
+    plans[None] = plans[1]
+    rooms = [{
+        'id': room_id,
+        'price_per_night': 5000 + rng.randrange(40) * 1000,
+        'rate_plan_id': rng.choice((None, 1, 2, 2, 3)),
+        'category_id': 1 + room_id % CATEGORIES,
+    } for room_id in range(1, rooms_count + 1)]
+
+    overrides = {}
+    for room in rng.sample(rooms, int(rooms_count * override_share)):
+        overrides[room['id']] = {night: 4000 + rng.randrange(50) * 500
+                                 for night in rng.sample(range(nights), min(nights, rng.randint(1, 5)))}
+    occupancy = {category_id: [rng.random() for _ in range(nights)] for category_id in range(1, CATEGORIES + 1)}
+    return rooms, plans, overrides, occupancy
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=10000)
+    parser.add_argument('--nights', type=int, default=30)
+    parser.add_argument('--override-share', type=float, default=0.1, help='доля номеров с ручными ценами')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--budget-ms', type=float, default=50.0, help='допустимое p95 времени расчёта')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rooms, plans, overrides, occupancy = build_inputs(args.rooms, args.nights, args.override_share, rng)
+    check_in = date(2030, 7, 1)
+    check_out = check_in + timedelta(days=args.nights)
+
+    timings = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        quotes = quote_rooms(rooms, plans, plans[1], overrides, occupancy, check_in, check_out)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    p95 = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+    print(json.dumps({
+        'rooms': args.rooms,
+        'nights': args.nights,
+        'quotes': len(quotes),
+        'minMs': round(timings[0], 3),
+        'p50Ms': round(timings[len(timings) // 2], 3),
+        'p95Ms': round(p95, 3),
+        'budgetMs': args.budget_ms,
+    }, indent=2))
+    if p95 > args.budget_ms:
+        print('p95 %.2fms exceeds budget %.2fms' % (p95, args.budget_ms), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
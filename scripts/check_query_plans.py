@@ -0,0 +1,212 @@
+"""
+Проверка планов SQL-запросов обработчиков на большой базе
+Сценарии из backend/*/tests.json прогоняются через обработчики в процессе,
+все выполненные запросы перехватываются (коммиты заменяются откатом, так что
+база не меняется), после чего для каждого уникального запроса выполняется
+EXPLAIN (ANALYZE, BUFFERS) в откатываемой транзакции. Проверка падает, если
+запрос читает большую таблицу последовательным сканированием, его
+оценочная стоимость превышает бюджет или EXPLAIN завершился ошибкой
+(в том числе по statement_timeout), если сценарий не указан в --allow-error
+
+    DATABASE_URL=postgresql://localhost/hotel python scripts/seed_database.py --rooms 10000 --bookings 5000000
+    DATABASE_URL=postgresql://localhost/hotel python scripts/check_query_plans.py --max-cost 50000
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from typing import Dict, Any, List, Optional
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import FUNCTIONS, build_event, load_handlers, load_scenarios, sample_room_ids  # noqa: E402
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+# Сценарии, которым полный проход по таблице нужен по смыслу; их планы не проверяются
+ALLOWED_FULL_SCANS = {
+    'admin: Get live admin stats': 'live-режим пересчитывает счётчики по всем строкам',
+    'admin: Get all rooms for admin': 'список всех номеров в админке',
+    'rooms: Get all rooms': 'каталог всех номеров, отдаётся из кэша',
+    'rooms: Get rooms with field projection': 'каталог всех номеров, отдаётся из кэша',
+    'rooms: Get rooms in columnar layout': 'каталог всех номеров, отдаётся из кэша',
+    'admin: Get admin rooms with field projection': 'список всех номеров в админке',
+    'admin: Get rate plans': 'подсчёт номеров по планам',
+}
+
+_scenario = threading.local()
+_captured: Dict[str, Dict[str, Any]] = {}
+_capture_lock = threading.Lock()
+_capturing_connections: Dict[type, type] = {}
+_capturing_cursors: Dict[type, type] = {}
+
+
+def _normalize(sql: str) -> str:
+    return ' '.join(sql.split())
+
+
+def _capturing_cursor(factory: type) -> type:
+    if factory not in _capturing_cursors:
+        class CapturingCursor(factory):
+            def execute(self, query, params=None):
+                text = query if isinstance(query, str) else query.decode('utf-8')
+                if text.lstrip().split(None, 1)[0].upper() in EXPLAINABLE:
+                    key = _normalize(text)
+                    with _capture_lock:
+                        if key not in _captured:
+                            _captured[key] = {
+                                'scenario': getattr(_scenario, 'name', ''),
+                                'sql': self.mogrify(query, params).decode('utf-8'),
+                            }
+                return super().execute(query, params)
+
+        _capturing_cursors[factory] = CapturingCursor
+    return _capturing_cursors[factory]
+
+
+def _capturing_connection(factory: type) -> type:
+    if factory not in _capturing_connections:
+        class CapturingConnection(factory):
+            def cursor(self, *args, **kwargs):
+                kwargs['cursor_factory'] = _capturing_cursor(kwargs.get('cursor_factory') or self.cursor_factory
+                                                             or psycopg2.extensions.cursor)
+                return super().cursor(*args, **kwargs)
+
+            def commit(self):
+                return super().rollback()
+
+        _capturing_connections[factory] = CapturingConnection
+    return _capturing_connections[factory]
+
+
+def install_capturing_connect() -> None:
+    connect = psycopg2.connect
+
+    def capturing_connect(dsn=None, **kwargs):
+        factory = kwargs.get('connection_factory') or psycopg2.extensions.connection
+        kwargs['connection_factory'] = _capturing_connection(factory)
+        return connect(dsn, **kwargs)
+
+    psycopg2.connect = capturing_connect
+
+
+def walk(node: Dict[str, Any]):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk(child)
+
+
+def table_sizes(cur) -> Dict[str, float]:
+    cur.execute("""
+        SELECT c.relname, c.reltuples
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()
+    """)
+    return {name: tuples for name, tuples in cur.fetchall()}
+
+
+def explain(cur, sql: str, timeout_ms: int) -> Optional[Dict[str, Any]]:
+    cur.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql)
+    return cur.fetchone()[0][0]
+
+
+def check(plan: Dict[str, Any], sizes: Dict[str, float], min_rows: float, max_cost: float) -> List[str]:
+    problems = []
+    root = plan['Plan']
+    if root['Total Cost'] > max_cost:
+        problems.append('cost %.0f > %.0f' % (root['Total Cost'], max_cost))
+    for node in walk(root):
+        relation = node.get('Relation Name')
+        if node['Node Type'] == 'Seq Scan' and sizes.get(relation, 0) >= min_rows:
+            problems.append('Seq Scan on %s (%.0f rows)' % (relation, sizes[relation]))
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--functions', default=','.join(FUNCTIONS))
+    parser.add_argument('--max-cost', type=float, default=50000.0)
+    parser.add_argument('--seq-scan-min-rows', type=float, default=10000.0,
+                        help='последовательный проход по таблицам меньше этого размера допустим')
+    parser.add_argument('--allow', action='append', default=[],
+                        help='сценарий "<функция>: <имя>", план которого не проверяется')
+    parser.add_argument('--allow-error', action='append', default=[],
+                        help='сценарий "<функция>: <имя>", ошибка или таймаут EXPLAIN которого не считается провалом')
+    parser.add_argument('--timeout-ms', type=int, default=30000)
+    parser.add_argument('--output', default='')
+    args = parser.parse_args()
+
+    os.environ.setdefault('TRACE_LOG', '0')
+    os.environ.setdefault('RATE_LIMIT_WRITE_RATE', '0')
+    install_capturing_connect()
+    handlers = load_handlers()
+    room_ids = sample_room_ids()
+
+    for function, case in load_scenarios([f for f in args.functions.split(',') if f]):
+        _scenario.name = '%s: %s' % (function, case['name'])
+        result = handlers[function](build_event(case, room_ids), None)
+        if result['statusCode'] >= 500:
+            print('%s: handler returned %d' % (_scenario.name, result['statusCode']), file=sys.stderr)
+
+    allowed = set(ALLOWED_FULL_SCANS) | set(args.allow)
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    report = []
+    failed = False
+    try:
+        with conn.cursor() as cur:
+            sizes = table_sizes(cur)
+        conn.rollback()
+
+        for entry in _captured.values():
+            item = {'scenario': entry['scenario'], 'sql': _normalize(entry['sql'])[:300]}
+            try:
+                with conn.cursor() as cur:
+                    plan = explain(cur, entry['sql'], args.timeout_ms)
+            except psycopg2.Error as e:
+                timeout = isinstance(e, psycopg2.errors.QueryCanceled)
+                item['error'] = ('timeout after %dms' % args.timeout_ms if timeout
+                                 else str(e).strip().splitlines()[0])
+                item['allowed'] = entry['scenario'] in args.allow_error
+                failed = failed or not item['allowed']
+                report.append(item)
+                continue
+            finally:
+                conn.rollback()
+
+            item['cost'] = plan['Plan']['Total Cost']
+            item['executionMs'] = plan['Execution Time']
+            item['sharedHit'] = plan['Plan'].get('Shared Hit Blocks', 0)
+            item['sharedRead'] = plan['Plan'].get('Shared Read Blocks', 0)
+            item['problems'] = [] if entry['scenario'] in allowed else check(
+                plan, sizes, args.seq_scan_min_rows, args.max_cost)
+            failed = failed or bool(item['problems'])
+            report.append(item)
+    finally:
+        conn.close()
+
+    for item in report:
+        if 'error' in item:
+            status = 'SKIP' if item['allowed'] else 'FAIL'
+        else:
+            status = 'FAIL' if item['problems'] else 'ok'
+        details = item.get('error') or '; '.join(item['problems']) or 'cost %.0f, %.2fms, hit %d, read %d' % (
+            item['cost'], item['executionMs'], item['sharedHit'], item['sharedRead'])
+        print('%-4s %-50s %s' % (status, item['scenario'][:50], details), file=sys.stderr)
+        if status != 'ok':
+            print('     %s' % item['sql'], file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(report, ensure_ascii=False, indent=2) + '\n')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
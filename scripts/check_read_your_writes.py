@@ -0,0 +1,89 @@
+"""
+Проверка чтения своих записей при чтении с реплик
+Создаёт бронирование через обработчик bookings, сразу читает его GET-запросом
+с полученным X-Read-After и удаляет. С --stand-in репликой служит сама
+основная база, что проверяет маршрутизацию без второго сервера; с настоящей
+репликой в DATABASE_REPLICA_URLS видно, сколько чтений ушло на основную базу
+из-за отставания
+
+    DATABASE_URL=postgresql://localhost/hotel python scripts/check_read_your_writes.py --stand-in
+    DATABASE_URL=postgresql://localhost:5432/hotel \\
+    DATABASE_REPLICA_URLS=postgresql://localhost:5433/hotel python scripts/check_read_your_writes.py --rounds 50
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import load_handlers, sample_room_ids  # noqa: E402
+
+
+def call(handler, method: str, path: str = '/', body=None, headers=None):
+    result = handler({
+        'httpMethod': method,
+        'path': path,
+        'headers': headers or {},
+        'queryStringParameters': {},
+        'body': json.dumps(body) if body is not None else None,
+    }, None)
+    return result['statusCode'], result['headers'], json.loads(result['body'] or '{}')
+
+
+def routing_stats(handler):
+    """Счётчики маршрутизации из модуля db, загруженного вместе с обработчиком."""
+    runtime = handler.__globals__['Request'].conn.fget.__globals__
+    return runtime['acquire_read'].__globals__['routing_stats']()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--stand-in', action='store_true', help='репликой служит DATABASE_URL')
+    args = parser.parse_args()
+
+    os.environ.setdefault('TRACE_LOG', '0')
+    os.environ.setdefault('RATE_LIMIT_WRITE_RATE', '0')
+    if args.stand_in:
+        os.environ['DATABASE_REPLICA_URLS'] = os.environ['DATABASE_URL']
+    if not os.environ.get('DATABASE_REPLICA_URLS'):
+        print('DATABASE_REPLICA_URLS is not set; use --stand-in to test against the primary', file=sys.stderr)
+        return 2
+
+    handlers = load_handlers()
+    bookings = handlers['bookings']
+    room_ids = sample_room_ids(args.rounds)
+    check_in = date.today() + timedelta(days=3000)
+
+    missing = 0
+    for index in range(args.rounds):
+        room_id = room_ids[index % len(room_ids)]
+        start = check_in + timedelta(days=index * 3)
+        status, headers, body = call(bookings, 'POST', body={
+            'roomId': room_id,
+            'checkIn': start.isoformat(),
+            'checkOut': (start + timedelta(days=1)).isoformat(),
+            'guestName': 'Read After Write',
+            'guestEmail': 'ryw@example.com',
+        })
+        if status != 201:
+            print('create failed: %d %s' % (status, body), file=sys.stderr)
+            continue
+        token = headers.get('X-Read-After')
+        if not token:
+            print('create response has no X-Read-After header', file=sys.stderr)
+            return 1
+
+        status, _, _ = call(bookings, 'GET', '/%d' % body['bookingId'], headers={'X-Read-After': token})
+        if status != 200:
+            missing += 1
+        call(bookings, 'DELETE', body={'bookingId': body['bookingId']})
+
+    print(json.dumps({'rounds': args.rounds, 'missing': missing, 'reads': routing_stats(bookings)}, indent=2))
+    return 1 if missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
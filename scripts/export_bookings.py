@@ -0,0 +1,50 @@
+"""
+Полная выгрузка бронирований в файл с постоянным расходом памяти
+Пишет NDJSON или CSV (опционально gzip) пачками серверного курсора;
+при обрыве выгрузку можно продолжить с --after-id
+
+    DATABASE_URL=postgresql://localhost/hotel python scripts/export_bookings.py bookings.ndjson.gz --gzip
+"""
+import argparse
+import gzip
+import os
+import sys
+
+import psycopg2
+
+BOOKINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'bookings')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output')
+    parser.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    parser.add_argument('--after-id', type=int, default=0)
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--property', type=int, help='id объекта сети; без него — все объекты')
+    args = parser.parse_args()
+
+    sys.path.insert(0, BOOKINGS_DIR)
+    from export import iter_export
+
+    mode = 'at' if args.after_id else 'wt'
+    opener = gzip.open if args.gzip else open
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    last_id = args.after_id
+    try:
+        with opener(args.output, mode, encoding='utf-8', newline='') as out:
+            for text, batch_last_id in iter_export(conn, args.format, args.after_id, args.property):
+                out.write(text)
+                last_id = batch_last_id or last_id
+    except KeyboardInterrupt:
+        print('interrupted, resume with --after-id %d' % last_id, file=sys.stderr)
+        return 130
+    finally:
+        conn.close()
+
+    print('exported up to id %d' % last_id)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
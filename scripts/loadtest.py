@@ -0,0 +1,342 @@
+"""
+Нагрузочный прогон обработчиков функций по сценариям из backend/*/tests.json
+Запросы выполняются в процессе (in-process) или через локальный HTTP-шлюз
+против локального PostgreSQL; отчёт содержит p50/p95/p99, запросы в секунду
+и число обращений к базе на запрос и сохраняется в JSON для сравнения коммитов
+
+    DATABASE_URL=postgresql://localhost/hotel python scripts/seed_database.py --rooms 10000 --bookings 5000000
+    DATABASE_URL=postgresql://localhost/hotel python scripts/loadtest.py --duration 30 --workers 16 \\
+        --write-ratio 0.1 --output bench_output.json
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+FUNCTIONS = ('rooms', 'bookings', 'admin')
+WRITE_METHODS = ('POST', 'PUT', 'DELETE')
+
+_counter = threading.local()
+
+
+def round_trips() -> int:
+    return getattr(_counter, 'value', 0)
+
+
+def _count() -> None:
+    _counter.value = round_trips() + 1
+
+
+_counting_cursors: Dict[type, type] = {}
+
+
+def _counting_cursor(factory: type) -> type:
+    if factory not in _counting_cursors:
+        class CountingCursor(factory):
+            def execute(self, query, params=None):
+                _count()
+                return super().execute(query, params)
+
+            def executemany(self, query, params_seq):
+                _count()
+                return super().executemany(query, params_seq)
+
+        _counting_cursors[factory] = CountingCursor
+    return _counting_cursors[factory]
+
+
+_counting_connections: Dict[type, type] = {}
+
+
+def _counting_connection(factory: type) -> type:
+    if factory not in _counting_connections:
+        class CountingConnection(factory):
+            def cursor(self, *args, **kwargs):
+                kwargs['cursor_factory'] = _counting_cursor(kwargs.get('cursor_factory') or self.cursor_factory
+                                                            or psycopg2.extensions.cursor)
+                return super().cursor(*args, **kwargs)
+
+            def commit(self):
+                _count()
+                return super().commit()
+
+        _counting_connections[factory] = CountingConnection
+    return _counting_connections[factory]
+
+
+def install_counting_connect() -> None:
+    connect = psycopg2.connect
+
+    def counting_connect(dsn=None, **kwargs):
+        factory = kwargs.get('connection_factory') or psycopg2.extensions.connection
+        kwargs['connection_factory'] = _counting_connection(factory)
+        return connect(dsn, **kwargs)
+
+    psycopg2.connect = counting_connect
+
+
+def load_handlers() -> Dict[str, Any]:
+    """Импортирует index.py каждой функции в изолированном наборе модулей."""
+    handlers = {}
+    for function in FUNCTIONS:
+        function_dir = os.path.join(ROOT, 'backend', function)
+        local_modules = {name[:-3] for name in os.listdir(function_dir) if name.endswith('.py')}
+        for name in local_modules:
+            sys.modules.pop(name, None)
+        sys.path.insert(0, function_dir)
+        try:
+            handlers[function] = importlib.import_module('index').handler
+        finally:
+            sys.path.remove(function_dir)
+            for name in local_modules:
+                sys.modules.pop(name, None)
+    return handlers
+
+
+def load_scenarios(functions: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    scenarios = []
+    for function in functions:
+        with open(os.path.join(ROOT, 'backend', function, 'tests.json'), encoding='utf-8') as f:
+            for case in json.load(f)['tests']:
+                scenarios.append((function, case))
+    return scenarios
+
+
+def sample_room_ids(limit: int = 5000) -> List[int]:
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM rooms ORDER BY random() LIMIT %s", (limit,))
+            return [row[0] for row in cur.fetchall()] or [1]
+    finally:
+        conn.close()
+
+
+def build_event(case: Dict[str, Any], room_ids: List[int]) -> Dict[str, Any]:
+    parsed = urllib.parse.urlsplit(case.get('path', '/'))
+    body = case.get('body')
+    if isinstance(body, dict) and 'checkIn' in body and 'checkOut' in body:
+        check_in = date(2090, 1, 1) + timedelta(days=random.randrange(3650))
+        body = dict(body, roomId=random.choice(room_ids), checkIn=check_in.isoformat(),
+                    checkOut=(check_in + timedelta(days=random.randint(1, 5))).isoformat())
+    headers = dict(case.get('headers') or {})
+    if 'Idempotency-Key' in headers:
+        headers['Idempotency-Key'] = uuid.uuid4().hex
+    return {
+        'httpMethod': case.get('method', 'GET'),
+        'path': parsed.path or '/',
+        'queryStringParameters': dict(urllib.parse.parse_qsl(parsed.query)) or None,
+        'headers': headers,
+        'body': json.dumps(body) if body is not None else None,
+    }
+
+
+class ShimHandler(BaseHTTPRequestHandler):
+    """Локальный HTTP-шлюз: /<function>/<path> превращается в событие функции."""
+    handlers: Dict[str, Any] = {}
+
+    def _handle(self) -> None:
+        _counter.value = 0
+        parsed = urllib.parse.urlsplit(self.path)
+        parts = parsed.path.lstrip('/').split('/', 1)
+        handler = self.handlers.get(parts[0])
+        if handler is None:
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        event = {
+            'httpMethod': self.command,
+            'path': '/' + (parts[1] if len(parts) > 1 else ''),
+            'queryStringParameters': dict(urllib.parse.parse_qsl(parsed.query)) or None,
+            'headers': dict(self.headers.items()),
+            'body': self.rfile.read(length).decode('utf-8') if length else None,
+        }
+        result = handler(event, None)
+        body = result.get('body') or ''
+        payload = body.encode('utf-8')
+        self.send_response(result['statusCode'])
+        for name, value in (result.get('headers') or {}).items():
+            self.send_header(name, value)
+        self.send_header('X-Db-Round-Trips', str(round_trips()))
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_OPTIONS = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+def invoke_in_process(handlers, function: str, event: Dict[str, Any]) -> Tuple[int, int]:
+    _counter.value = 0
+    result = handlers[function](event, None)
+    return result['statusCode'], round_trips()
+
+
+def invoke_http(base_url: str, function: str, event: Dict[str, Any]) -> Tuple[int, int]:
+    url = '%s/%s%s' % (base_url, function, event['path'])
+    if event['queryStringParameters']:
+        url += '?' + urllib.parse.urlencode(event['queryStringParameters'])
+    data = event['body'].encode('utf-8') if event['body'] else None
+    request = urllib.request.Request(url, data=data, method=event['httpMethod'], headers=event['headers'])
+    try:
+        with urllib.request.urlopen(request) as reply:
+            reply.read()
+            return reply.status, int(reply.headers.get('X-Db-Round-Trips', 0))
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, int(e.headers.get('X-Db-Round-Trips', 0))
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples: List[Tuple[float, int, int]], elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(sample[0] for sample in samples)
+    statuses: Dict[str, int] = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / elapsed, 1) if elapsed else 0,
+        'p50Ms': round(percentile(latencies, 50), 3),
+        'p95Ms': round(percentile(latencies, 95), 3),
+        'p99Ms': round(percentile(latencies, 99), 3),
+        'maxMs': round(latencies[-1], 3) if latencies else 0,
+        'dbRoundTripsPerRequest': round(sum(s[2] for s in samples) / len(samples), 2) if samples else 0,
+        'statuses': statuses,
+    }
+
+
+def compare_reports(path: str, report: Dict[str, Any], max_regression: float) -> int:
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    failed = False
+    for name, current in sorted(report['scenarios'].items()):
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous or not previous['p95Ms']:
+            continue
+        change = current['p95Ms'] / previous['p95Ms'] - 1
+        marker = ''
+        if change > max_regression:
+            marker = '  REGRESSION'
+            failed = True
+        print('%-60s p95 %8.2fms -> %8.2fms (%+.0f%%)%s' % (
+            name, previous['p95Ms'], current['p95Ms'], change * 100, marker), file=sys.stderr)
+    return 1 if failed else 0
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--functions', default=','.join(FUNCTIONS))
+    parser.add_argument('--transport', choices=('inprocess', 'http'), default='inprocess')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='')
+    parser.add_argument('--compare', default='', help='отчёт предыдущего прогона для сравнения')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='допустимый рост p95 относительно --compare')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    os.environ.setdefault('DB_POOL_MAX_SIZE', str(args.workers))
+    os.environ.setdefault('RATE_LIMIT_WRITE_RATE', '0')
+    install_counting_connect()
+    handlers = load_handlers()
+    room_ids = sample_room_ids()
+
+    scenarios = load_scenarios([f for f in args.functions.split(',') if f])
+    reads = [s for s in scenarios if s[1].get('method', 'GET') not in WRITE_METHODS]
+    writes = [s for s in scenarios if s[1].get('method', 'GET') in WRITE_METHODS]
+
+    server = None
+    if args.transport == 'http':
+        ShimHandler.handlers = handlers
+        server = ThreadingHTTPServer(('127.0.0.1', 0), ShimHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = 'http://127.0.0.1:%d' % server.server_address[1]
+
+    by_scenario: Dict[str, List[Tuple[float, int, int]]] = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def worker() -> None:
+        rng = random.Random()
+        while time.monotonic() < deadline:
+            pool = writes if writes and (not reads or rng.random() < args.write_ratio) else reads
+            function, case = rng.choice(pool)
+            event = build_event(case, room_ids)
+            started = time.perf_counter()
+            if server is None:
+                status, trips = invoke_in_process(handlers, function, event)
+            else:
+                status, trips = invoke_http(base_url, function, event)
+            latency = (time.perf_counter() - started) * 1000
+            with lock:
+                by_scenario.setdefault('%s: %s' % (function, case['name']), []).append((latency, status, trips))
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for _ in range(args.workers):
+            executor.submit(worker)
+    elapsed = time.monotonic() - started
+
+    if server is not None:
+        server.shutdown()
+
+    all_samples = [sample for samples in by_scenario.values() for sample in samples]
+    report = {
+        'revision': git_revision(),
+        'transport': args.transport,
+        'workers': args.workers,
+        'durationSec': round(elapsed, 2),
+        'writeRatio': args.write_ratio,
+        'total': summarize(all_samples, elapsed),
+        'scenarios': {name: summarize(samples, elapsed) for name, samples in sorted(by_scenario.items())},
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+    if args.compare:
+        return compare_reports(args.compare, report, args.max_regression)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Обслуживание годовых секций бронирований
+Создаёт секции bookings_p<объект>_y<год> на --ahead лет вперёд для всех объектов
+и для каждого года, брони которого уже попали в секцию DEFAULT объекта (их строки
+переносятся в новую секцию), и с --detach-before отсоединяет
+секции старых лет: DETACH не переписывает данные, отсоединённая таблица остаётся
+в базе для архивации или DROP; дневные агрегаты и карты занятости их брони сохраняют
+
+    DATABASE_URL=postgresql://localhost/hotel python scripts/manage_booking_partitions.py --ahead 2
+    DATABASE_URL=postgresql://localhost/hotel python scripts/manage_booking_partitions.py --detach-before 2022
+"""
+import argparse
+import os
+import sys
+from datetime import date
+from typing import Dict
+
+import psycopg2
+
+YEAR_PARTITIONS_SQL = """
+    SELECT parent.relname, child.relname
+    FROM pg_inherits i
+    JOIN pg_class child ON child.oid = i.inhrelid
+    JOIN pg_class parent ON parent.oid = i.inhparent
+    JOIN pg_inherits top ON top.inhrelid = parent.oid
+    WHERE top.inhparent = 'bookings'::regclass
+      AND child.relname ~ '_y[0-9]{4}$'
+    ORDER BY 1, 2
+"""
+
+
+def default_years(cur, property_id: int) -> Dict[int, int]:
+    cur.execute("""
+        SELECT EXTRACT(YEAR FROM check_in)::INTEGER, COUNT(*)
+        FROM %s
+        GROUP BY 1
+    """ % ('bookings_p%d_default' % property_id))
+    return dict(cur.fetchall())
+
+
+def move_default_year(cur, property_id: int, year: int) -> int:
+    """
+    Создаёт секцию года, в DEFAULT которой уже есть строки: пока DEFAULT
+    отсоединена, секция создаётся без проверки, строки переносятся с
+    выключенными триггерами (брони те же, производные таблицы и outbox
+    уже им соответствуют), и DEFAULT присоединяется обратно.
+    """
+    parent = 'bookings_p%d' % property_id
+    default = parent + '_default'
+    child = '%s_y%d' % (parent, year)
+    bounds = (date(year, 1, 1), date(year + 1, 1, 1))
+
+    cur.execute('ALTER TABLE "%s" DETACH PARTITION "%s"' % (parent, default))
+    cur.execute("SELECT create_booking_partitions(%s, %s, %s)", (property_id, year, year))
+    cur.execute('ALTER TABLE "%s" DISABLE TRIGGER USER' % child)
+    cur.execute('ALTER TABLE "%s" DISABLE TRIGGER USER' % default)
+    cur.execute('INSERT INTO "%s" SELECT * FROM "%s" WHERE check_in >= %%s AND check_in < %%s'
+                % (child, default), bounds)
+    moved = cur.rowcount
+    cur.execute('DELETE FROM "%s" WHERE check_in >= %%s AND check_in < %%s' % default, bounds)
+    cur.execute('ALTER TABLE "%s" ENABLE TRIGGER USER' % default)
+    cur.execute('ALTER TABLE "%s" ENABLE TRIGGER USER' % child)
+    cur.execute('ALTER TABLE "%s" ATTACH PARTITION "%s" DEFAULT' % (parent, default))
+    return moved
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ahead', type=int, default=1, help='на сколько лет вперёд создавать секции')
+    parser.add_argument('--detach-before', type=int, default=None,
+                        help='отсоединить секции лет раньше указанного')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    current = date.today().year
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM properties ORDER BY id")
+            properties = [row[0] for row in cur.fetchall()]
+
+            created = 0
+            for property_id in properties:
+                stranded = default_years(cur, property_id)
+                for year in sorted(set(range(current, current + args.ahead + 1)) | set(stranded)):
+                    if stranded.get(year):
+                        print('bookings_p%d_default: %d rows for %d, moving them to a year partition'
+                              % (property_id, stranded[year], year), file=sys.stderr)
+                        if not args.dry_run:
+                            move_default_year(cur, property_id, year)
+                        created += 1
+                    else:
+                        cur.execute("SELECT create_booking_partitions(%s, %s, %s)", (property_id, year, year))
+                        created += cur.fetchone()[0]
+            print('created %d year partitions for %d properties' % (created, len(properties)), file=sys.stderr)
+
+            if args.detach_before is not None:
+                cur.execute(YEAR_PARTITIONS_SQL)
+                for parent, child in cur.fetchall():
+                    if int(child[-4:]) >= args.detach_before:
+                        continue
+                    print('detach %s from %s' % (child, parent), file=sys.stderr)
+                    if not args.dry_run:
+                        cur.execute('ALTER TABLE "%s" DETACH PARTITION "%s"' % (parent, child))
+
+        if args.dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
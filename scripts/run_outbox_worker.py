@@ -0,0 +1,50 @@
+"""
+Локальный запуск обработчика очереди событий бронирований
+Разбирает booking_outbox и удаляет истёкшие удержания номеров в цикле тем же
+кодом, что и функция outbox; по умолчанию письма уходят в заглушку и печатаются
+в stdout
+
+    DATABASE_URL=postgresql://localhost/hotel python scripts/run_outbox_worker.py --interval 2
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import psycopg2
+
+OUTBOX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'outbox')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=2.0, help='пауза между проходами, с')
+    parser.add_argument('--once', action='store_true', help='один проход до опустошения очереди')
+    args = parser.parse_args()
+
+    sys.path.insert(0, OUTBOX_DIR)
+    from mailer import get_sender
+    from sweeper import sweep_holds
+    from worker import drain
+
+    sender = get_sender()
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        while True:
+            result = drain(conn, sender, time_budget=60.0, batch_size=args.batch_size)
+            result.update(sweep_holds(conn, time_budget=10.0))
+            if result['claimed'] or result['expiredHolds']:
+                print(json.dumps(dict(result, type='outbox'), ensure_ascii=False), file=sys.stderr)
+            if args.once:
+                return 0
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Наполнение локальной базы синтетическими номерами и бронированиями
+Данные генерируются на стороне PostgreSQL через generate_series пачками по
+номерам; с --properties больше 1 к основному объекту добавляются объекты
+seed-<n> со своими категориями, и номера делятся между объектами поровну.
+Годовые секции броней создаются до загрузки, чтобы брони не оседали в DEFAULT;
+пользовательские триггеры bookings на время загрузки отключаются, а производные
+таблицы (занятость, снимок статистики, дневные агрегаты) пересобираются одним проходом.
+Перед загрузкой (и с --reset) удаляются и брони, оставленные сценариями
+backend/bookings/tests.json (гость tests-json@example.com), чтобы их можно было
+прогнать повторно
+
+    DATABASE_URL=postgresql://localhost/hotel python scripts/seed_database.py --rooms 10000 --bookings 5000000
+    DATABASE_URL=postgresql://localhost/hotel python scripts/seed_database.py --properties 4 --rooms 40000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+from typing import List
+
+import psycopg2
+
+SEED_ROOM_PREFIX = 'Seed room '
+SEED_EMAIL_DOMAIN = '@seed.local'
+TESTS_GUEST_EMAIL = 'tests-json@example.com'
+SEED_PROPERTY_PREFIX = 'seed-'
+DEFAULT_PROPERTY_ID = 1
+SEED_START = date(2020, 1, 1)
+
+
+def reset(cur) -> None:
+    cur.execute("DELETE FROM bookings WHERE guest_email = %s", (TESTS_GUEST_EMAIL,))
+    cur.execute("ALTER TABLE bookings DISABLE TRIGGER USER")
+    cur.execute("""
+        DELETE FROM bookings
+        WHERE room_id IN (SELECT id FROM rooms WHERE name LIKE %s)
+    """, (SEED_ROOM_PREFIX + '%',))
+    cur.execute("ALTER TABLE bookings ENABLE TRIGGER USER")
+    cur.execute("DELETE FROM rooms WHERE name LIKE %s", (SEED_ROOM_PREFIX + '%',))
+
+
+def seed_properties(cur, count: int) -> List[int]:
+    """Основной объект и объекты seed-2..seed-<count>; категории копируются с основного."""
+    for n in range(2, count + 1):
+        cur.execute("""
+            INSERT INTO properties (code, name) VALUES (%s, %s)
+            ON CONFLICT (code) DO NOTHING
+        """, (SEED_PROPERTY_PREFIX + str(n), 'Seed property %d' % n))
+    cur.execute("""
+        SELECT id FROM properties
+        WHERE id = %s OR code = ANY(%s)
+        ORDER BY id
+    """, (DEFAULT_PROPERTY_ID, [SEED_PROPERTY_PREFIX + str(n) for n in range(2, count + 1)]))
+    property_ids = [row[0] for row in cur.fetchall()]
+    cur.execute("""
+        INSERT INTO room_categories (property_id, name, code)
+        SELECT p.id, c.name, c.code
+        FROM room_categories c, properties p
+        WHERE c.property_id = %s AND p.id = ANY(%s)
+        ON CONFLICT (property_id, code) DO NOTHING
+    """, (DEFAULT_PROPERTY_ID, property_ids))
+    return property_ids
+
+
+def seed_rooms(cur, property_id: int, count: int) -> None:
+    cur.execute("""
+        INSERT INTO rooms (property_id, name, category_id, price_per_night, area, max_guests,
+                           description, features, image_url, status)
+        SELECT %s,
+               %s || g,
+               c.ids[1 + g %% array_length(c.ids, 1)],
+               5000 + (g %% 40) * 1000,
+               20 + g %% 80,
+               1 + g %% 6,
+               'Синтетический номер для нагрузочного тестирования',
+               ARRAY['Wi-Fi', 'Кондиционер', 'Телевизор'],
+               '',
+               CASE WHEN g %% 10 = 0 THEN 'occupied' ELSE 'available' END
+        FROM generate_series(1, %s) g,
+             (SELECT array_agg(id ORDER BY id) AS ids FROM room_categories WHERE property_id = %s) c
+    """, (property_id, SEED_ROOM_PREFIX, count, property_id))
+
+
+def create_partitions(cur, property_ids: List[int], per_room: int) -> None:
+    last_check_out = SEED_START + timedelta(days=(per_room - 1) * 4 + 3)
+    for property_id in property_ids:
+        cur.execute("SELECT create_booking_partitions(%s, %s, %s)",
+                    (property_id, SEED_START.year, last_check_out.year))
+
+
+def seed_bookings(conn, per_room: int, batch_rooms: int) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM rooms WHERE name LIKE %s ORDER BY id", (SEED_ROOM_PREFIX + '%',))
+        room_ids = [row[0] for row in cur.fetchall()]
+
+    total = 0
+    for start in range(0, len(room_ids), batch_rooms):
+        batch = room_ids[start:start + batch_rooms]
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO bookings (property_id, room_id, check_in, check_out, guests_count, total_price,
+                                      status, guest_name, guest_email, created_at, updated_at)
+                SELECT r.property_id,
+                       r.id,
+                       DATE '2020-01-01' + g * 4,
+                       DATE '2020-01-01' + g * 4 + 1 + (g + r.id) %% 3,
+                       1 + (g + r.id) %% 3,
+                       r.price_per_night * (1 + (g + r.id) %% 3),
+                       (ARRAY['pending', 'confirmed', 'checked-in', 'cancelled'])[1 + (g + r.id) %% 4],
+                       'Seed Guest',
+                       'guest' || r.id || '-' || g || %s,
+                       TIMESTAMP '2020-01-01' + (g * 4) * INTERVAL '1 day' + r.id * INTERVAL '1 second',
+                       TIMESTAMP '2020-01-01' + (g * 4) * INTERVAL '1 day' + r.id * INTERVAL '1 second'
+                FROM rooms r, generate_series(0, %s - 1) g
+                WHERE r.id = ANY(%s)
+            """, (SEED_EMAIL_DOMAIN, per_room, batch))
+            total += cur.rowcount
+        conn.commit()
+        print('  bookings: %d' % total, file=sys.stderr)
+    return total
+
+
+def rebuild_derived(cur) -> None:
+    cur.execute("DELETE FROM room_occupancy")
+    cur.execute("""
+        SELECT rebuild_room_occupancy(room_id, y)
+        FROM (
+            SELECT DISTINCT room_id, generate_series(
+                EXTRACT(YEAR FROM check_in)::INTEGER,
+                EXTRACT(YEAR FROM check_out - 1)::INTEGER
+            ) AS y
+            FROM bookings
+            WHERE room_id IS NOT NULL AND status <> 'cancelled' AND check_out > check_in
+        ) pairs
+    """)
+    cur.execute("SELECT refresh_stats_snapshot()")
+    cur.execute("""
+        SELECT rebuild_daily_rollups(MIN(check_in), MAX(check_out))
+        FROM bookings
+        HAVING COUNT(*) > 0
+    """)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--properties', type=int, default=1, help='число объектов, включая основной')
+    parser.add_argument('--rooms', type=int, default=1000, help='всего номеров на все объекты')
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--batch-rooms', type=int, default=200)
+    parser.add_argument('--reset', action='store_true', help='только удалить ранее созданные данные')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    started = time.monotonic()
+    try:
+        with conn.cursor() as cur:
+            reset(cur)
+        conn.commit()
+        if args.reset:
+            with conn.cursor() as cur:
+                rebuild_derived(cur)
+            conn.commit()
+            return 0
+
+        per_room = max(1, args.bookings // max(args.rooms, 1))
+        with conn.cursor() as cur:
+            property_ids = seed_properties(cur, max(1, args.properties))
+            for n, property_id in enumerate(property_ids):
+                seed_rooms(cur, property_id, args.rooms // len(property_ids) + (n < args.rooms % len(property_ids)))
+            create_partitions(cur, property_ids, per_room)
+            cur.execute("ALTER TABLE bookings DISABLE TRIGGER USER")
+        conn.commit()
+
+        try:
+            total = seed_bookings(conn, per_room, args.batch_rooms)
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("ALTER TABLE bookings ENABLE TRIGGER USER")
+            conn.commit()
+
+        with conn.cursor() as cur:
+            rebuild_derived(cur)
+        conn.commit()
+
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE rooms")
+            cur.execute("ANALYZE bookings")
+    finally:
+        conn.close()
+
+    print('seeded %d rooms, %d bookings across %d properties in %.1fs'
+          % (args.rooms, total, len(property_ids), time.monotonic() - started))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
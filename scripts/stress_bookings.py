@@ -0,0 +1,98 @@
+"""
+Нагрузочная проверка защиты от двойного бронирования
+Параллельно отправляет POST в обработчик бронирований против локального
+PostgreSQL и проверяет, что ни одна пара активных броней номера не пересекается
+
+    DATABASE_URL=postgresql://localhost/hotel python scripts/stress_bookings.py --workers 32
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import psycopg2
+
+BOOKINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'bookings')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--room-id', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--window-days', type=int, default=60)
+    parser.add_argument('--keep', action='store_true', help='не удалять созданные брони')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DB_POOL_MAX_SIZE', str(args.workers))
+    os.environ.setdefault('RATE_LIMIT_WRITE_RATE', '0')
+    sys.path.insert(0, BOOKINGS_DIR)
+    from index import handler
+
+    run_id = uuid.uuid4().hex[:12]
+    marker = 'stress-%s@example.com' % run_id
+    start = date(2100, 1, 1) + timedelta(days=random.randrange(0, 3650))
+    end = start + timedelta(days=args.window_days + 7)
+
+    def make_event() -> dict:
+        check_in = start + timedelta(days=random.randrange(args.window_days))
+        check_out = check_in + timedelta(days=random.randint(1, 7))
+        return {
+            'httpMethod': 'POST',
+            'path': '/',
+            'body': json.dumps({
+                'roomId': args.room_id,
+                'checkIn': check_in.isoformat(),
+                'checkOut': check_out.isoformat(),
+                'guestsCount': 2,
+                'guestName': 'Stress Test',
+                'guestEmail': marker,
+            }),
+        }
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        responses = list(pool.map(lambda _: handler(make_event(), None), range(args.requests)))
+
+    statuses = Counter(response['statusCode'] for response in responses)
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT COUNT(*)
+                FROM bookings a
+                JOIN bookings b ON a.room_id = b.room_id AND a.id < b.id
+                WHERE a.room_id = %s
+                  AND a.status <> 'cancelled' AND b.status <> 'cancelled'
+                  AND a.check_in < b.check_out AND b.check_in < a.check_out
+                  AND a.check_out > %s AND a.check_in < %s
+            """, (args.room_id, start, end))
+            overlaps = cur.fetchone()[0]
+
+            if not args.keep:
+                cur.execute("DELETE FROM bookings WHERE guest_email = %s", (marker,))
+                conn.commit()
+    finally:
+        conn.close()
+
+    print(json.dumps({
+        'requests': args.requests,
+        'workers': args.workers,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'overlappingPairs': overlaps,
+    }, indent=2))
+
+    unexpected = set(statuses) - {201, 409}
+    if overlaps or unexpected or not statuses.get(201):
+        print('FAILED', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
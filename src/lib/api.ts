@@ -4,42 +4,120 @@ const API_URLS = {
   admin: 'https://functions.poehali.dev/2bd6f014-fa17-4672-8fde-e0ec4f6503b1',
 };
 
+// LSN последней записи: GET с ним не читает с отставшей реплики
+const READ_AFTER_KEY = 'readAfter';
+
+// Объект сети (отель), с которым работает сайт; без него функции берут объект по умолчанию
+const PROPERTY_ID: string | undefined = import.meta.env.VITE_PROPERTY_ID;
+
+function propertyHeaders(): Record<string, string> {
+  return PROPERTY_ID ? { 'X-Property-Id': PROPERTY_ID } : {};
+}
+
+function readHeaders(): Record<string, string> {
+  const token = sessionStorage.getItem(READ_AFTER_KEY);
+  return token ? { ...propertyHeaders(), 'X-Read-After': token } : propertyHeaders();
+}
+
+function rememberWrite(response: Response) {
+  const token = response.headers.get('X-Read-After');
+  if (token) sessionStorage.setItem(READ_AFTER_KEY, token);
+}
+
 export const api = {
-  async getRooms(category?: string) {
-    const url = category && category !== 'all' 
-      ? `${API_URLS.rooms}?category=${category}`
-      : API_URLS.rooms;
-    const response = await fetch(url);
+  async getRooms(category?: string, fields?: string[]) {
+    const params = new URLSearchParams();
+    if (category && category !== 'all') params.append('category', category);
+    if (fields) params.append('fields', fields.join(','));
+    const url = params.toString() ? `${API_URLS.rooms}?${params.toString()}` : API_URLS.rooms;
+    const response = await fetch(url, { headers: readHeaders() });
     if (!response.ok) throw new Error('Failed to fetch rooms');
     return response.json();
   },
 
-  async getBookings(userId?: number, status?: string) {
+  async searchRooms(checkIn: string, checkOut: string, guests?: number, category?: string) {
+    const params = new URLSearchParams({ checkIn, checkOut });
+    if (guests) params.append('guests', guests.toString());
+    if (category && category !== 'all') params.append('category', category);
+
+    const response = await fetch(`${API_URLS.rooms}?${params.toString()}`, { headers: readHeaders() });
+    if (!response.ok) throw new Error('Failed to search rooms');
+    return response.json();
+  },
+
+  async quoteRooms(roomIds: number[], checkIn: string, checkOut: string) {
+    const params = new URLSearchParams({ roomIds: roomIds.join(','), checkIn, checkOut });
+
+    const response = await fetch(`${API_URLS.rooms}/quote?${params.toString()}`, { headers: readHeaders() });
+    if (!response.ok) throw new Error('Failed to quote rooms');
+    return response.json();
+  },
+
+  async getAvailability(params: {
+    checkIn: string;
+    checkOut: string;
+    roomIds?: number[];
+    category?: string;
+    guests?: number;
+  }) {
+    const query = new URLSearchParams({ checkIn: params.checkIn, checkOut: params.checkOut });
+    if (params.roomIds) query.append('roomIds', params.roomIds.join(','));
+    if (params.category && params.category !== 'all') query.append('category', params.category);
+    if (params.guests) query.append('guests', params.guests.toString());
+
+    const response = await fetch(`${API_URLS.rooms}/availability?${query.toString()}`, { headers: readHeaders() });
+    if (!response.ok) throw new Error('Failed to fetch availability');
+    return response.json();
+  },
+
+  async getBookings(userId?: number, status?: string, cursor?: string) {
     let url = API_URLS.bookings;
     const params = new URLSearchParams();
     if (userId) params.append('user_id', userId.toString());
     if (status) params.append('status', status);
+    if (cursor) params.append('cursor', cursor);
     if (params.toString()) url += `?${params.toString()}`;
     
-    const response = await fetch(url);
+    const response = await fetch(url, { headers: readHeaders() });
     if (!response.ok) throw new Error('Failed to fetch bookings');
     return response.json();
   },
 
-  async createBooking(data: {
-    roomId: number;
-    checkIn: string;
-    checkOut: string;
-    guestsCount: number;
+  async createHold(data: { roomId: number; checkIn: string; checkOut: string; guestsCount: number }) {
+    const response = await fetch(`${API_URLS.bookings}/holds`, {
+      method: 'POST',
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json' },
+      body: JSON.stringify(data),
+    });
+    rememberWrite(response);
+    if (!response.ok) throw new Error('Failed to hold room');
+    return response.json();
+  },
+
+  async releaseHold(holdId: string) {
+    const response = await fetch(`${API_URLS.bookings}/holds`, {
+      method: 'DELETE',
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json' },
+      body: JSON.stringify({ holdId }),
+    });
+    rememberWrite(response);
+    if (!response.ok && response.status !== 404) throw new Error('Failed to release hold');
+  },
+
+  async createBooking(data: (
+    | { holdId: string }
+    | { roomId: number; checkIn: string; checkOut: string; guestsCount: number }
+  ) & {
     guestName: string;
     guestEmail: string;
     guestPhone?: string;
-  }) {
+  }, idempotencyKey: string) {
     const response = await fetch(API_URLS.bookings, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json', 'Idempotency-Key': idempotencyKey },
       body: JSON.stringify(data),
     });
+    rememberWrite(response);
     if (!response.ok) throw new Error('Failed to create booking');
     return response.json();
   },
@@ -47,31 +125,84 @@ export const api = {
   async updateBooking(bookingId: number, status: string) {
     const response = await fetch(API_URLS.bookings, {
       method: 'PUT',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json' },
       body: JSON.stringify({ bookingId, status }),
     });
+    rememberWrite(response);
     if (!response.ok) throw new Error('Failed to update booking');
     return response.json();
   },
 
+  async updateBookings(bookingIds: number[], status: string) {
+    const response = await fetch(API_URLS.bookings, {
+      method: 'PUT',
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json' },
+      body: JSON.stringify({ bookingIds, status }),
+    });
+    rememberWrite(response);
+    if (!response.ok) throw new Error('Failed to update bookings');
+    return response.json();
+  },
+
   async deleteBooking(bookingId: number) {
     const response = await fetch(API_URLS.bookings, {
       method: 'DELETE',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json' },
       body: JSON.stringify({ bookingId }),
     });
+    rememberWrite(response);
     if (!response.ok) throw new Error('Failed to delete booking');
     return response.json();
   },
 
   async getAdminStats() {
-    const response = await fetch(`${API_URLS.admin}/stats`);
+    const response = await fetch(`${API_URLS.admin}/stats`, { headers: readHeaders() });
     if (!response.ok) throw new Error('Failed to fetch admin stats');
     return response.json();
   },
 
+  async getAnalytics(params: { from?: string; to?: string; bucket?: 'day' | 'week' | 'month'; category?: string } = {}) {
+    const query = new URLSearchParams();
+    if (params.from) query.append('from', params.from);
+    if (params.to) query.append('to', params.to);
+    if (params.bucket) query.append('bucket', params.bucket);
+    if (params.category) query.append('category', params.category);
+
+    const response = await fetch(`${API_URLS.admin}/analytics?${query}`, { headers: readHeaders() });
+    if (!response.ok) throw new Error('Failed to fetch analytics');
+    return response.json();
+  },
+
+  async getRatePlans() {
+    const response = await fetch(`${API_URLS.admin}/rate-plans`, { headers: readHeaders() });
+    if (!response.ok) throw new Error('Failed to fetch rate plans');
+    return response.json();
+  },
+
+  async assignRatePlan(roomIds: number[], ratePlan: string | null) {
+    const response = await fetch(`${API_URLS.admin}/rate-plans`, {
+      method: 'PUT',
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json' },
+      body: JSON.stringify({ roomIds, ratePlan }),
+    });
+    rememberWrite(response);
+    if (!response.ok) throw new Error('Failed to assign rate plan');
+    return response.json();
+  },
+
+  async setRoomPrices(roomId: number, from: string, to: string, price: number | null) {
+    const response = await fetch(`${API_URLS.admin}/prices`, {
+      method: 'PUT',
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json' },
+      body: JSON.stringify({ roomId, from, to, price }),
+    });
+    rememberWrite(response);
+    if (!response.ok) throw new Error('Failed to update prices');
+    return response.json();
+  },
+
   async getAdminRooms() {
-    const response = await fetch(API_URLS.admin);
+    const response = await fetch(API_URLS.admin, { headers: readHeaders() });
     if (!response.ok) throw new Error('Failed to fetch admin rooms');
     return response.json();
   },
@@ -88,9 +219,10 @@ export const api = {
   }) {
     const response = await fetch(API_URLS.admin, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json' },
       body: JSON.stringify(data),
     });
+    rememberWrite(response);
     if (!response.ok) throw new Error('Failed to create room');
     return response.json();
   },
@@ -98,19 +230,32 @@ export const api = {
   async updateRoomStatus(roomId: number, status: string) {
     const response = await fetch(API_URLS.admin, {
       method: 'PUT',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json' },
       body: JSON.stringify({ roomId, status }),
     });
+    rememberWrite(response);
     if (!response.ok) throw new Error('Failed to update room');
     return response.json();
   },
 
+  async updateRoomStatuses(roomIds: number[], status: string) {
+    const response = await fetch(API_URLS.admin, {
+      method: 'PUT',
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json' },
+      body: JSON.stringify({ roomIds, status }),
+    });
+    rememberWrite(response);
+    if (!response.ok) throw new Error('Failed to update rooms');
+    return response.json();
+  },
+
   async deleteRoom(roomId: number) {
     const response = await fetch(API_URLS.admin, {
       method: 'DELETE',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { ...propertyHeaders(), 'Content-Type': 'application/json' },
       body: JSON.stringify({ roomId }),
     });
+    rememberWrite(response);
     if (!response.ok) throw new Error('Failed to delete room');
     return response.json();
   },
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import Layout from '@/components/Layout';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
@@ -14,6 +14,9 @@ import { ru } from 'date-fns/locale';
 import { toast } from 'sonner';
 import { api } from '@/lib/api';
 
+// Пауза перед удержанием: пока гость перебирает даты и номер, удержания не создаются
+const HOLD_DEBOUNCE_MS = 500;
+
 const Booking = () => {
   const [checkIn, setCheckIn] = useState<Date>();
   const [checkOut, setCheckOut] = useState<Date>();
@@ -24,11 +27,21 @@ const Booking = () => {
   const [phone, setPhone] = useState('');
   const [rooms, setRooms] = useState<any[]>([]);
   const [loading, setLoading] = useState(false);
+  const [holdId, setHoldId] = useState<string | null>(null);
+  const [holdStatus, setHoldStatus] = useState<'idle' | 'reserving' | 'held' | 'failed'>('idle');
+  const [holdTotal, setHoldTotal] = useState<number | null>(null);
+  // Ключ идемпотентности попытки оформления: повтор после таймаута идёт с тем же
+  // ключом и не создаёт вторую бронь; новый ключ — при новом удержании или других данных гостя
+  const [checkoutKey, setCheckoutKey] = useState<string | null>(null);
+  const [quoteTotal, setQuoteTotal] = useState<number | null>(null);
+  // Создание и снятие удержаний идут строго по очереди: новое удержание не должно
+  // получить 409 из-за ещё не снятого старого удержания того же гостя
+  const holdQueue = useRef<Promise<void>>(Promise.resolve());
 
   useEffect(() => {
     const fetchRooms = async () => {
       try {
-        const data = await api.getRooms();
+        const data = await api.getRooms(undefined, ['id', 'name', 'price']);
         setRooms(data.rooms.map((r: any) => ({ id: r.id.toString(), name: r.name, price: r.price })));
       } catch (error) {
         console.error('Failed to fetch rooms:', error);
@@ -37,6 +50,73 @@ const Booking = () => {
     fetchRooms();
   }, []);
 
+  useEffect(() => {
+    if (!checkIn || !checkOut || !selectedRoom || checkOut <= checkIn) return;
+
+    let cancelled = false;
+    api.quoteRooms(
+      [parseInt(selectedRoom)],
+      checkIn.toISOString().split('T')[0],
+      checkOut.toISOString().split('T')[0],
+    ).then(data => {
+      if (!cancelled && data.quotes.length) setQuoteTotal(data.quotes[0].totalPrice);
+    }).catch(error => console.error('Failed to quote room:', error));
+
+    return () => {
+      cancelled = true;
+      setQuoteTotal(null);
+    };
+  }, [checkIn, checkOut, selectedRoom]);
+
+  useEffect(() => {
+    if (!checkIn || !checkOut || !selectedRoom || checkOut <= checkIn) return;
+
+    let current: string | null = null;
+    let cancelled = false;
+    setHoldStatus('reserving');
+    const timer = setTimeout(() => {
+      holdQueue.current = holdQueue.current.then(async () => {
+        if (cancelled) return;
+        try {
+          const hold = await api.createHold({
+            roomId: parseInt(selectedRoom),
+            checkIn: checkIn.toISOString().split('T')[0],
+            checkOut: checkOut.toISOString().split('T')[0],
+            guestsCount: parseInt(guests),
+          });
+          if (cancelled) {
+            await api.releaseHold(hold.holdId).catch(() => {});
+            return;
+          }
+          current = hold.holdId;
+          setHoldId(hold.holdId);
+          setHoldTotal(hold.totalPrice);
+          setHoldStatus('held');
+        } catch {
+          if (cancelled) return;
+          setHoldStatus('failed');
+          toast.error('Номер на выбранные даты уже занят');
+        }
+      });
+    }, HOLD_DEBOUNCE_MS);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+      setHoldId(null);
+      setHoldTotal(null);
+      setHoldStatus('idle');
+      const released = current;
+      if (released) {
+        holdQueue.current = holdQueue.current.then(() => api.releaseHold(released).catch(() => {}));
+      }
+    };
+  }, [checkIn, checkOut, selectedRoom, guests]);
+
+  useEffect(() => {
+    setCheckoutKey(holdId ? crypto.randomUUID() : null);
+  }, [holdId, name, email, phone]);
+
   const calculateNights = () => {
     if (checkIn && checkOut) {
       const diff = checkOut.getTime() - checkIn.getTime();
@@ -45,13 +125,8 @@ const Booking = () => {
     return 0;
   };
 
-  const calculateTotal = () => {
-    const room = rooms.find(r => r.id === selectedRoom);
-    if (room && checkIn && checkOut) {
-      return room.price * calculateNights();
-    }
-    return 0;
-  };
+  // Сумма удержания зафиксирована при его создании, расчёт — по ценам календаря на даты
+  const calculateTotal = () => holdTotal ?? quoteTotal;
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
@@ -61,17 +136,25 @@ const Booking = () => {
       return;
     }
 
+    if (holdStatus === 'reserving') {
+      toast.info('Номер ещё резервируется, подождите несколько секунд');
+      return;
+    }
+
+    if (!holdId || !checkoutKey) {
+      toast.error('Номер на выбранные даты уже занят');
+      return;
+    }
+
     try {
       setLoading(true);
       await api.createBooking({
-        roomId: parseInt(selectedRoom),
-        checkIn: checkIn.toISOString().split('T')[0],
-        checkOut: checkOut.toISOString().split('T')[0],
-        guestsCount: parseInt(guests),
+        holdId,
         guestName: name,
         guestEmail: email,
         guestPhone: phone,
-      });
+      }, checkoutKey);
+      setHoldId(null);
 
       toast.success('Бронирование успешно создано! Мы свяжемся с вами в ближайшее время.');
       
@@ -233,12 +316,17 @@ const Booking = () => {
                     </div>
                   </div>
 
-                  <Button type="submit" size="lg" className="w-full" disabled={loading}>
+                  <Button type="submit" size="lg" className="w-full" disabled={loading || holdStatus === 'reserving'}>
                     {loading ? (
                       <>
                         <Icon name="Loader2" size={20} className="mr-2 animate-spin" />
                         Создание...
                       </>
+                    ) : holdStatus === 'reserving' ? (
+                      <>
+                        <Icon name="Loader2" size={20} className="mr-2 animate-spin" />
+                        Резервируем номер...
+                      </>
                     ) : (
                       <>
                         <Icon name="CheckCircle" size={20} className="mr-2" />
@@ -280,7 +368,9 @@ const Booking = () => {
                       <div className="border-t border-border pt-4">
                         <div className="flex justify-between items-center">
                           <span className="text-lg font-semibold">Всего:</span>
-                          <span className="text-3xl font-bold text-primary">{calculateTotal().toLocaleString()}₽</span>
+                          <span className="text-3xl font-bold text-primary">
+                            {calculateTotal() === null ? '…' : `${calculateTotal()!.toLocaleString()}₽`}
+                          </span>
                         </div>
                       </div>
                     </>